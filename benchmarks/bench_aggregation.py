@@ -0,0 +1,58 @@
+"""
+Aggregating a stream of flags: iterating the members of each instance versus the chunked aggregators of Flags.
+"""
+import collections
+import functools
+import operator
+
+import benchutil
+
+from flags import Flags
+
+
+class Permissions(Flags):
+    read = ()
+    write = ()
+    execute = ()
+    delete = ()
+    share = ()
+    admin = ()
+
+
+def count_members_by_iteration(values):
+    counts = collections.Counter()
+    for flags in values:
+        for member in flags:
+            counts[member.name] += 1
+    return counts
+
+
+def cooccurrence_by_iteration(values):
+    matrix = collections.defaultdict(collections.Counter)
+    for flags in values:
+        names = [member.name for member in flags]
+        for name in names:
+            matrix[name].update(names)
+    return matrix
+
+
+def main():
+    values = [Permissions(i * 7 % 64) for i in range(100000)]
+    globals_ = {'Permissions': Permissions, 'values': values, 'functools': functools, 'operator': operator,
+                'count_members_by_iteration': count_members_by_iteration,
+                'cooccurrence_by_iteration': cooccurrence_by_iteration}
+    rows = [
+        ('count members', 'count_members_by_iteration(values)', 'Permissions.count_members(values)'),
+        ('co-occurrence matrix', 'cooccurrence_by_iteration(values)', 'Permissions.cooccurrence(values)'),
+        ('union', 'functools.reduce(operator.or_, values)', 'Permissions.reduce_or(values)'),
+        ('intersection', 'functools.reduce(operator.and_, values)', 'Permissions.reduce_and(values)'),
+    ]
+    benchutil.print_table('Aggregating 100000 flags (per item)', [
+        (label, benchutil.measure(baseline, globals_, number=3) / len(values),
+         benchutil.measure(optimized, globals_, number=3) / len(values))
+        for label, baseline, optimized in rows
+    ], ('per instance', 'aggregator'))
+
+
+if __name__ == '__main__':
+    main()
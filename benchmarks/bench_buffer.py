@@ -0,0 +1,33 @@
+"""
+Getting at the raw bits of a collection of flags: int() on each item versus the zero-copy memoryview of a FlagsArray.
+"""
+import benchutil
+
+from flags import Flags, FlagsArray
+
+
+class Permissions(Flags):
+    read = ()
+    write = ()
+    execute = ()
+    delete = ()
+    share = ()
+    admin = ()
+
+
+def main():
+    values = [Permissions(i * 7 % 64) for i in range(100000)]
+    flags_array = FlagsArray(Permissions, values)
+    globals_ = {'values': values, 'flags_array': flags_array}
+    rows = [
+        ('list of the bits', '[int(flags) for flags in values]', 'flags_array.memoryview().tolist()'),
+        ('bytes for a socket', 'bytes(int(flags) for flags in values)', 'bytes(flags_array.memoryview())'),
+    ]
+    benchutil.print_table('Exporting the bits of 100000 flags', [
+        (label, benchutil.measure(baseline, globals_, number=5), benchutil.measure(optimized, globals_))
+        for label, baseline, optimized in rows
+    ], ('int() per item', 'memoryview'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Time needed to create flags classes with lots of members (e.g.: generated from a schema at startup).
+
+The baseline creates the FlagProperties of the members the way version 1.1 did: every attribute is set through
+ReadonlyzerMixin.__setattr__ (with its failing readonly lookup) and the object is made readonly afterwards. The
+other part of the optimization (creating the member instances without FlagsMeta.__call__) isn't included in the
+baseline so the speedup shown here is only a part of the total saving.
+"""
+import time
+import unittest.mock
+
+import benchutil
+
+import flags
+from flags import Flags, FlagProperties, ReadonlyzerMixin
+
+
+class SetattrFlagProperties(FlagProperties):
+    __slots__ = ()
+
+    def __init__(self, *, name, bits, data=None, index=None, index_without_aliases=None, readonly=False):
+        self.name = name
+        self.data = data
+        self.bits = bits
+        self.index = index
+        self.index_without_aliases = index_without_aliases
+        ReadonlyzerMixin.__init__(self)
+        self.readonly = readonly
+
+
+def measure_creation(members, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Flags('Generated', members)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    benchutil.print_header('Flags class creation', ('members', 'baseline', 'optimized', 'speedup', 'per member'))
+    for member_count in (100, 1000, 10000):
+        names = ['member%s' % i for i in range(member_count)]
+        named_data = [(name, ['data']) for name in names]
+        for label, members in (('names only', names), ('with data', named_data)):
+            with unittest.mock.patch.object(flags, 'FlagProperties', SetattrFlagProperties):
+                baseline = measure_creation(members)
+            optimized = measure_creation(members)
+            print('%-40s %11.2f ms %11.2f ms %13.2fx %11.2f us' % (
+                '%s %s' % (member_count, label), baseline * 1e3, optimized * 1e3, baseline / optimized,
+                optimized / member_count * 1e6))
+    print()
+
+
+if __name__ == '__main__':
+    main()
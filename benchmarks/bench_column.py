@@ -0,0 +1,60 @@
+"""
+Loading a large column of flags: pickled FlagsArray versus a memory mapped flags column file.
+"""
+import os
+import pickle
+import tempfile
+
+import benchutil
+
+from flags import Flags, FlagsArray, FlagsColumnReader, FlagsColumnWriter
+
+
+class Permissions(Flags):
+    read = ()
+    write = ()
+    execute = ()
+    delete = ()
+    share = ()
+    admin = ()
+
+
+def main():
+    values = [Permissions(i % 64) for i in range(1000000)]
+    directory = tempfile.mkdtemp()
+    pickle_path = os.path.join(directory, 'permissions.pickle')
+    column_path = os.path.join(directory, 'permissions.flags')
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(FlagsArray(Permissions, values), f)
+    with FlagsColumnWriter(column_path, Permissions) as writer:
+        writer.extend(values)
+
+    def load_pickle():
+        with open(pickle_path, 'rb') as f:
+            return pickle.load(f)
+
+    def open_column():
+        return FlagsColumnReader(column_path, Permissions)
+
+    mask = int(Permissions.write)
+    globals_ = {'load_pickle': load_pickle, 'open_column': open_column, 'mask': mask}
+    rows = [
+        ('open + read row 500000',
+         benchutil.measure('load_pickle()[500000]', globals_, number=5),
+         benchutil.measure('r = open_column(); r[500000]; r.close()', globals_, number=5)),
+        ('open + count rows containing write',
+         benchutil.measure('sum(1 for bits in load_pickle().bits if bits & mask)', globals_, number=5),
+         benchutil.measure('r = open_column(); v = r.memoryview(); sum(1 for bits in v if bits & mask); '
+                           'v.release(); r.close()', globals_, number=5)),
+    ]
+    benchutil.print_table('Loading 1000000 flags', rows, ('pickle', 'column'))
+    print('file size: %s bytes pickled, %s bytes column' % (os.path.getsize(pickle_path),
+                                                            os.path.getsize(column_path)))
+    print()
+    os.unlink(pickle_path)
+    os.unlink(column_path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Import time of a module that defines lots of flags classes, with and without __lazy_members__.
+The lazy variant defers the creation of the members to the first use of each class.
+"""
+import time
+
+import benchutil
+
+from flags import Flags
+
+
+def generate_module_source(class_count, member_count, lazy):
+    lines = ['class LazyFlags(Flags):', '    __lazy_members__ = %r' % lazy, '']
+    for class_index in range(class_count):
+        lines.append('class Flags%s(LazyFlags):' % class_index)
+        lines.extend('    member%s = ()' % member_index for member_index in range(member_count))
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def measure_import(code, use_class_count, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        namespace = {'Flags': Flags}
+        start = time.perf_counter()
+        exec(code, namespace)
+        for class_index in range(use_class_count):
+            namespace['Flags%s' % class_index].member0
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    class_count = 200
+    member_count = 20
+    codes = {lazy: compile(generate_module_source(class_count, member_count, lazy), '<generated>', 'exec')
+             for lazy in (False, True)}
+    benchutil.print_header('Module import with %s members per class' % member_count,
+                           ('classes used', 'eager', 'lazy', 'speedup'))
+    for use_class_count in (0, 10, class_count):
+        eager = measure_import(codes[False], use_class_count)
+        lazy = measure_import(codes[True], use_class_count)
+        print('%-40s %11.2f ms %11.2f ms %13.2fx' % ('%s of %s' % (use_class_count, class_count),
+                                                     eager * 1e3, lazy * 1e3, eager / lazy))
+    print()
+
+if __name__ == '__main__':
+    main()
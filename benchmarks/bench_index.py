@@ -0,0 +1,42 @@
+"""
+Filtering a large collection of flags by membership: a linear scan with ``in`` versus the bitmaps of a FlagsIndex.
+"""
+import benchutil
+
+from flags import Flags, FlagsIndex
+
+
+class Permissions(Flags):
+    read = ()
+    write = ()
+    execute = ()
+    delete = ()
+    share = ()
+    admin = ()
+
+
+def main():
+    values = [Permissions(i * 7 % 64) for i in range(100000)]
+    index = FlagsIndex(Permissions, values)
+    required = Permissions.read | Permissions.write
+    forbidden = Permissions.admin
+    globals_ = {'values': values, 'index': index, 'required': required, 'forbidden': forbidden,
+                'FlagsIndex': FlagsIndex, 'Permissions': Permissions}
+    rows = [
+        ('all_of', '[i for i, flags in enumerate(values) if required in flags]', 'index.all_of(required)'),
+        ('any_of', '[i for i, flags in enumerate(values) if flags & required]', 'index.any_of(required)'),
+        ('none_of', '[i for i, flags in enumerate(values) if not flags & forbidden]', 'index.none_of(forbidden)'),
+        ('all_of + none_of', '[i for i, flags in enumerate(values) if required in flags and not flags & forbidden]',
+         'index.query(all_of=required, none_of=forbidden)'),
+        ('count all_of', 'sum(1 for flags in values if required in flags)', 'index.count(all_of=required)'),
+    ]
+    benchutil.print_table('Querying 100000 flags (per query)', [
+        (label, benchutil.measure(baseline, globals_, number=5), benchutil.measure(optimized, globals_, number=5))
+        for label, baseline, optimized in rows
+    ], ('linear scan', 'FlagsIndex'))
+    print('Building the index: %.1f ns per row' % (
+        benchutil.measure('FlagsIndex(Permissions, values)', globals_, number=1) / len(values)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""
+Cost of len(), list() and reversed() on instances of a wide flags class with disjoint single bit members
+using the generic Flags methods compared to the popcount and bit-to-member index based specialized ones.
+"""
+import benchutil
+
+from flags import Flags
+
+
+Wide = Flags('Wide', ['f%s' % i for i in range(64)])
+
+
+def main():
+    sparse = Wide.f3 | Wide.f40
+    dense = Wide.all_flags
+    globals_ = dict(sparse=sparse, dense=dense, Flags=Flags)
+    rows = []
+    for name, value in (('sparse', 'sparse'), ('all_flags', 'dense')):
+        for label, generic, specialized in (
+                ('len(%s)', 'sum(1 for _ in Flags.__iter__(%s))', 'len(%s)'),
+                ('list(%s)', 'list(Flags.__iter__(%s))', 'list(%s)'),
+                ('list(reversed(%s))', 'list(Flags.__reversed__(%s))', 'list(reversed(%s))')):
+            rows.append((label % name, benchutil.measure(generic % value, globals_),
+                         benchutil.measure(specialized % value, globals_)))
+    benchutil.print_table('64 member flags class: generic vs specialized iteration', rows, ('generic', 'specialized'))
+
+
+if __name__ == '__main__':
+    main()
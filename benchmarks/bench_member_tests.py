@@ -0,0 +1,39 @@
+"""
+Cost of `flags.member_name` boolean member tests: Flags.__getattr__ after a failed attribute lookup versus the
+MemberTest descriptors installed on final flags classes.
+"""
+import benchutil
+
+from flags import Flags
+
+
+class TextStyle(Flags):
+    bold = ()
+    italic = ()
+    underline = ()
+
+
+def create_flags_class_without_descriptors():
+    """ Returns a copy of TextStyle whose member tests go through the failed attribute lookup and __getattr__. """
+    flags_class = Flags('TextStyle', ['bold', 'italic', 'underline'])
+    for name in flags_class.__members__:
+        type.__delattr__(flags_class, name)
+    return flags_class
+
+
+def main():
+    OldTextStyle = create_flags_class_without_descriptors()
+    globals_ = {'style': TextStyle.bold | TextStyle.underline,
+                'old_style': OldTextStyle.bold | OldTextStyle.underline}
+    rows = [
+        ('style.bold (set)', 'old_style.bold', 'style.bold'),
+        ('style.italic (unset)', 'old_style.italic', 'style.italic'),
+    ]
+    benchutil.print_table('Boolean member tests', [
+        (label, benchutil.measure(baseline, globals_), benchutil.measure(optimized, globals_))
+        for label, baseline, optimized in rows
+    ], ('__getattr__', 'descriptor'))
+
+
+if __name__ == '__main__':
+    main()
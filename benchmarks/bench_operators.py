@@ -0,0 +1,38 @@
+"""
+Per-operation cost of the generic FlagsArithmeticMixin operators (operator_requires_type_identity wrapper +
+FlagsMeta.__call__) compared to the operators that are compiled for each final flags class.
+"""
+import benchutil
+
+from flags import Flags, FlagsArithmeticMixin
+
+
+class Perm(Flags):
+    read = ()
+    write = ()
+    execute = ()
+    delete = ()
+
+
+def main():
+    a = Perm.read | Perm.write
+    b = Perm.write | Perm.execute
+    globals_ = dict(a=a, b=b, Mixin=FlagsArithmeticMixin)
+    operations = [
+        ('a | b', 'Mixin.__or__(a, b)'),
+        ('a & b', 'Mixin.__and__(a, b)'),
+        ('a ^ b', 'Mixin.__xor__(a, b)'),
+        ('a - b', 'Mixin.__sub__(a, b)'),
+        ('~a', 'Mixin.__invert__(a)'),
+        ('b in a', 'Mixin.__contains__(a, b)'),
+        ('a == b', 'Mixin.__eq__(a, b)'),
+        ('a <= b', 'Mixin.__le__(a, b)'),
+    ]
+    rows = []
+    for compiled, generic in operations:
+        rows.append((compiled, benchutil.measure(generic, globals_), benchutil.measure(compiled, globals_)))
+    benchutil.print_table('Flags operators: generic vs compiled per-class', rows, ('generic', 'compiled'))
+
+
+if __name__ == '__main__':
+    main()
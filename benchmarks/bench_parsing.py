@@ -0,0 +1,33 @@
+"""
+Cost of Flags.bits_from_str() and Flags.bits_from_simple_str() with the generic implementations compared to the
+compiled per-class parser (lookup tables + memo of previously parsed strings).
+"""
+import benchutil
+
+from flags import Flags
+
+
+Perm = Flags('Perm', ['perm%s' % i for i in range(32)])
+
+
+def main():
+    inputs = {
+        'member name': 'perm7',
+        'dotted member': 'Perm.perm7',
+        '3 names': 'perm1|perm7|perm20',
+        'Perm(3 names)': 'Perm(perm1|perm7|perm20)',
+    }
+    rows = []
+    for label, s in inputs.items():
+        globals_ = dict(Perm=Perm, Flags=Flags, s=s)
+        for method_name in ('bits_from_simple_str', 'bits_from_str'):
+            if method_name == 'bits_from_simple_str' and s.startswith('Perm'):
+                continue
+            rows.append(('%s(%s)' % (method_name, label),
+                         benchutil.measure('Flags.%s.__func__(Perm, s)' % method_name, globals_),
+                         benchutil.measure('Perm.%s(s)' % method_name, globals_)))
+    benchutil.print_table('Parsing flags strings: generic vs compiled', rows, ('generic', 'compiled'))
+
+
+if __name__ == '__main__':
+    main()
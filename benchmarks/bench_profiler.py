@@ -0,0 +1,30 @@
+"""
+Cost of flags operations without a profiler, with an enabled FlagsProfiler and after disabling it.
+"""
+import benchutil
+
+from flags import Flags, FlagsProfiler
+
+
+class Permissions(Flags):
+    read = ()
+    write = ()
+    execute = ()
+
+
+def main():
+    globals_ = {'Permissions': Permissions, 'read': Permissions.read, 'write': Permissions.write}
+    statements = (('read | write', 'read | write'), ('Permissions(3)', 'Permissions(3)'),
+                  ('str(read)', 'str(read)'))
+    baseline = [benchutil.measure(statement, globals_) for _, statement in statements]
+    with FlagsProfiler([Permissions]):
+        enabled = [benchutil.measure(statement, globals_) for _, statement in statements]
+    disabled = [benchutil.measure(statement, globals_) for _, statement in statements]
+    benchutil.print_table('Profiler enabled', [(label, base, value) for (label, _), base, value
+                                               in zip(statements, baseline, enabled)], ('no profiler', 'enabled'))
+    benchutil.print_table('Profiler disabled', [(label, base, value) for (label, _), base, value
+                                                in zip(statements, baseline, disabled)], ('no profiler', 'disabled'))
+
+
+if __name__ == '__main__':
+    main()
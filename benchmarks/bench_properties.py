@@ -0,0 +1,27 @@
+"""
+Cost of the name, data, properties and is_member attributes of flags instances: the generic properties of Flags
+compared to the ones specialized for the class when it is created.
+"""
+import benchutil
+
+from flags import Flags
+
+
+class Permissions(Flags):
+    read = 'r'
+    write = 'w'
+    execute = 'x'
+
+
+def main():
+    globals_ = {'Flags': Flags, 'member': Permissions.write, 'composite': Permissions.read | Permissions.write}
+    rows = []
+    for value in ('member', 'composite'):
+        for name in ('name', 'data', 'properties', 'is_member'):
+            rows.append(('%s.%s' % (value, name), benchutil.measure('Flags.%s.fget(%s)' % (name, value), globals_),
+                         benchutil.measure('%s.%s' % (value, name), globals_)))
+    benchutil.print_table('Attribute access on flags instances', rows, ('generic', 'specialized'))
+
+
+if __name__ == '__main__':
+    main()
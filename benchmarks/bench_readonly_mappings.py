@@ -0,0 +1,68 @@
+"""
+Lookups in the readonly class level dictionaries of flags classes (__all_members__, __bits_to_instance__, ...):
+the pure python ReadonlyDictProxy of the ``dictionaries`` package that was used earlier versus types.MappingProxyType.
+Requires the ``dictionaries`` package for the baseline.
+"""
+import collections
+import types
+
+import benchutil
+
+from flags import Flags
+
+try:
+    from dictionaries import ReadonlyDictProxy
+except ImportError:
+    ReadonlyDictProxy = None
+
+
+class Permissions(Flags):
+    read = ()
+    write = ()
+    execute = ()
+
+
+def create_flags_class_with_readonly_dict_proxies():
+    """ Returns a copy of Permissions whose class level dictionaries are wrapped into ReadonlyDictProxy. """
+    flags_class = Flags('Permissions', ['read', 'write', 'execute'])
+    for name in ('__all_members__', '__members_without_aliases__', '__bits_to_properties__', '__bits_to_instance__',
+                 '__member_aliases__', '__members__'):
+        dictionary = collections.OrderedDict(getattr(flags_class, name))
+        type.__setattr__(flags_class, name, ReadonlyDictProxy(dictionary))
+    return flags_class
+
+
+def main():
+    if ReadonlyDictProxy is None:
+        print('This benchmark requires the dictionaries package: pip install dictionaries==0.0.2')
+        return
+    members = collections.OrderedDict(Permissions.__all_members__)
+    globals_ = {'proxy': ReadonlyDictProxy(members), 'mapping_proxy': types.MappingProxyType(members),
+                'Permissions': Permissions}
+    rows = [
+        ("mapping['write']", "proxy['write']", "mapping_proxy['write']"),
+        ("mapping.get('write')", "proxy.get('write')", "mapping_proxy.get('write')"),
+        ("mapping.get('missing')", "proxy.get('missing')", "mapping_proxy.get('missing')"),
+        ("'write' in mapping", "'write' in proxy", "'write' in mapping_proxy"),
+    ]
+    benchutil.print_table('Readonly dictionary lookups', [
+        (label, benchutil.measure(baseline, globals_), benchutil.measure(optimized, globals_))
+        for label, baseline, optimized in rows
+    ], ('ReadonlyDictProxy', 'MappingProxy'))
+
+    globals_ = {'Old': create_flags_class_with_readonly_dict_proxies(), 'New': Permissions,
+                'generic_bits_from_simple_str': Flags.bits_from_simple_str.__func__}
+    rows = [
+        ('FlagsMeta.__getattr__', 'Old.write', 'New.write'),
+        ('FlagsMeta.__call__(int)', 'Old(3)', 'New(3)'),
+        ('bits_from_simple_str (generic)', "generic_bits_from_simple_str(Old, 'read|write')",
+         "generic_bits_from_simple_str(New, 'read|write')"),
+    ]
+    benchutil.print_table('Flags operations that look up the class level dictionaries', [
+        (label, benchutil.measure(baseline, globals_), benchutil.measure(optimized, globals_))
+        for label, baseline, optimized in rows
+    ], ('ReadonlyDictProxy', 'MappingProxy'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Sending flags to worker processes: pickling by member names versus SharedFlagsRegistry (class id + bits).
+"""
+import concurrent.futures
+import pickle
+import time
+from multiprocessing.reduction import ForkingPickler
+
+import benchutil
+
+from flags import Flags, SharedFlagsRegistry
+
+
+class Permissions(Flags):
+    read = ()
+    write = ()
+    execute = ()
+    delete = ()
+    share = ()
+    admin = ()
+
+
+def identity(items):
+    return items
+
+
+def measure_pool(values, chunk_count=100):
+    chunk_size = len(values) // chunk_count
+    chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        list(executor.map(identity, chunks[:2]))
+        start = time.perf_counter()
+        list(executor.map(identity, chunks))
+        return (time.perf_counter() - start) / len(values) * 1e9
+
+
+def main():
+    value = Permissions.read | Permissions.write | Permissions.share
+    values = [Permissions(i % 64) for i in range(100000)]
+    globals_ = {'pickle': pickle, 'ForkingPickler': ForkingPickler, 'value': value}
+    by_name_size = len(ForkingPickler.dumps(value))
+    by_name = [benchutil.measure('pickle.loads(ForkingPickler.dumps(value))', globals_), measure_pool(values)]
+    with SharedFlagsRegistry([Permissions]):
+        registry_size = len(ForkingPickler.dumps(value))
+        with_registry = [benchutil.measure('pickle.loads(ForkingPickler.dumps(value))', globals_),
+                         measure_pool(values)]
+    benchutil.print_table('Flags crossing process boundaries', [
+        ('pickle round trip', by_name[0], with_registry[0]),
+        ('round trip through a process pool', by_name[1], with_registry[1]),
+    ], ('by name', 'registry'))
+    print('pickled size: %s bytes by name, %s bytes with the registry' % (by_name_size, registry_size))
+    print()
+
+
+if __name__ == '__main__':
+    main()
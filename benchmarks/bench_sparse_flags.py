@@ -0,0 +1,53 @@
+"""
+A flags class with tens of thousands of members whose instances have only a few members set:
+int storage versus sparse storage (__sparse_flags__).
+"""
+import sys
+
+import benchutil
+
+from flags import Flags
+
+
+class SparseFlags(Flags):
+    __sparse_flags__ = True
+
+
+def instance_size(instance):
+    stored = instance._FlagsArithmeticMixin__bits
+    size = sys.getsizeof(instance) + sys.getsizeof(stored)
+    if isinstance(stored, tuple):
+        size += sys.getsizeof(stored[0]) + sum(sys.getsizeof(position) for position in stored[0])
+    return size
+
+
+def main():
+    member_count = 30000
+    names = ['member%s' % i for i in range(member_count)]
+    classes = Flags('Entitlements', names), SparseFlags('Entitlements', names)
+    rows = []
+    globals_list = []
+    for flags_class in classes:
+        members = flags_class.__members__
+        value = members['member5'] | members['member15000'] | members['member29000']
+        globals_list.append({'C': flags_class, 'x': value, 'inverted': ~value, 'm': members['member15000'],
+                             'other': members['member7'] | members['member29999']})
+    for label, statement in (('x | other', 'x | other'),
+                             ('x & other', 'x & other'),
+                             ('~x', '~x'),
+                             ('member in x', 'm in x'),
+                             ('member in ~x', 'm in inverted'),
+                             ('list(x)', 'list(x)'),
+                             ('len(~x)', 'len(inverted)'),
+                             ('x == other', 'x == other')):
+        rows.append((label,) + tuple(benchutil.measure(statement, globals_, repeat=3) for globals_ in globals_list))
+    benchutil.print_table('%s members, instances with 3 members set' % member_count, rows, ('int', 'sparse'))
+
+    benchutil.print_header('Memory usage of an instance with 3 members set', ('storage', 'bytes'))
+    for label, globals_ in zip(('int', 'sparse'), globals_list):
+        print('%-40s %14s' % (label, instance_size(globals_['x'])))
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Decoding a stream of flags: one by one with from_str() or FlagsMeta.__call__(int) versus FlagsStreamCodec.
+"""
+import asyncio
+
+import benchutil
+
+from flags import Flags, FlagsStreamCodec
+
+
+class Permissions(Flags):
+    read = ()
+    write = ()
+    execute = ()
+    delete = ()
+    share = ()
+    admin = ()
+
+
+class WideFlags(Flags):
+    __members__ = ['w%s' % i for i in range(40)]
+
+
+def decode_with(decode, data):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await decode(reader)
+    # asyncio.run() requires python 3.7+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def one_by_one_text(flags_class):
+    async def decode(reader):
+        result = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                return result
+            result.append(flags_class.from_str(line[:-1].decode()))
+    return decode
+
+
+def one_by_one_int(flags_class):
+    async def decode(reader):
+        result = []
+        while True:
+            data = await reader.read(8)
+            if not data:
+                return result
+            result.append(flags_class(int.from_bytes(data, 'little')))
+    return decode
+
+
+def with_codec(codec):
+    async def decode(reader):
+        return [flags async for flags in codec.decode(reader)]
+    return decode
+
+
+def main():
+    count = 100000
+    rows = []
+    for flags_class in (Permissions, WideFlags):
+        values = [flags_class(i * 7919 % (1 << len(flags_class))) for i in range(count)]
+        text = FlagsStreamCodec(flags_class, 'text').encode(values)
+        fixed_width = b''.join(int(flags).to_bytes(8, 'little') for flags in values)
+        varint = FlagsStreamCodec(flags_class).encode(values)
+        globals_ = {'decode_with': decode_with, 'text': text, 'fixed_width': fixed_width, 'varint': varint,
+                    'one_by_one_text': one_by_one_text(flags_class), 'one_by_one_int': one_by_one_int(flags_class),
+                    'text_codec': with_codec(FlagsStreamCodec(flags_class, 'text')),
+                    'varint_codec': with_codec(FlagsStreamCodec(flags_class))}
+        rows += [
+            ('%s text' % flags_class.__name__, benchutil.measure('decode_with(one_by_one_text, text)', globals_, 1)
+             / count, benchutil.measure('decode_with(text_codec, text)', globals_, 1) / count),
+            ('%s int' % flags_class.__name__, benchutil.measure('decode_with(one_by_one_int, fixed_width)',
+                                                                globals_, 1) / count,
+             benchutil.measure('decode_with(varint_codec, varint)', globals_, 1) / count),
+        ]
+    benchutil.print_table('Decoding 100000 flags from a StreamReader (per item)', rows, ('one by one', 'codec'))
+
+
+if __name__ == '__main__':
+    main()
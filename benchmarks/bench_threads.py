@@ -0,0 +1,65 @@
+"""
+Throughput of flags arithmetic and str conversion running in several threads at the same time with the
+different cache configurations. Throughput can scale with the number of threads only on free-threaded
+python builds (e.g.: python3.13t), with the GIL the threads take turns.
+"""
+import sys
+import threading
+import time
+
+import benchutil
+
+from flags import Flags
+
+
+def create_flags_class(**cache_options):
+    class_dict = dict(cache_options)
+    class_dict['__members__'] = ['f%s' % i for i in range(16)]
+    return type(Flags)('ThreadedFlags', (Flags,), class_dict)
+
+
+CONFIGURATIONS = (
+    ('no caches', {'__parse_cache_size__': 0}),
+    ('lru', {'__intern_cache_size__': 256, '__str_cache_size__': 256}),
+    ('clock', {'__intern_cache_size__': 256, '__intern_cache_policy__': 'clock',
+               '__str_cache_size__': 256, '__str_cache_policy__': 'clock'}),
+    ('striped lru x16', {'__intern_cache_size__': 256, '__str_cache_size__': 256, '__cache_stripes__': 16}),
+)
+
+
+def run(flags_class, thread_count, operations_per_thread=20000):
+    members = list(flags_class)
+    barrier = threading.Barrier(thread_count + 1)
+
+    def work(thread_index):
+        barrier.wait()
+        for i in range(operations_per_thread):
+            value = members[(thread_index + i) % 16] | members[(i * 7) % 16]
+            str(~value & value)
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return thread_count * operations_per_thread / (time.perf_counter() - start)
+
+
+def main():
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)
+    thread_counts = (1, 2, 4, 8)
+    benchutil.print_header('Operations per second (GIL %s)' % ('enabled' if is_gil_enabled() else 'disabled'),
+                           ('cache configuration',) + tuple('%s threads' % count for count in thread_counts) +
+                           ('scaling',))
+    for label, options in CONFIGURATIONS:
+        flags_class = create_flags_class(**options)
+        results = [run(flags_class, thread_count) for thread_count in thread_counts]
+        print('%-40s' % label + ''.join(' %14.0f' % result for result in results) +
+              ' %13.2fx' % (results[-1] / results[0]))
+    print()
+
+
+if __name__ == '__main__':
+    main()
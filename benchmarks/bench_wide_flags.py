@@ -0,0 +1,51 @@
+"""
+Flags classes with 1k, 10k and 100k members with and without wide mode (__wide_flags__).
+Wide mode indexes the members by bit position and iterates the set bits of instances word by word.
+"""
+import gc
+import time
+
+import benchutil
+
+from flags import Flags
+
+
+class NarrowFlags(Flags):
+    __wide_flags__ = False
+
+
+class WideFlags(Flags):
+    __wide_flags__ = True
+
+
+def measure_creation(base_class, member_count):
+    names = ['member%s' % i for i in range(member_count)]
+    gc.collect()
+    start = time.perf_counter()
+    flags_class = base_class('Generated', names)
+    return flags_class, (time.perf_counter() - start) * 1e9
+
+
+def main():
+    for member_count in (1000, 10000, 100000):
+        narrow_class, narrow_creation = measure_creation(NarrowFlags, member_count)
+        wide_class, wide_creation = measure_creation(WideFlags, member_count)
+        # 100 set bits scattered over the whole width of the class
+        bits = sum(1 << (i * 997 % member_count) for i in range(100))
+        rows = [('class creation', narrow_creation, wide_creation)]
+        for label, statement in (('list(flags) - 100 set bits', 'list(x)'),
+                                 ('list(reversed(flags)) - 100 set bits', 'list(reversed(x))'),
+                                 ('flags class lookup by member bits', 'C(m)'),
+                                 ('flags | member', 'x | C(m)')):
+            measurements = []
+            for flags_class in (narrow_class, wide_class):
+                globals_ = {'C': flags_class, 'x': flags_class(bits),
+                            'm': int(flags_class.__members__['member%s' % (member_count - 1)])}
+                measurements.append(benchutil.measure(statement, globals_, repeat=3))
+            rows.append((label,) + tuple(measurements))
+        benchutil.print_table('%s members' % member_count, rows, ('narrow', 'wide'))
+        del narrow_class, wide_class
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Helpers shared by the benchmark scripts of this directory.
+The scripts can be executed from a source checkout: e.g.: ``python benchmarks/bench_operators.py``
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+
+def measure(statement, globals_, number=None, repeat=5):
+    """ Returns the best per-call time in nanoseconds. """
+    timer = timeit.Timer(statement, globals=globals_)
+    if number is None:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def print_header(title, columns):
+    print(title)
+    print('%-40s' % columns[0] + ''.join(' %14s' % column for column in columns[1:]))
+
+
+def print_table(title, rows, columns=('baseline', 'optimized')):
+    """ rows: an iterable of (label, baseline_ns, optimized_ns) tuples. """
+    print_header(title, ('operation',) + tuple(columns) + ('speedup',))
+    for label, baseline, optimized in rows:
+        print('%-40s %11.1f ns %11.1f ns %13.2fx' % (label, baseline, optimized, baseline / optimized))
+    print()
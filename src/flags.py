@@ -1,13 +1,22 @@
 # -*- coding: utf-8 -*-
+import array
 import collections
 import functools
+import itertools
+import operator
+import os
 import pickle
+import struct
+import sys
+import threading
+import time
 
-from collections.abc import Iterable, Mapping, Set
+from collections.abc import Iterable, Mapping, MutableMapping, MutableSequence, Sequence, Set
+from types import MappingProxyType
 
-from dictionaries import ReadonlyDictProxy
-
-__all__ = ['Flags', 'FlagsMeta', 'FlagData', 'UNDEFINED', 'unique', 'unique_bits']
+__all__ = ['Flags', 'FlagsMeta', 'FlagData', 'FlagsArray', 'FlagsIndex', 'PackedFlags', 'SharedFlagsRegistry',
+           'FlagsColumnReader', 'FlagsColumnWriter', 'FlagsProfiler', 'FlagsStreamCodec', 'UNDEFINED', 'unique',
+           'unique_bits']
 
 
 # version_info[0]: Increase in case of large milestones/releases.
@@ -19,7 +28,7 @@ __all__ = ['Flags', 'FlagsMeta', 'FlagData', 'UNDEFINED', 'unique', 'unique_bits
 #                  case increase only version_info[2].
 # version_info[2]: Increase in case of bugfixes. Also use this if you added new features
 #                  without modifying the behavior of the previously existing ones.
-version_info = (1, 1, 4)
+version_info = (1, 2, 0)
 __version__ = '.'.join(str(n) for n in version_info)
 __author__ = 'István Pásztor'
 __license__ = 'MIT'
@@ -38,16 +47,119 @@ def unique(flags_class):
 def unique_bits(flags_class):
     """ A decorator for flags classes to forbid declaring flags with overlapping bits. """
     flags_class = unique(flags_class)
-    other_bits = 0
-    for name, member in flags_class.__members_without_aliases__.items():
+    members = flags_class.__members_without_aliases__
+    # The first pass collects the bits that are shared by more than one member.
+    seen_bits = shared_bits = 0
+    for member in members.values():
         bits = int(member)
-        if other_bits & bits:
-            for other_name, other_member in flags_class.__members_without_aliases__.items():
-                if int(other_member) & bits:
-                    raise ValueError("%r: '%s' and '%s' have overlapping bits" % (flags_class, other_name, name))
-        else:
-            other_bits |= bits
-    return flags_class
+        shared_bits |= seen_bits & bits
+        seen_bits |= bits
+    if not shared_bits:
+        return flags_class
+    if shared_bits < 0:
+        # Members with negative bits share infinitely many sign bits. The bits above the widest member are all copies
+        # of the sign bit so a single position can stand in for them and the loop below terminates.
+        width = max(int(member).bit_length() for member in members.values()) + 1
+        shared_bits &= (1 << width) - 1
+
+    # The second pass indexes the owners of the shared bits and collects every overlapping pair of members.
+    bit_owners = collections.defaultdict(list)
+    overlapping_pairs = collections.OrderedDict()
+    for name, member in members.items():
+        bits = int(member) & shared_bits
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            owners = bit_owners[bit]
+            for owner in owners:
+                overlapping_pairs[owner, name] = None
+            owners.append(name)
+    overlaps = ', '.join("'%s' and '%s' have overlapping bits" % pair for pair in overlapping_pairs)
+    raise ValueError('%r: %s' % (flags_class, overlaps))
+
+
+if hasattr(int, 'bit_count'):
+    # python 3.10+
+    popcount = int.bit_count
+else:
+    def popcount(bits):
+        return bin(bits).count('1')
+
+
+if hasattr(bytes, 'isascii'):
+    # python 3.7+
+    is_ascii = bytes.isascii
+else:
+    ASCII_BYTES = bytes(range(128))
+
+    def is_ascii(data):
+        return not data.translate(None, ASCII_BYTES)
+
+
+if hasattr(memoryview, 'toreadonly'):
+    # python 3.8+
+    def readonly_memoryview(obj):
+        return memoryview(obj).toreadonly()
+else:
+    def readonly_memoryview(obj):
+        # Older versions can't make a read-only view of a writable buffer so this returns a read-only copy.
+        with memoryview(obj) as view:
+            return memoryview(view.tobytes()).cast(view.format)
+
+
+def int_to_words(bits):
+    """ Splits a non-negative int into a tuple of 64-bit words, the least significant word first. The words are
+    decoded as explicitly little endian so the result doesn't depend on the byte order of the platform. """
+    word_count = (bits.bit_length() + 63) // 64
+    return struct.unpack('<%sQ' % word_count, bits.to_bytes(word_count * 8, 'little'))
+
+
+def iter_set_bit_positions(bits, reverse=False):
+    """ Yields the positions of the set bits of a non-negative int in ascending (or descending) order.
+    The int is converted into 64-bit words in one step and the zero words are skipped without a python level
+    loop so the cost depends on the width of bits plus the number of set bits instead of their product. """
+    if bits < 0:
+        raise ValueError('Expected a non-negative int, received %r' % (bits,))
+    words = int_to_words(bits)
+    word_indexes = itertools.compress(range(len(words)), words)
+    if reverse:
+        for index in reversed(list(word_indexes)):
+            word = words[index]
+            while word:
+                position = word.bit_length() - 1
+                yield index * 64 + position
+                word ^= 1 << position
+    else:
+        for index in word_indexes:
+            word = words[index]
+            while word:
+                lowest_bit = word & -word
+                yield index * 64 + lowest_bit.bit_length() - 1
+                word ^= lowest_bit
+
+
+def int_from_bit_positions(positions):
+    """ The inverse of iter_set_bit_positions(): builds an int from the positions of its set bits. """
+    if not positions:
+        return 0
+    data = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+def sparse_bits_from_int(bits, all_bits):
+    """ Converts bits (a subset of all_bits) to the (positions, inverted) pair stored by the instances of sparse
+    flags classes. positions is a frozenset that holds the positions of the set bits or the positions of the
+    unset bits of all_bits if inverted is True. The smaller one of the two sets is stored (the set bits in case
+    of a tie) so every value has a single representation. all_bits is -1 while the members are being created. """
+    count = popcount(bits)
+    if all_bits != -1 and 2 * count > popcount(all_bits):
+        return frozenset(iter_set_bit_positions(all_bits ^ bits)), True
+    if count == 1 and bits > 0:
+        # the common case of the members of the class
+        return frozenset((bits.bit_length() - 1,)), False
+    return frozenset(iter_set_bit_positions(bits)), False
 
 
 def is_descriptor(obj):
@@ -139,7 +251,8 @@ class ReadonlyzerMixin:
         # Calling super() before setting readonly.
         # This way super().__init__ can set attributes even if readonly==True
         super().__init__(*args, **kwargs)
-        self.__readonly = readonly
+        # Bypassing our __setattr__: the object can't be readonly before this point.
+        object.__setattr__(self, '_ReadonlyzerMixin__readonly', readonly)
 
     @property
     def readonly(self):
@@ -166,23 +279,30 @@ class ReadonlyzerMixin:
 class FlagProperties(ReadonlyzerMixin):
     __slots__ = ('name', 'data', 'bits', 'index', 'index_without_aliases')
 
-    def __init__(self, *, name, bits, data=None, index=None, index_without_aliases=None):
-        self.name = name
-        self.data = data
-        self.bits = bits
-        self.index = index
-        self.index_without_aliases = index_without_aliases
-        super().__init__()
+    def __init__(self, *, name, bits, data=None, index=None, index_without_aliases=None, readonly=False):
+        # Bypassing ReadonlyzerMixin.__setattr__: the object can't be readonly before ReadonlyzerMixin.__init__.
+        # This makes a difference when a flags class with lots of members is created.
+        set_attribute = object.__setattr__
+        set_attribute(self, 'name', name)
+        set_attribute(self, 'data', data)
+        set_attribute(self, 'bits', bits)
+        set_attribute(self, 'index', index)
+        set_attribute(self, 'index_without_aliases', index_without_aliases)
+        super().__init__(readonly=readonly)
 
 
 READONLY_PROTECTED_FLAGS_CLASS_ATTRIBUTES = frozenset([
     '__writable_protected_flags_class_attributes__', '__all_members__', '__members__', '__members_without_aliases__',
     '__member_aliases__', '__bits_to_properties__', '__bits_to_instance__', '__pickle_int_flags__',
+    '__intern_cache_size__', '__intern_cache_policy__', '__dense_instance_table__', '__str_cache_size__',
+    '__str_cache_policy__', '__parse_cache_size__', '__parse_cache_policy__', '__lazy_members__',
+    '__wide_flags__', '__sparse_flags__', '__cache_stripes__',
 ])
 
 # these attributes are writable when __writable_protected_flags_class_attributes__ is set to True on the class.
 TEMPORARILY_WRITABLE_PROTECTED_FLAGS_CLASS_ATTRIBUTES = frozenset([
-    '__all_bits__', '__no_flags__', '__all_flags__', '__no_flags_name__', '__all_flags_name__',
+    '__all_bits__', '__no_flags__', '__all_flags__', '__no_flags_name__', '__all_flags_name__', '__intern_cache__',
+    '__instance_table__', '__str_cache__', '__parse_cache__',
 ])
 
 PROTECTED_FLAGS_CLASS_ATTRIBUTES = READONLY_PROTECTED_FLAGS_CLASS_ATTRIBUTES | \
@@ -193,23 +313,313 @@ def is_valid_bits_value(bits):
     return isinstance(bits, int) and not isinstance(bits, bool)
 
 
-def initialize_class_dict_and_create_flags_class(class_dict, class_name, create_flags_class):
+CacheInfo = collections.namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+class LRUCache:
+    """ A bounded mapping that evicts the least recently used item when it is full.
+    Every lookup reorders the items so lookups are serialized with a lock. """
+    policy = 'lru'
+
+    def __init__(self, maxsize):
+        if not is_valid_bits_value(maxsize) or maxsize <= 0:
+            raise ValueError("The maxsize of a cache should be a positive int, received %r" % (maxsize,))
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__items = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            try:
+                value = self.__items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.__items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def setdefault(self, key, value):
+        """ Stores value only if key isn't in the cache and returns the value stored for key. """
+        with self.__lock:
+            existing_value = self.__items.setdefault(key, value)
+            if len(self.__items) > self.maxsize:
+                self.__items.popitem(last=False)
+            return existing_value
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.__items)
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.__items))
+
+
+class ClockCache:
+    """ A bounded mapping that approximates LRU with the CLOCK algorithm: a hit only marks the slot of the
+    item as referenced and the eviction gives a second chance to referenced items. In contrast to LRUCache
+    lookups don't need a lock, only insertions are serialized. The hits and misses counters are updated
+    without a lock so they can miss a few updates when several threads use the cache at the same time. """
+    policy = 'clock'
+
+    def __init__(self, maxsize):
+        if not is_valid_bits_value(maxsize) or maxsize <= 0:
+            raise ValueError("The maxsize of a cache should be a positive int, received %r" % (maxsize,))
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # (slot_indexes, slots, referenced) where slots is a list of (key, value) pairs. A state only grows or
+        # overwrites its slots and clear() replaces the whole state so get() can use it without a lock.
+        self.__state = ({}, [], bytearray())
+        self.__hand = 0
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        slot_indexes, slots, referenced = self.__state
+        index = slot_indexes.get(key)
+        if index is not None:
+            # The slot may have been reused by a concurrent insertion since we read its index.
+            slot_key, value = slots[index]
+            if slot_key == key:
+                referenced[index] = 1
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    def setdefault(self, key, value):
+        """ Stores value only if key isn't in the cache and returns the value stored for key. """
+        with self.__lock:
+            slot_indexes, slots, referenced = self.__state
+            index = slot_indexes.get(key)
+            if index is not None:
+                return slots[index][1]
+            if len(slots) < self.maxsize:
+                slots.append((key, value))
+                referenced.append(0)
+                slot_indexes[key] = len(slots) - 1
+                return value
+            hand = self.__hand
+            while referenced[hand]:
+                referenced[hand] = 0
+                hand = (hand + 1) % self.maxsize
+            del slot_indexes[slots[hand][0]]
+            slots[hand] = (key, value)
+            slot_indexes[key] = hand
+            self.__hand = (hand + 1) % self.maxsize
+            return value
+
+    def clear(self):
+        with self.__lock:
+            self.__state = ({}, [], bytearray())
+            self.__hand = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.__state[1])
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self))
+
+
+class StripedCache:
+    """ Distributes the items between several independent caches (stripes) of the same policy by the hash
+    of their keys. Threads that work with different keys rarely contend for the lock of the same stripe.
+    This makes a difference on free-threaded python builds where the threads really run in parallel. """
+
+    def __init__(self, cache_class, maxsize, stripes):
+        if not is_valid_bits_value(maxsize) or maxsize <= 0:
+            raise ValueError("The maxsize of a cache should be a positive int, received %r" % (maxsize,))
+        if not is_valid_bits_value(stripes) or stripes <= 0:
+            raise ValueError("The number of cache stripes should be a positive int, received %r" % (stripes,))
+        stripes = min(stripes, maxsize)
+        self.policy = cache_class.policy
+        self.maxsize = maxsize
+        self.__stripes = tuple(cache_class(maxsize // stripes + (1 if index < maxsize % stripes else 0))
+                               for index in range(stripes))
+
+    @property
+    def stripes(self):
+        return len(self.__stripes)
+
+    def get(self, key, default=None):
+        stripes = self.__stripes
+        return stripes[hash(key) % len(stripes)].get(key, default)
+
+    def setdefault(self, key, value):
+        """ Stores value only if key isn't in the cache and returns the value stored for key. """
+        stripes = self.__stripes
+        return stripes[hash(key) % len(stripes)].setdefault(key, value)
+
+    def clear(self):
+        for stripe in self.__stripes:
+            stripe.clear()
+
+    def __len__(self):
+        return sum(len(stripe) for stripe in self.__stripes)
+
+    def cache_info(self):
+        infos = [stripe.cache_info() for stripe in self.__stripes]
+        return CacheInfo(sum(info.hits for info in infos), sum(info.misses for info in infos), self.maxsize,
+                         sum(info.currsize for info in infos))
+
+
+CACHE_POLICIES = {cache_class.policy: cache_class for cache_class in (LRUCache, ClockCache)}
+
+
+# The bit_length of the __all_bits__ of a flags class can't exceed this if it uses a dense instance table.
+DENSE_INSTANCE_TABLE_MAX_BITS = 16
+
+
+class DenseInstanceTable:
+    """ Holds an instance of a flags class for every possible combination of its bits.
+    The instance for a given bits value can be found at instances[bits]. Slots of values
+    that aren't subsets of the __all_bits__ of the flags class hold None. """
+    __slots__ = ('instances', '__created_instances_size')
+
+    def __init__(self, flags_class, bits_to_instance):
+        all_bits = flags_class.__all_bits__
+        if all_bits < 0:
+            raise ValueError("%s: a dense instance table can't be used with members that have negative bits" %
+                             (flags_class.__name__,))
+        if all_bits.bit_length() > DENSE_INSTANCE_TABLE_MAX_BITS:
+            raise ValueError("%s: a dense instance table can be used only if all bits of the members fit "
+                             "into %s bits" % (flags_class.__name__, DENSE_INSTANCE_TABLE_MAX_BITS))
+        instances = [None] * (all_bits + 1)
+        created_instances_size = 0
+        # iterating over all subsets of all_bits
+        bits = all_bits
+        while True:
+            instance = bits_to_instance.get(bits)
+            if instance is None:
+                instance = type.__call__(flags_class, bits)
+                created_instances_size += sys.getsizeof(instance)
+            instances[bits] = instance
+            if bits == 0:
+                break
+            bits = (bits - 1) & all_bits
+        self.instances = tuple(instances)
+        self.__created_instances_size = created_instances_size
+
+    def __len__(self):
+        """ The number of valid bits values (instances) in the table. """
+        return sum(1 for instance in self.instances if instance is not None)
+
+    def memory_usage(self):
+        """ The number of bytes occupied by the table and the instances created for it. The members
+        and the special members are excluded because those would exist without the table too. """
+        return sys.getsizeof(self.instances) + self.__created_instances_size
+
+
+# Flags classes with __wide_flags__ = None switch to wide mode if the bits of their members are wider than this.
+WIDE_FLAGS_MIN_BITS = 512
+
+
+class BitsKeyedDict(MutableMapping):
+    """ An insertion ordered dict for int keys that stores the keys with a single set bit by their bit position.
+    Looking up such a key compares it with the stored one instead of hashing it. This makes a difference with
+    the very wide ints of the members of wide flags classes because python doesn't cache the hash of ints. """
+    __slots__ = ('__single_bit_items', '__other_items', '__keys')
+
+    def __init__(self):
+        # bit position -> (key, value)
+        self.__single_bit_items = {}
+        self.__other_items = {}
+        self.__keys = []
+
+    def __getitem__(self, key):
+        if isinstance(key, int) and key > 0:
+            item = self.__single_bit_items.get(key.bit_length() - 1)
+            if item is not None and item[0] == key:
+                return item[1]
+        return self.__other_items[key]
+
+    def get(self, key, default=None):
+        if isinstance(key, int) and key > 0:
+            item = self.__single_bit_items.get(key.bit_length() - 1)
+            if item is not None and item[0] == key:
+                return item[1]
+        if not self.__other_items:
+            return default
+        return self.__other_items.get(key, default)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, int) and key > 0 and popcount(key) == 1:
+            position = key.bit_length() - 1
+            if position not in self.__single_bit_items:
+                self.__keys.append(key)
+            self.__single_bit_items[position] = key, value
+        else:
+            if key not in self.__other_items:
+                self.__keys.append(key)
+            self.__other_items[key] = value
+
+    def __delitem__(self, key):
+        if isinstance(key, int) and key > 0 and popcount(key) == 1:
+            del self.__single_bit_items[key.bit_length() - 1]
+        else:
+            del self.__other_items[key]
+        self.__keys.remove(key)
+
+    def __iter__(self):
+        return iter(self.__keys)
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def __repr__(self):
+        return '%s({%s})' % (type(self).__name__, ', '.join('%r: %r' % item for item in self.items()))
+
+
+def create_bounded_cache(policy, maxsize, stripes=1):
+    try:
+        cache_class = CACHE_POLICIES[policy]
+    except KeyError:
+        raise ValueError("Invalid cache policy %r, expected one of: %s" % (
+            policy, ', '.join(sorted(CACHE_POLICIES))))
+    if stripes == 1:
+        return cache_class(maxsize)
+    return StripedCache(cache_class, maxsize, stripes)
+
+
+def add_members_to_flags_class(flags_class, member_definitions):
+    """ Turns flags_class into a final flags class by creating its members from member_definitions and by
+    setting up the class attributes (__members__, __all_bits__, ...) that describe them. The class attributes
+    that describe the members are set only after the members have been created successfully. """
+    type.__setattr__(flags_class, '__writable_protected_flags_class_attributes__', True)
+    class_name = flags_class.__name__
+
     # all_members is used by __getattribute__ and __setattr__. It contains all items
     # from members and also the no_flags and all_flags special members if they are defined.
+    member_definitions = [(name, data) for name, data in member_definitions]
+    member_definitions = list(flags_class.process_member_definitions(member_definitions))
+    # member_definitions has to be an iterable of iterables yielding (name, bits, data)
+
+    wide = flags_class.__wide_flags__
+    if wide is None:
+        wide = any(is_valid_bits_value(bits) and bits.bit_length() > WIDE_FLAGS_MIN_BITS
+                   for _, bits, _ in member_definitions)
+    type.__setattr__(flags_class, '__wide_flags__', bool(wide))
+    if flags_class.__sparse_flags__:
+        if any(is_valid_bits_value(bits) and bits < 0 for _, bits, _ in member_definitions):
+            raise ValueError("%s: __sparse_flags__ can't be used with members that have negative bits" % class_name)
+        # pylint: disable=protected-access
+        flags_class._install_sparse_storage()
+
     all_members = collections.OrderedDict()
     members = collections.OrderedDict()
     members_without_aliases = collections.OrderedDict()
-    bits_to_properties = collections.OrderedDict()
-    bits_to_instance = collections.OrderedDict()
+    bits_to_properties = BitsKeyedDict() if wide else collections.OrderedDict()
+    bits_to_instance = BitsKeyedDict() if wide else collections.OrderedDict()
     member_aliases = collections.OrderedDict()
-    class_dict['__all_members__'] = ReadonlyDictProxy(all_members)
-    class_dict['__members__'] = ReadonlyDictProxy(members)
-    class_dict['__members_without_aliases__'] = ReadonlyDictProxy(members_without_aliases)
-    class_dict['__bits_to_properties__'] = ReadonlyDictProxy(bits_to_properties)
-    class_dict['__bits_to_instance__'] = ReadonlyDictProxy(bits_to_instance)
-    class_dict['__member_aliases__'] = ReadonlyDictProxy(member_aliases)
-
-    flags_class = create_flags_class(class_dict)
 
     def instantiate_member(name, bits, special):
         if not isinstance(name, str):
@@ -218,7 +628,11 @@ def initialize_class_dict_and_create_flags_class(class_dict, class_name, create_
             raise TypeError("Bits for flag '%s' should be an int but it is %r" % (name, bits))
         if not special and bits == 0:
             raise ValueError("Flag '%s' has the invalid value of zero" % name)
-        member = flags_class(bits)
+        # Aliases share the instance of the aliased member. We don't need the
+        # other logic of FlagsMeta.__call__ while the members are being created.
+        member = bits_to_instance.get(bits)
+        if member is None:
+            member = type.__call__(flags_class, bits)
         if int(member) != bits:
             raise RuntimeError("%s has altered the assigned bits of member '%s' from %r to %r" % (
                 class_name, name, bits, int(member)))
@@ -238,59 +652,158 @@ def initialize_class_dict_and_create_flags_class(class_dict, class_name, create_
             return
 
         members[name] = member
-        properties = FlagProperties(name=name, bits=bits, data=data, index=len(members))
-        properties_for_bits = bits_to_properties.setdefault(bits, properties)
-        is_alias = properties_for_bits is not properties
-        if is_alias:
+        properties_for_bits = bits_to_properties.get(bits)
+        if properties_for_bits is not None:
+            # alias
             if data is not UNDEFINED:
                 raise ValueError("You aren't allowed to associate data with alias '%s'" % name)
             member_aliases[name] = properties_for_bits.name
-        else:
-            properties.index_without_aliases = len(members_without_aliases)
-            members_without_aliases[name] = member
-        properties.readonly = True
+            return
+        bits_to_properties[bits] = FlagProperties(name=name, bits=bits, data=data, index=len(members),
+                                                  index_without_aliases=len(members_without_aliases),
+                                                  readonly=True)
+        members_without_aliases[name] = member
 
     def instantiate_and_register_member(*, name, bits, data=None, special_member=False):
         member = instantiate_member(name, bits, special_member)
         register_member(member, name, bits, data, special_member)
         return member
 
-    return flags_class, instantiate_and_register_member
-
-
-def create_flags_class_with_members(class_name, class_dict, member_definitions, create_flags_class):
-    class_dict['__writable_protected_flags_class_attributes__'] = True
-
-    flags_class, instantiate_and_register_member = initialize_class_dict_and_create_flags_class(
-        class_dict, class_name, create_flags_class)
-
-    member_definitions = [(name, data) for name, data in member_definitions]
-    member_definitions = flags_class.process_member_definitions(member_definitions)
-    # member_definitions has to be an iterable of iterables yielding (name, bits, data)
-
     all_bits = 0
     for name, bits, data in member_definitions:
         instantiate_and_register_member(name=name, bits=bits, data=data)
         all_bits |= bits
 
-    if len(flags_class) == 0:
+    if not members_without_aliases:
         # In this case process_member_definitions() returned an empty iterable which isn't allowed.
         raise RuntimeError("%s.%s returned an empty iterable" %
-                           (flags_class.__name__, flags_class.process_member_definitions.__name__))
+                           (class_name, flags_class.process_member_definitions.__name__))
 
     def instantiate_special_member(name, default_name, bits):
         name = default_name if name is None else name
         return instantiate_and_register_member(name=name, bits=bits, special_member=True)
 
-    flags_class.__no_flags__ = instantiate_special_member(flags_class.__no_flags_name__, '__no_flags__', 0)
-    flags_class.__all_flags__ = instantiate_special_member(flags_class.__all_flags_name__, '__all_flags__', all_bits)
+    no_flags = instantiate_special_member(flags_class.__no_flags_name__, '__no_flags__', 0)
+    all_flags = instantiate_special_member(flags_class.__all_flags_name__, '__all_flags__', all_bits)
 
+    flags_class.__no_flags__ = no_flags
+    flags_class.__all_flags__ = all_flags
     flags_class.__all_bits__ = all_bits
+    # __members__ is the last one because is_flags_class_final() checks its presence.
+    for name, dictionary in (('__all_members__', all_members),
+                             ('__members_without_aliases__', members_without_aliases),
+                             ('__bits_to_properties__', bits_to_properties),
+                             ('__bits_to_instance__', bits_to_instance),
+                             ('__member_aliases__', member_aliases),
+                             ('__members__', members)):
+        type.__setattr__(flags_class, name, MappingProxyType(dictionary))
+
+    if flags_class.__dense_instance_table__:
+        if flags_class.__sparse_flags__:
+            raise ValueError("%s: __dense_instance_table__ and __sparse_flags__ can't be used together" % class_name)
+        if flags_class.__intern_cache_size__:
+            raise ValueError("%s: __dense_instance_table__ and __intern_cache_size__ can't be used together" %
+                             class_name)
+        flags_class.__instance_table__ = DenseInstanceTable(flags_class, bits_to_instance)
+    elif flags_class.__intern_cache_size__:
+        flags_class.__intern_cache__ = create_bounded_cache(flags_class.__intern_cache_policy__,
+                                                            flags_class.__intern_cache_size__,
+                                                            flags_class.__cache_stripes__)
+
+    # pylint: disable=protected-access
+    # This has to see the __contains__ of the class before the specialized operators replace it.
+    flags_class._install_member_descriptors()
+    if flags_class.__sparse_flags__:
+        flags_class._compile_sparse_methods(bits_to_instance)
+    else:
+        flags_class._compile_fast_operators(bits_to_instance)
+        flags_class._compile_fast_member_iteration()
+    flags_class._compile_fast_properties(bits_to_properties)
+    if flags_class.__str_cache_size__:
+        flags_class.__str_cache__ = create_bounded_cache(flags_class.__str_cache_policy__,
+                                                         flags_class.__str_cache_size__,
+                                                         flags_class.__cache_stripes__)
+        flags_class._install_str_cache()
+    if flags_class.__parse_cache_size__:
+        flags_class.__parse_cache__ = create_bounded_cache(flags_class.__parse_cache_policy__,
+                                                           flags_class.__parse_cache_size__,
+                                                           flags_class.__cache_stripes__)
+    flags_class._compile_parser()
 
     del flags_class.__writable_protected_flags_class_attributes__
+    if global_profilers:
+        attach_global_profilers(flags_class)
+
+
+def create_flags_class_with_members(class_name, class_dict, member_definitions, create_flags_class):
+    flags_class = create_flags_class(class_dict)
+    if flags_class.__lazy_members__:
+        # FlagsMeta.__getattr__ adds the members when a missing class attribute (e.g.: a member or
+        # __members__) is accessed for the first time. Iteration and instantiation do the same.
+        type.__setattr__(flags_class, '__lazy_member_definitions__', member_definitions)
+        # The protected attributes that have a default on FlagsMeta (e.g.: __all_bits__) never reach
+        # FlagsMeta.__getattr__ so they are shadowed by descriptors that materialize the class when read.
+        for name in PROTECTED_FLAGS_CLASS_ATTRIBUTES.intersection(vars(FlagsMeta)):
+            if not any(name in vars(base) for base in flags_class.__mro__):
+                type.__setattr__(flags_class, name, LazyFlagsClassAttribute(name))
+    else:
+        add_members_to_flags_class(flags_class, member_definitions)
     return flags_class
 
 
+# Serializes the materialization of lazy flags classes.
+lazy_materialization_lock = threading.RLock()
+# Lazy flags classes being materialized by the thread that holds lazy_materialization_lock.
+lazy_classes_being_materialized = set()
+
+
+class LazyFlagsClassAttribute:
+    """ Stands in for a FlagsMeta level default (e.g.: __all_bits__) on a lazy flags class until it is
+    materialized. While the members are being added it returns the FlagsMeta default. """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if materialize_lazy_flags_class(owner):
+            return getattr(owner, self.name)
+        return getattr(type(owner), self.name)
+
+
+def materialize_lazy_flags_class(flags_class):
+    """ Adds the members to a lazy flags class if it hasn't been done yet. Returns False if the
+    materialization of flags_class is already in progress in this thread, True otherwise. """
+    with lazy_materialization_lock:
+        member_definitions = vars(flags_class).get('__lazy_member_definitions__')
+        if member_definitions is None:
+            return True
+        if flags_class in lazy_classes_being_materialized:
+            return False
+        lazy_classes_being_materialized.add(flags_class)
+        try:
+            add_members_to_flags_class(flags_class, member_definitions)
+            type.__delattr__(flags_class, '__lazy_member_definitions__')
+            for name, value in list(vars(flags_class).items()):
+                if type(value) is LazyFlagsClassAttribute:
+                    type.__delattr__(flags_class, name)
+        except BaseException:
+            # The definitions stay in place so the next access raises the same error.
+            if '__writable_protected_flags_class_attributes__' in vars(flags_class):
+                type.__delattr__(flags_class, '__writable_protected_flags_class_attributes__')
+            raise
+        finally:
+            lazy_classes_being_materialized.discard(flags_class)
+        return True
+
+
+def is_member_name(flags_class, name):
+    # Assigning dunder attributes (e.g.: __module__) doesn't materialize lazy flags classes.
+    if name[:2] == '__' == name[-2:] and '__lazy_member_definitions__' in vars(flags_class):
+        return False
+    return name in getattr(flags_class, '__all_members__', {})
+
+
 class FlagData:
     pass
 
@@ -360,10 +873,21 @@ class FlagsMeta(type):
         else:
             raise TypeError("Can't instantiate flags class '%s' from value %r" % (cls.__name__, value))
 
+        instance_table = cls.__instance_table__
+        if instance_table is not None:
+            return instance_table.instances[bits]
         instance = cls.__bits_to_instance__.get(bits)
-        if instance:
+        if instance is not None:
             return instance
-        return super().__call__(bits)
+        intern_cache = cls.__intern_cache__
+        if intern_cache is None:
+            return super().__call__(bits)
+        # The operators of sparse flags classes intern their results by the stored (positions, inverted) pair.
+        key = sparse_bits_from_int(bits, cls.__all_bits__) if cls.__sparse_flags__ else bits
+        instance = intern_cache.get(key)
+        if instance is None:
+            instance = intern_cache.setdefault(key, super().__call__(bits))
+        return instance
 
     @classmethod
     def __prepare__(mcs, class_name, bases):
@@ -371,20 +895,22 @@ class FlagsMeta(type):
 
     def __delattr__(cls, name):
         if (name in PROTECTED_FLAGS_CLASS_ATTRIBUTES and name != '__writable_protected_flags_class_attributes__') or\
-                (name in getattr(cls, '__all_members__', {})):
+                is_member_name(cls, name):
             raise AttributeError("Can't delete protected attribute '%s'" % name)
         super().__delattr__(name)
 
     def __setattr__(cls, name, value):
         if name in PROTECTED_FLAGS_CLASS_ATTRIBUTES:
             if name in READONLY_PROTECTED_FLAGS_CLASS_ATTRIBUTES or\
-                    not getattr(cls, '__writable_protected_flags_class_attributes__', False):
+                    not vars(cls).get('__writable_protected_flags_class_attributes__', False):
                 raise AttributeError("Can't assign protected attribute '%s'" % name)
-        elif name in getattr(cls, '__all_members__', {}):
+        elif is_member_name(cls, name):
             raise AttributeError("Can't assign protected attribute '%s'" % name)
         super().__setattr__(name, value)
 
     def __getattr__(cls, name):
+        if '__lazy_member_definitions__' in vars(cls) and materialize_lazy_flags_class(cls):
+            return getattr(cls, name)
         try:
             return super().__getattribute__('__all_members__')[name]
         except KeyError:
@@ -450,13 +976,20 @@ class FlagsMeta(type):
                 raise TypeError("Expected an int value as the bits of flag '%s', received %r" % (name, bits))
 
         # auto-assigning unused bits to members without custom defined bits
-        bit = 1
-        for index in auto_flags:
-            while bit & all_bits:
-                bit <<= 1
-            name, data = members[index]
-            members[index] = name, bit, data
-            bit <<= 1
+        if auto_flags:
+            # The positions at and above the bit_length() of a negative all_bits are all set (sign bits).
+            bit_length = all_bits.bit_length()
+            used_positions = set(iter_set_bit_positions(all_bits & ((1 << bit_length) - 1)))
+            position = 0
+            for index in auto_flags:
+                while position in used_positions:
+                    position += 1
+                name, data = members[index]
+                if all_bits < 0 and position >= bit_length:
+                    raise ValueError("Can't auto-assign bits to flag '%s' because other flags with negative bits "
+                                     "use all the remaining bits" % name)
+                members[index] = name, 1 << position, data
+                position += 1
 
         return members
 
@@ -468,6 +1001,33 @@ class FlagsMeta(type):
     __dotted_single_flag_str__ = True
     __pickle_int_flags__ = False
     __all_bits__ = -1
+    # A positive __intern_cache_size__ enables the interning of instances that aren't members (e.g.: the results
+    # of flags arithmetic). __intern_cache_policy__ is the eviction policy of the cache: 'lru' or 'clock'.
+    __intern_cache_size__ = 0
+    __intern_cache_policy__ = 'lru'
+    __intern_cache__ = None
+    # Setting __dense_instance_table__ to True precreates an instance for every possible bits value.
+    __dense_instance_table__ = False
+    __instance_table__ = None
+    # A positive __str_cache_size__ enables the caching of the output of __str__, __repr__ and to_simple_str.
+    __str_cache_size__ = 0
+    __str_cache_policy__ = 'lru'
+    __str_cache__ = None
+    # bits_from_str() memoizes the bits of previously parsed strings in a cache of this size.
+    __parse_cache_size__ = 256
+    __parse_cache_policy__ = 'clock'
+    __parse_cache__ = None
+    # The intern, str and parse caches are split into this many independently locked stripes by the hash of
+    # their keys to reduce lock contention between threads (e.g.: on free-threaded python builds).
+    __cache_stripes__ = 1
+    # Setting __lazy_members__ to True defers the creation of the members until the first use of the class.
+    __lazy_members__ = False
+    # Wide mode (for classes with thousands of members) indexes the members by bit position instead of hashing
+    # their bits and iterates over the set bits word by word. None: enabled if the members need more than
+    # WIDE_FLAGS_MIN_BITS bits. This attribute holds the actual mode (True/False) after creating the members.
+    __wide_flags__ = None
+    # The instances of sparse flags classes store the positions of their set (or unset) bits instead of an int.
+    __sparse_flags__ = False
 
     # TODO: utility method to fill the flag members to a namespace, and another utility that can fill
     # them to a module (a specific case of namespaces)
@@ -488,7 +1048,10 @@ class FlagsArithmeticMixin:
     def __new__(cls, bits):
         instance = super().__new__(cls)
         # pylint: disable=protected-access
-        instance.__bits = bits & cls.__all_bits__
+        all_bits = cls.__all_bits__
+        # __all_bits__ is -1 while the members are being created. In that case we don't copy
+        # the bits because the copies would double the memory usage of wide flags classes.
+        instance.__bits = bits if all_bits == -1 else bits & all_bits
         return instance
 
     def __int__(self):
@@ -570,6 +1133,477 @@ class FlagsArithmeticMixin:
     def __invert__(self):
         return self.__create_flags_instance(self.__bits ^ type(self).__all_bits__)
 
+    @classmethod
+    def _compile_fast_operators(cls, bits_to_instance):
+        """
+        Installs operators specialized for cls (a final flags class) in place of the generic ones above.
+        The generic operators go through the operator_requires_type_identity wrapper and create their
+        results through FlagsMeta.__call__. The specialized ones perform the type identity check inline
+        and look up the result in bits_to_instance (the dict behind cls.__bits_to_instance__) directly.
+        Classes with a dense instance table look up every result in cls.__instance_table__ instead, and
+        results that aren't members are interned in cls.__intern_cache__ if the class has one.
+        Operators that have been overridden by cls or by one of its base classes are left intact.
+        """
+        flags_class = cls
+        all_bits = cls.__all_bits__
+        if cls.__instance_table__ is not None:
+            # Never returns None so the operators below don't have to create instances.
+            get_instance = cls.__instance_table__.instances.__getitem__
+        else:
+            get_instance = bits_to_instance.get
+
+        if cls.__new__ is FlagsArithmeticMixin.__new__ and cls.__init__ is object.__init__:
+            object_new = object.__new__
+
+            def new_instance(bits):
+                instance = object_new(flags_class)
+                instance.__bits = bits
+                return instance
+        else:
+            def new_instance(bits):
+                return type.__call__(flags_class, bits)
+
+        intern_cache = cls.__intern_cache__
+        if intern_cache is None:
+            create_instance = new_instance
+        else:
+            cache_get = intern_cache.get
+            cache_setdefault = intern_cache.setdefault
+
+            def create_instance(bits):
+                instance = cache_get(bits)
+                if instance is None:
+                    instance = cache_setdefault(bits, new_instance(bits))
+                return instance
+
+        def __or__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            bits = self.__bits | other.__bits
+            if bits == self.__bits:
+                return self
+            instance = get_instance(bits)
+            return create_instance(bits) if instance is None else instance
+
+        def __xor__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            bits = self.__bits ^ other.__bits
+            if bits == self.__bits:
+                return self
+            instance = get_instance(bits)
+            return create_instance(bits) if instance is None else instance
+
+        def __and__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            bits = self.__bits & other.__bits
+            if bits == self.__bits:
+                return self
+            instance = get_instance(bits)
+            return create_instance(bits) if instance is None else instance
+
+        def __sub__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            bits = self.__bits & ~other.__bits
+            if bits == self.__bits:
+                return self
+            instance = get_instance(bits)
+            return create_instance(bits) if instance is None else instance
+
+        def __invert__(self):
+            bits = self.__bits ^ all_bits
+            instance = get_instance(bits)
+            return create_instance(bits) if instance is None else instance
+
+        def __contains__(self, item):
+            if type(item) is not flags_class:
+                return False
+            return item.__bits == (self.__bits & item.__bits)
+
+        def __eq__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return self.__bits == other.__bits
+
+        def __ne__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return self.__bits != other.__bits
+
+        def __ge__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return other.__bits == (self.__bits & other.__bits)
+
+        def __gt__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return self.__bits != other.__bits and other.__bits == (self.__bits & other.__bits)
+
+        def __le__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return self.__bits == (self.__bits & other.__bits)
+
+        def __lt__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return self.__bits != other.__bits and self.__bits == (self.__bits & other.__bits)
+
+        operators = (__or__, __xor__, __and__, __sub__, __invert__, __contains__,
+                     __eq__, __ne__, __ge__, __gt__, __le__, __lt__)
+        for function in operators:
+            name = function.__name__
+            if getattr(cls, name) is not getattr(FlagsArithmeticMixin, name):
+                continue
+            generic_function = getattr(FlagsArithmeticMixin, name)
+            function.__qualname__ = '%s.%s' % (cls.__qualname__, name)
+            function.__doc__ = generic_function.__doc__
+            setattr(cls, name, function)
+
+    @classmethod
+    def _install_sparse_storage(cls):
+        """
+        The instances of sparse flags classes (__sparse_flags__ = True) store the (positions, inverted) pair
+        returned by sparse_bits_from_int() instead of an int. This method installs the methods that have to
+        understand this storage while the members are being created. _compile_sparse_methods() installs the rest.
+        """
+        flags_class = cls
+        wrapped_new = cls.__new__
+
+        # Wraps the __new__ of the class (including a custom one) to convert the int stored by
+        # FlagsArithmeticMixin.__new__ so the instances of non-sparse classes don't pay for the conversion.
+        @functools.wraps(wrapped_new)
+        def __new__(cls, bits):
+            instance = wrapped_new(cls, bits)
+            instance.__bits = sparse_bits_from_int(instance.__bits, cls.__all_bits__)
+            return instance
+        __new__.__qualname__ = '%s.__new__' % cls.__qualname__
+        cls.__new__ = staticmethod(__new__)
+
+        def __int__(self):
+            positions, inverted = self.__bits
+            bits = int_from_bit_positions(positions)
+            return flags_class.__all_bits__ ^ bits if inverted else bits
+
+        def __bool__(self):
+            positions, inverted = self.__bits
+            # An inverted instance has more than half of the bits of __all_bits__.
+            return inverted or bool(positions)
+
+        def __hash__(self):
+            return hash(self.__bits) ^ hash(flags_class)
+
+        for function in (__int__, __bool__, __hash__):
+            name = function.__name__
+            if getattr(cls, name) is not getattr(Flags, name):
+                continue
+            function.__qualname__ = '%s.%s' % (cls.__qualname__, name)
+            setattr(cls, name, function)
+
+    @classmethod
+    def _compile_sparse_methods(cls, bits_to_instance):
+        """
+        Installs the flags arithmetic, comparison and member iteration methods of a sparse flags class.
+        These work with set operations on the stored positions so their cost depends on the number of stored
+        positions instead of the width of the class: e.g.: ~ simply flips the inverted flag of the result.
+        The instances created while the members were being created are converted to the final representation.
+        """
+        flags_class = cls
+        all_positions = frozenset(iter_set_bit_positions(cls.__all_bits__))
+        total = len(all_positions)
+
+        def normalize(positions, inverted):
+            # Returns the single representation of the value.
+            if inverted:
+                if 2 * len(positions) >= total:
+                    return all_positions - positions, False
+            elif 2 * len(positions) > total:
+                return all_positions - positions, True
+            return positions, inverted
+
+        for instance in bits_to_instance.values():
+            instance.__bits = normalize(*instance.__bits)
+        instance_by_sparse_bits = {instance.__bits: instance for instance in bits_to_instance.values()}
+        get_instance = instance_by_sparse_bits.get
+
+        if cls.__new__.__wrapped__ is FlagsArithmeticMixin.__new__ and cls.__init__ is object.__init__:
+            object_new = object.__new__
+
+            def new_instance(sparse_bits):
+                instance = object_new(flags_class)
+                instance.__bits = sparse_bits
+                return instance
+        else:
+            def new_instance(sparse_bits):
+                positions, inverted = sparse_bits
+                bits = int_from_bit_positions(positions)
+                return type.__call__(flags_class, flags_class.__all_bits__ ^ bits if inverted else bits)
+
+        intern_cache = cls.__intern_cache__
+        if intern_cache is None:
+            create_instance = new_instance
+        else:
+            cache_get = intern_cache.get
+            cache_setdefault = intern_cache.setdefault
+
+            def create_instance(sparse_bits):
+                instance = cache_get(sparse_bits)
+                if instance is None:
+                    instance = cache_setdefault(sparse_bits, new_instance(sparse_bits))
+                return instance
+
+        def result(self, positions, inverted):
+            sparse_bits = normalize(positions, inverted)
+            if sparse_bits == self.__bits:
+                return self
+            instance = get_instance(sparse_bits)
+            return create_instance(sparse_bits) if instance is None else instance
+
+        def intersection(a, a_inverted, b, b_inverted):
+            # An inverted operand is the complement of its positions (De Morgan).
+            if a_inverted:
+                return (a | b, True) if b_inverted else (b - a, False)
+            return (a - b, False) if b_inverted else (a & b, False)
+
+        def is_subset(sparse_bits, other_sparse_bits):
+            a, a_inverted = sparse_bits
+            b, b_inverted = other_sparse_bits
+            if a_inverted:
+                # A normalized inverted value has more bits than any normalized value that isn't inverted.
+                return b_inverted and b <= a
+            return a.isdisjoint(b) if b_inverted else a <= b
+
+        def __or__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            a, a_inverted = self.__bits
+            b, b_inverted = other.__bits
+            positions, inverted = intersection(a, not a_inverted, b, not b_inverted)
+            return result(self, positions, not inverted)
+
+        def __xor__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            a, a_inverted = self.__bits
+            b, b_inverted = other.__bits
+            return result(self, a ^ b, a_inverted != b_inverted)
+
+        def __and__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            a, a_inverted = self.__bits
+            b, b_inverted = other.__bits
+            return result(self, *intersection(a, a_inverted, b, b_inverted))
+
+        def __sub__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            a, a_inverted = self.__bits
+            b, b_inverted = other.__bits
+            return result(self, *intersection(a, a_inverted, b, not b_inverted))
+
+        def __invert__(self):
+            positions, inverted = self.__bits
+            return result(self, positions, not inverted)
+
+        def __contains__(self, item):
+            if type(item) is not flags_class:
+                return False
+            return is_subset(item.__bits, self.__bits)
+
+        def __eq__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return self.__bits == other.__bits
+
+        def __ne__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return self.__bits != other.__bits
+
+        def __ge__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return is_subset(other.__bits, self.__bits)
+
+        def __gt__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return self.__bits != other.__bits and is_subset(other.__bits, self.__bits)
+
+        def __le__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return is_subset(self.__bits, other.__bits)
+
+        def __lt__(self, other):
+            if type(other) is not flags_class:
+                return NotImplemented
+            return self.__bits != other.__bits and is_subset(self.__bits, other.__bits)
+
+        functions = [__or__, __xor__, __and__, __sub__, __invert__, __contains__,
+                     __eq__, __ne__, __ge__, __gt__, __le__, __lt__]
+
+        # Every stored position belongs to exactly one member if the members are disjoint single bits.
+        member_by_position = collections.OrderedDict()
+        for member in cls.__members_without_aliases__.values():
+            positions, inverted = member.__bits
+            if inverted or len(positions) != 1 or next(iter(positions)) in member_by_position:
+                break
+            member_by_position[next(iter(positions))] = member
+        else:
+            position_to_index = {position: index for index, position in enumerate(member_by_position)}
+
+            def sorted_members(sparse_bits, reverse):
+                positions, inverted = sparse_bits
+                if inverted:
+                    positions = all_positions - positions
+                positions = sorted(positions, key=position_to_index.__getitem__, reverse=reverse)
+                return [member_by_position[position] for position in positions]
+
+            def __len__(self):
+                positions, inverted = self.__bits
+                return total - len(positions) if inverted else len(positions)
+
+            def __iter__(self):
+                return iter(sorted_members(self.__bits, False))
+
+            def __reversed__(self):
+                return iter(sorted_members(self.__bits, True))
+
+            functions += [__len__, __iter__, __reversed__]
+
+        for function in functions:
+            name = function.__name__
+            if getattr(cls, name) is not getattr(Flags, name):
+                continue
+            function.__qualname__ = '%s.%s' % (cls.__qualname__, name)
+            function.__doc__ = getattr(Flags, name).__doc__
+            setattr(cls, name, function)
+
+
+# The maximum number of distinct inputs remembered by the batch conversion methods of Flags.
+# This keeps the memory usage of the conversion of a long stream of values constant.
+BATCH_MEMO_SIZE = 4096
+
+
+def memoized_map(function, iterable, maxsize=BATCH_MEMO_SIZE):
+    """ Similar to map() but calls function only once for the first maxsize distinct items. """
+    memo = {}
+    for item in iterable:
+        # function is called outside of the except clauses so its errors aren't chained to a KeyError or TypeError
+        try:
+            result = memo.get(item, UNDEFINED)
+            hashable = True
+        except TypeError:
+            # unhashable item, function will probably raise an error
+            result = UNDEFINED
+            hashable = False
+        if result is UNDEFINED:
+            result = function(item)
+            if hashable and len(memo) < maxsize:
+                memo[item] = result
+        yield result
+
+
+# The number of items the aggregation classmethods of Flags (count_members(), reduce_or(), ...) convert to bits
+# and count at once.
+AGGREGATION_CHUNK_SIZE = 4096
+
+
+def iter_bits_chunks(flags_class, flags_instances, chunk_size):
+    """ Yields the bits of flags_instances (instances of flags_class) in lists of chunk_size items. """
+    get_bits = create_bits_getter(flags_class)
+    iterator = iter(flags_instances)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield bits_of_chunk(flags_class, chunk, get_bits)
+
+
+async def iter_bits_chunks_async(flags_class, flags_instances, chunk_size):
+    get_bits = create_bits_getter(flags_class)
+    chunk = []
+    async for flags in flags_instances:
+        chunk.append(flags)
+        if len(chunk) >= chunk_size:
+            yield bits_of_chunk(flags_class, chunk, get_bits)
+            chunk = []
+    if chunk:
+        yield bits_of_chunk(flags_class, chunk, get_bits)
+
+
+def create_bits_getter(flags_class):
+    """ Returns a function that is equivalent to int() on the instances of flags_class. """
+    if getattr(flags_class, '__int__') is FlagsArithmeticMixin.__int__:
+        # Reading the slot directly saves a python level __int__ call per instance.
+        return operator.attrgetter('_FlagsArithmeticMixin__bits')
+    return int
+
+
+def bits_of_chunk(flags_class, chunk, get_bits):
+    types = set(map(type, chunk))
+    if len(types) != 1 or flags_class not in types:
+        flags = next(flags for flags in chunk if type(flags) is not flags_class)
+        raise TypeError("Expected an instance of %r, received %r" % (flags_class, flags))
+    return list(map(get_bits, chunk))
+
+
+def create_contained_member_names_function(flags_class):
+    """ Returns a function that returns the names of the members (without aliases) of flags_class contained by
+    the given bits. Classes with lots of members that are disjoint positive single bits visit only the set bits. """
+    members = [(name, int(member)) for name, member in flags_class.__members_without_aliases__.items()]
+    if len(members) > 64:
+        name_by_position = {}
+        for name, member_bits in members:
+            position = member_bits.bit_length() - 1
+            if member_bits <= 0 or popcount(member_bits) != 1 or position in name_by_position:
+                break
+            name_by_position[position] = name
+        else:
+            return lambda bits: [name_by_position[position] for position in iter_set_bit_positions(bits)]
+    return lambda bits: [name for name, member_bits in members if bits & member_bits == member_bits]
+
+
+def aggregate(flags_class, flags_instances, consume_chunk, get_result, chunk_size):
+    """
+    Feeds the bits of flags_instances to consume_chunk in chunks and returns get_result(). If flags_instances is an
+    async iterable then this returns an awaitable instead of the result.
+    """
+    if hasattr(flags_instances, '__aiter__'):
+        async def aggregate_async():
+            async for bits_chunk in iter_bits_chunks_async(flags_class, flags_instances, chunk_size):
+                consume_chunk(bits_chunk)
+            return get_result()
+        return aggregate_async()
+    for bits_chunk in iter_bits_chunks(flags_class, flags_instances, chunk_size):
+        consume_chunk(bits_chunk)
+    return get_result()
+
+
+class MemberTest:
+    """ The descriptor of a member name on a final flags class: returns the member when it is accessed through the
+    class and tells whether an instance contains the member when it is accessed through an instance. """
+    __slots__ = ('member', 'bits', 'get_bits')
+
+    def __init__(self, member, get_bits):
+        self.member = member
+        self.bits = get_bits(member)
+        self.get_bits = get_bits
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self.member
+        bits = self.bits
+        return self.get_bits(instance) & bits == bits
+
+    def __repr__(self):
+        return '<MemberTest %r>' % (self.member,)
+
 
 # This is used by FlagsMeta to detect whether the flags class currently being created is Flags.
 Flags = None
@@ -604,12 +1638,57 @@ class Flags(FlagsArithmeticMixin, metaclass=FlagsMeta):
     @property
     def name(self):
         properties = self.properties
-        return self.properties.name if properties else None
+        return properties.name if properties else None
 
     @property
     def data(self):
         properties = self.properties
-        return self.properties.data if properties else UNDEFINED
+        return properties.data if properties else UNDEFINED
+
+    @classmethod
+    def _compile_fast_properties(cls, bits_to_properties):
+        """
+        Installs is_member, properties, name and data properties specialized for cls (a final flags class).
+        The generic ones call int() and look up the bits of the instance in __bits_to_properties__. The
+        specialized ones read the bits of the instance directly (unless __int__ has been overridden) and look
+        them up in plain dicts that map the bits of the members to their properties, names and data. Wide
+        classes use BitsKeyedDicts to avoid hashing wide ints.
+        Properties that have been overridden by cls or by one of its base classes are left intact.
+        """
+        get_bits = create_bits_getter(cls)
+        table_class = BitsKeyedDict if cls.__wide_flags__ else dict
+        properties_table = table_class()
+        name_table = table_class()
+        data_table = table_class()
+        for bits, member_properties in bits_to_properties.items():
+            properties_table[bits] = member_properties
+            name_table[bits] = member_properties.name
+            data_table[bits] = member_properties.data
+        lookup_properties = properties_table.get
+        lookup_name = name_table.get
+        lookup_data = data_table.get
+
+        def is_member_getter(self):
+            return get_bits(self) in properties_table
+
+        def properties_getter(self):
+            return lookup_properties(get_bits(self))
+
+        def name_getter(self):
+            return lookup_name(get_bits(self))
+
+        def data_getter(self):
+            return lookup_data(get_bits(self), UNDEFINED)
+
+        getters = (('is_member', is_member_getter), ('properties', properties_getter), ('name', name_getter),
+                   ('data', data_getter))
+        for property_name, getter in getters:
+            generic_property = getattr(Flags, property_name)
+            if getattr(cls, property_name) is not generic_property:
+                continue
+            getter.__name__ = property_name
+            getter.__qualname__ = '%s.%s' % (cls.__qualname__, property_name)
+            type.__setattr__(cls, property_name, property(getter, doc=generic_property.__doc__))
 
     def __getattr__(self, name):
         try:
@@ -618,6 +1697,27 @@ class Flags(FlagsArithmeticMixin, metaclass=FlagsMeta):
             raise AttributeError(name)
         return member in self
 
+    @classmethod
+    def _install_member_descriptors(cls):
+        """
+        Installs a MemberTest descriptor for every member name (including the aliases) of cls (a final flags class)
+        so ``flags.member_name`` tests the bits of the member directly instead of failing the normal attribute
+        lookup and calling __getattr__. Names that would shadow an attribute of cls or of its metaclass are skipped.
+        All names are skipped if cls overrides __getattr__ or __contains__ (the descriptors would bypass them) and
+        in case of sparse classes whose bits would have to be converted to an int for every test. These are served
+        by __getattr__ and __contains__ as before. Has to be called before the operators of cls are specialized.
+        """
+        if cls.__getattr__ is not Flags.__getattr__ or cls.__contains__ is not FlagsArithmeticMixin.__contains__ or\
+                cls.__sparse_flags__:
+            return
+        get_bits = create_bits_getter(cls)
+        reserved_names = set()
+        for base in cls.__mro__ + type(cls).__mro__:
+            reserved_names.update(vars(base))
+        for name, member in cls.__members__.items():
+            if name not in reserved_names:
+                type.__setattr__(cls, name, MemberTest(member, get_bits))
+
     def __iter__(self):
         members = type(self).__members_without_aliases__.values()
         return (member for member in members if member in self)
@@ -629,6 +1729,122 @@ class Flags(FlagsArithmeticMixin, metaclass=FlagsMeta):
     def __len__(self):
         return sum(1 for _ in self)
 
+    @classmethod
+    def _compile_fast_member_iteration(cls):
+        """
+        If the members (without aliases) of cls are disjoint positive single bits then every bit of an instance
+        belongs to exactly one member. In this case this method installs a __len__ that counts the set bits
+        and an __iter__ and __reversed__ that visit only the set bits through a bit-to-member index instead
+        of testing every member. Classes with overlapping or multi-bit members keep the generic methods.
+        """
+        member_by_position = collections.OrderedDict()
+        for member in cls.__members_without_aliases__.values():
+            bits = int(member)
+            position = bits.bit_length() - 1
+            if bits <= 0 or bits & (bits - 1) or position in member_by_position:
+                return
+            member_by_position[position] = member
+        positions = list(member_by_position)
+        # If the members have been declared in ascending bit order then visiting
+        # the bits in ascending order yields the members in declaration order.
+        ascending = positions == sorted(positions)
+
+        def __len__(self):
+            return popcount(int(self))
+
+        if cls.__wide_flags__:
+            # Wide mode: looking up the members by bit position avoids hashing wide ints.
+            if ascending:
+                def __iter__(self):
+                    for position in iter_set_bit_positions(int(self)):
+                        yield member_by_position[position]
+
+                def __reversed__(self):
+                    for position in iter_set_bit_positions(int(self), reverse=True):
+                        yield member_by_position[position]
+            else:
+                position_to_index = {position: index for index, position in enumerate(positions)}
+
+                def sorted_members(bits, reverse):
+                    set_positions = sorted(iter_set_bit_positions(bits), key=position_to_index.__getitem__,
+                                           reverse=reverse)
+                    return [member_by_position[position] for position in set_positions]
+
+                def __iter__(self):
+                    return iter(sorted_members(int(self), False))
+
+                def __reversed__(self):
+                    return iter(sorted_members(int(self), True))
+        elif ascending:
+            bit_to_member = {1 << position: member for position, member in member_by_position.items()}
+
+            def __iter__(self):
+                bits = int(self)
+                while bits:
+                    lowest_bit = bits & -bits
+                    yield bit_to_member[lowest_bit]
+                    bits ^= lowest_bit
+
+            def __reversed__(self):
+                bits = int(self)
+                while bits:
+                    highest_bit = 1 << (bits.bit_length() - 1)
+                    yield bit_to_member[highest_bit]
+                    bits ^= highest_bit
+        else:
+            bit_to_member = {1 << position: member for position, member in member_by_position.items()}
+            bit_to_index = {bits: index for index, bits in enumerate(bit_to_member)}
+
+            def sorted_members(bits, reverse):
+                set_bits = []
+                while bits:
+                    lowest_bit = bits & -bits
+                    set_bits.append(lowest_bit)
+                    bits ^= lowest_bit
+                set_bits.sort(key=bit_to_index.__getitem__, reverse=reverse)
+                return [bit_to_member[bit] for bit in set_bits]
+
+            def __iter__(self):
+                return iter(sorted_members(int(self), False))
+
+            def __reversed__(self):
+                return iter(sorted_members(int(self), True))
+
+        for function in (__len__, __iter__, __reversed__):
+            name = function.__name__
+            if getattr(cls, name) is not getattr(Flags, name):
+                continue
+            function.__qualname__ = '%s.%s' % (cls.__qualname__, name)
+            setattr(cls, name, function)
+
+    @classmethod
+    def _install_str_cache(cls):
+        """ Wraps the __str__, __repr__ and to_simple_str methods of cls (a final flags class) so they
+        memoize their output in cls.__str_cache__. The cache maps bits to a list that stores the output
+        of the three methods. These lists are filled lazily and filling them concurrently is harmless
+        because every thread would store the same strings. """
+        cache_get = cls.__str_cache__.get
+        cache_setdefault = cls.__str_cache__.setdefault
+
+        def create_cached_method(name, index):
+            uncached_method = getattr(cls, name)
+
+            def cached_method(self):
+                bits = int(self)
+                strings = cache_get(bits)
+                if strings is None:
+                    strings = cache_setdefault(bits, [None, None, None])
+                string = strings[index]
+                if string is None:
+                    string = strings[index] = uncached_method(self)
+                return string
+            functools.update_wrapper(cached_method, uncached_method)
+            cached_method.__qualname__ = '%s.%s' % (cls.__qualname__, name)
+            return cached_method
+
+        for index, name in enumerate(('__str__', '__repr__', 'to_simple_str')):
+            setattr(cls, name, create_cached_method(name, index))
+
     def __hash__(self):
         return int(self) ^ hash(type(self))
 
@@ -676,6 +1892,165 @@ class Flags(FlagsArithmeticMixin, metaclass=FlagsMeta):
             raise TypeError("Expected an str instance, received %r" % (s,))
         return cls(cls.bits_from_str(s))
 
+    @classmethod
+    def bits_from_str_many(cls, strings):
+        """ A generator that converts an iterable of strings (the output of to_simple_str() or __str__())
+        into integers (bits). Repeated strings are parsed only once. """
+        return memoized_map(cls.bits_from_str, strings)
+
+    @classmethod
+    def from_str_many(cls, strings):
+        """ A generator that converts an iterable of strings (the output of to_simple_str() or __str__())
+        into flags instances. Repeated strings are parsed only once. """
+        return memoized_map(cls.from_str, strings)
+
+    @classmethod
+    def to_str_many(cls, flags_instances):
+        """ A generator that converts an iterable of instances of this flags class into simple strings
+        (see to_simple_str()). Each distinct value is converted only once. """
+        memo = {}
+        for flags in flags_instances:
+            if type(flags) is not cls:
+                raise TypeError("Expected an instance of %r, received %r" % (cls, flags))
+            bits = int(flags)
+            s = memo.get(bits)
+            if s is None:
+                s = flags.to_simple_str()
+                if len(memo) < BATCH_MEMO_SIZE:
+                    memo[bits] = s
+            yield s
+
+    @classmethod
+    def count_members(cls, flags_instances, chunk_size=AGGREGATION_CHUNK_SIZE):
+        """
+        Counts the instances that contain each member. Returns a {member_name: count} dict with all members
+        (without aliases) in definition order. Accepts an iterable or an async iterable of instances of this
+        flags class, in the latter case the return value is an awaitable. The distinct values of each chunk
+        of chunk_size items are tested against the members only once.
+        """
+        contained_member_names = create_contained_member_names_function(cls)
+        counts = dict.fromkeys(cls.__members_without_aliases__, 0)
+
+        def consume_chunk(bits_chunk):
+            for bits, count in collections.Counter(bits_chunk).items():
+                for name in contained_member_names(bits):
+                    counts[name] += count
+        return aggregate(cls, flags_instances, consume_chunk, lambda: counts, chunk_size)
+
+    @classmethod
+    def cooccurrence(cls, flags_instances, chunk_size=AGGREGATION_CHUNK_SIZE):
+        """
+        Counts the instances that contain both members of each pair of members. Returns a
+        {member_name: {member_name: count}} dict, the diagonal holds the results of count_members().
+        Accepts iterables and async iterables like count_members().
+        """
+        contained_member_names = create_contained_member_names_function(cls)
+        matrix = {name: dict.fromkeys(cls.__members_without_aliases__, 0) for name in cls.__members_without_aliases__}
+
+        def consume_chunk(bits_chunk):
+            for bits, count in collections.Counter(bits_chunk).items():
+                contained = contained_member_names(bits)
+                for name in contained:
+                    row = matrix[name]
+                    for other_name in contained:
+                        row[other_name] += count
+        return aggregate(cls, flags_instances, consume_chunk, lambda: matrix, chunk_size)
+
+    @classmethod
+    def reduce_or(cls, flags_instances, chunk_size=AGGREGATION_CHUNK_SIZE):
+        """ The union of the given instances (no_flags if there are none). Accepts iterables and async
+        iterables like count_members(). """
+        result = [0]
+
+        def consume_chunk(bits_chunk):
+            result[0] = functools.reduce(operator.or_, bits_chunk, result[0])
+        return aggregate(cls, flags_instances, consume_chunk, lambda: cls(result[0]), chunk_size)
+
+    @classmethod
+    def reduce_and(cls, flags_instances, chunk_size=AGGREGATION_CHUNK_SIZE):
+        """ The intersection of the given instances (all_flags if there are none). Accepts iterables and async
+        iterables like count_members(). """
+        result = [cls.__all_bits__]
+
+        def consume_chunk(bits_chunk):
+            result[0] = functools.reduce(operator.and_, bits_chunk, result[0])
+        return aggregate(cls, flags_instances, consume_chunk, lambda: cls(result[0]), chunk_size)
+
+    @classmethod
+    def _compile_parser(cls):
+        """
+        Installs bits_from_simple_str and bits_from_str classmethods specialized for cls (a final flags class).
+        These look up whole strings in tables: every member name (including the aliases and the special
+        members) and the 'ClassName.name' and 'ClassName(name)' forms of them. bits_from_simple_str
+        looks up the names of other inputs in a plain dict and bits_from_str memoizes the result of other inputs
+        in cls.__parse_cache__ (if the class has one). Invalid inputs are handed over to the generic methods
+        to raise the usual errors.
+        """
+        generic_bits_from_simple_str = Flags.bits_from_simple_str.__func__
+        generic_bits_from_str = Flags.bits_from_str.__func__
+        if cls.bits_from_simple_str.__func__ is not generic_bits_from_simple_str or \
+                cls.bits_from_str.__func__ is not generic_bits_from_str:
+            return
+
+        # The generic methods skip empty names so mapping '' to zero has the same effect.
+        name_to_bits = {'': 0}
+        name_to_bits.update((name, int(member)) for name, member in cls.__all_members__.items())
+        name_to_bits_get = name_to_bits.get
+
+        def str_table_get(s):
+            # The table is built and this function is replaced by the get method of the table on first use.
+            # Parsing the candidates with the generic method guarantees identical results even in case of
+            # strange member names (e.g.: names that start with the name of the class).
+            nonlocal str_table_get
+            table = {}
+            for candidate in itertools.chain(name_to_bits,
+                                             ('%s.%s' % (cls.__name__, name) for name in name_to_bits),
+                                             ('%s(%s)' % (cls.__name__, name) for name in name_to_bits)):
+                try:
+                    table[candidate] = generic_bits_from_str(cls, candidate)
+                except ValueError:
+                    pass
+            str_table_get = table.get
+            return str_table_get(s)
+
+        def bits_from_simple_str(cls_, s):
+            bits = name_to_bits_get(s) if type(s) is str else None
+            if bits is not None:
+                return bits
+            bits = 0
+            try:
+                for member_name in s.split('|'):
+                    bits |= name_to_bits_get(member_name.strip())
+            except (TypeError, AttributeError):
+                bits = None
+            # Called outside of the except clause so the error it raises isn't chained to our TypeError.
+            return generic_bits_from_simple_str(cls_, s) if bits is None else bits
+
+        parse_cache = cls.__parse_cache__
+        if parse_cache is None:
+            def bits_from_str(cls_, s):
+                bits = str_table_get(s) if type(s) is str else None
+                return generic_bits_from_str(cls_, s) if bits is None else bits
+        else:
+            cache_get = parse_cache.get
+            cache_setdefault = parse_cache.setdefault
+
+            def bits_from_str(cls_, s):
+                if type(s) is not str:
+                    return generic_bits_from_str(cls_, s)
+                bits = str_table_get(s)
+                if bits is None:
+                    bits = cache_get(s)
+                    if bits is None:
+                        bits = cache_setdefault(s, generic_bits_from_str(cls_, s))
+                return bits
+
+        for function, generic_function in ((bits_from_simple_str, generic_bits_from_simple_str),
+                                           (bits_from_str, generic_bits_from_str)):
+            functools.update_wrapper(function, generic_function)
+            function.__qualname__ = '%s.%s' % (cls.__qualname__, function.__name__)
+            setattr(cls, function.__name__, classmethod(function))
+
     @classmethod
     def bits_from_simple_str(cls, s):
         member_names = (name.strip() for name in s.split('|'))
@@ -711,3 +2086,1405 @@ class Flags(FlagsArithmeticMixin, metaclass=FlagsMeta):
         except KeyError as ex:
             raise ValueError("%s.%s: Invalid flag name '%s' in input: %r" % (cls.__name__, cls.bits_from_str.__name__,
                                                                              ex.args[0], s))
+
+
+# The widest unsigned array.array item type ('Q') holds this many bits.
+FLAGS_ARRAY_MAX_BITS = 64
+
+
+def array_typecode_for_bits(all_bits):
+    """ Returns the typecode of the smallest unsigned array.array item type that can hold all_bits. """
+    bit_length = all_bits.bit_length()
+    for typecode in 'BHILQ':
+        if array.array(typecode).itemsize * 8 >= bit_length:
+            return typecode
+    raise ValueError("FlagsArray supports only flags classes with at most %s bits, "
+                     "the bits of this flags class occupy %s bits" % (FLAGS_ARRAY_MAX_BITS, bit_length))
+
+
+class FlagsArray(MutableSequence):
+    """
+    A mutable sequence of instances of a single flags class. Instead of references to flags instances it stores
+    the bits of its items in a contiguous array.array buffer so the items don't need individual flags instances.
+    The bitwise operators (``|``, ``&``, ``^``, ``-`` and ``~``) work elementwise and return a new FlagsArray
+    without creating flags instances. The other operand has to be either a FlagsArray of the same flags class
+    and with the same length or an instance of exactly the same flags class (that is combined with each item).
+    """
+    __slots__ = ('__flags_class', '__bits')
+
+    def __init__(self, flags_class, iterable=()):
+        if not isinstance(flags_class, FlagsMeta) or not is_flags_class_final(flags_class):
+            raise TypeError("Expected a flags class with members, received %r" % (flags_class,))
+        if flags_class.__all_bits__ < 0:
+            raise ValueError("%s: a FlagsArray can't be used with members that have negative bits" %
+                             (flags_class.__name__,))
+        self.__flags_class = flags_class
+        self.__bits = array.array(array_typecode_for_bits(flags_class.__all_bits__))
+        self.extend(iterable)
+
+    @classmethod
+    def from_bits(cls, flags_class, bits):
+        """ Creates an array from an iterable of integers. Just like ``flags_class(int_value)`` this
+        ignores the bits that aren't included in the ``__all_flags__`` of the flags class. """
+        flags_array = cls(flags_class)
+        flags_array.__bits.extend(map(flags_class.__all_bits__.__and__, bits))
+        return flags_array
+
+    def __new_from_bits(self, bits):
+        flags_array = type(self)(self.__flags_class)
+        flags_array.__bits.extend(bits)
+        return flags_array
+
+    @property
+    def flags_class(self):
+        return self.__flags_class
+
+    @property
+    def bits(self):
+        """ A copy of the bits of the items as an array.array of unsigned integers. """
+        return array.array(self.__bits.typecode, self.__bits)
+
+    def __check_item(self, value):
+        if type(value) is not self.__flags_class:
+            raise TypeError("Expected an instance of %r, received %r" % (self.__flags_class, value))
+        return int(value)
+
+    def __len__(self):
+        return len(self.__bits)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.__new_from_bits(self.__bits[index])
+        return self.__flags_class(self.__bits[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            if isinstance(value, FlagsArray) and value.__flags_class is self.__flags_class:
+                self.__bits[index] = value.__bits
+            else:
+                self.__bits[index] = array.array(self.__bits.typecode, map(self.__check_item, value))
+        else:
+            self.__bits[index] = self.__check_item(value)
+
+    def __delitem__(self, index):
+        del self.__bits[index]
+
+    def insert(self, index, value):
+        self.__bits.insert(index, self.__check_item(value))
+
+    def append(self, value):
+        self.__bits.append(self.__check_item(value))
+
+    def clear(self):
+        del self.__bits[:]
+
+    def reverse(self):
+        self.__bits.reverse()
+
+    def count(self, value):
+        return self.__bits.count(int(value)) if type(value) is self.__flags_class else 0
+
+    def extend(self, values):
+        if isinstance(values, FlagsArray) and values.__flags_class is self.__flags_class:
+            self.__bits.extend(values.__bits)
+        else:
+            self.__bits.extend(map(self.__check_item, values))
+
+    def __iter__(self):
+        return map(self.__flags_class, self.__bits)
+
+    def __reversed__(self):
+        return map(self.__flags_class, reversed(self.__bits))
+
+    def __contains__(self, value):
+        return type(value) is self.__flags_class and int(value) in self.__bits
+
+    def __eq__(self, other):
+        if not isinstance(other, FlagsArray):
+            return NotImplemented
+        return self.__flags_class is other.__flags_class and self.__bits == other.__bits
+
+    def __ne__(self, other):
+        if not isinstance(other, FlagsArray):
+            return NotImplemented
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<FlagsArray %s len=%s>' % (self.__flags_class.__name__, len(self.__bits))
+
+    def memoryview(self):
+        """ A zero-copy read-only memoryview of the bits of the items with native unsigned int items. The array
+        can't change its length while the view exists so release it before adding or removing items.
+        On python 3.6 and 3.7 the view is a read-only copy of the bits. """
+        return readonly_memoryview(self.__bits)
+
+    def __buffer__(self, flags):
+        # python 3.12+ (PEP 688): memoryview(flags_array) and other consumers of the buffer protocol
+        return self.memoryview()
+
+    def numpy(self):
+        """ A zero-copy read-only NumPy array of the bits of the items. Requires NumPy. """
+        import numpy
+        return numpy.frombuffer(self.memoryview(), dtype=numpy.dtype(self.__bits.typecode))
+
+    def __reduce__(self):
+        # The names and bits of the members are saved along with the packed bits so the
+        # bits can be translated if the bits of the members change before unpickling.
+        members = tuple((name, int(member)) for name, member in self.__flags_class.__members_without_aliases__.items())
+        return unpickle_flags_array, (self.__flags_class, members, self.__bits.itemsize, sys.byteorder,
+                                      self.__bits.tobytes())
+
+    def __operand_bits(self, other):
+        """ Returns an iterable that yields the bits of the other operand for each of our items
+        or None if the other operand doesn't satisfy the type identity requirements. """
+        if isinstance(other, FlagsArray):
+            if other.__flags_class is not self.__flags_class:
+                return None
+            if len(other.__bits) != len(self.__bits):
+                raise ValueError("Elementwise operation on FlagsArrays of different lengths: %s and %s" %
+                                 (len(self.__bits), len(other.__bits)))
+            return other.__bits
+        if type(other) is self.__flags_class:
+            return itertools.repeat(int(other), len(self.__bits))
+        return None
+
+    def __elementwise(self, function, other):
+        other_bits = self.__operand_bits(other)
+        if other_bits is None:
+            return NotImplemented
+        return self.__new_from_bits(map(function, self.__bits, other_bits))
+
+    def __or__(self, other):
+        return self.__elementwise(operator.or_, other)
+
+    def __xor__(self, other):
+        return self.__elementwise(operator.xor, other)
+
+    def __and__(self, other):
+        return self.__elementwise(operator.and_, other)
+
+    def __sub__(self, other):
+        other_bits = self.__operand_bits(other)
+        if other_bits is None:
+            return NotImplemented
+        return self.__new_from_bits(map(operator.and_, self.__bits, map(operator.invert, other_bits)))
+
+    __ror__ = __or__
+    __rxor__ = __xor__
+    __rand__ = __and__
+
+    def __rsub__(self, other):
+        other_bits = self.__operand_bits(other)
+        if other_bits is None:
+            return NotImplemented
+        return self.__new_from_bits(map(operator.and_, other_bits, map(operator.invert, self.__bits)))
+
+    def __invert__(self):
+        return self.__new_from_bits(map(self.__flags_class.__all_bits__.__xor__, self.__bits))
+
+    def contains(self, flags):
+        """ Elementwise ``flags in item``. Returns a list of bools. """
+        if type(flags) is not self.__flags_class:
+            raise TypeError("Expected an instance of %r, received %r" % (self.__flags_class, flags))
+        bits = int(flags)
+        return list(map(bits.__eq__, map(bits.__and__, self.__bits)))
+
+    def nonzero(self):
+        """ Elementwise ``bool(item)``. Returns a list of bools. """
+        return list(map(bool, self.__bits))
+
+    def compress(self, mask):
+        """ Returns a new array with the items for which the corresponding item of mask is true. """
+        return self.__new_from_bits(itertools.compress(self.__bits, mask))
+
+
+def create_bits_translator(flags_class, members):
+    """
+    :param members: The (name, bits) pairs of the members of flags_class at the time of serialization.
+    :return: None if the bits of the members haven't changed since then, otherwise a function that converts
+    the serialized bits into the current bits of flags_class through the member names. Like in case of
+    pickling by name the converted value contains the members that were fully contained by the original value.
+    """
+    bits_mapping = []
+    for name, bits in members:
+        member = flags_class.__all_members__.get(name)
+        if member is None:
+            raise ValueError("Invalid flag '%s.%s' in serialized data" % (flags_class.__name__, name))
+        bits_mapping.append((bits, int(member)))
+    if all(bits == current_bits for bits, current_bits in bits_mapping):
+        return None
+
+    def translate_bits(bits):
+        current_bits = 0
+        for serialized_member_bits, member_bits in bits_mapping:
+            if serialized_member_bits & bits == serialized_member_bits:
+                current_bits |= member_bits
+        return current_bits
+    return translate_bits
+
+
+def unpickle_flags_array(flags_class, members, itemsize, byteorder, data):
+    bits = None
+    for typecode in 'BHILQ':
+        if array.array(typecode).itemsize == itemsize:
+            bits = array.array(typecode)
+            bits.frombytes(data)
+            if byteorder != sys.byteorder:
+                bits.byteswap()
+            break
+    if bits is None:
+        bits = (int.from_bytes(data[i:i+itemsize], byteorder) for i in range(0, len(data), itemsize))
+    translate_bits = create_bits_translator(flags_class, members)
+    if translate_bits is not None:
+        bits = memoized_map(translate_bits, bits)
+    return FlagsArray.from_bits(flags_class, bits)
+
+
+def unpickle_flags_bits_list(flags_class, members, bits):
+    translate_bits = create_bits_translator(flags_class, members)
+    if translate_bits is not None:
+        bits = list(memoized_map(translate_bits, bits))
+    return FlagsBitsList(flags_class, bits)
+
+
+class FlagsBitsList:
+    """ The storage of PackedFlags for flags classes that a FlagsArray can't hold (members wider than 64 bits or
+    with negative bits): the bits of the items in a list. Pickle saves each int with as few bytes as it needs. """
+    __slots__ = ('flags_class', 'bits')
+
+    def __init__(self, flags_class, bits):
+        self.flags_class = flags_class
+        self.bits = bits
+
+    @classmethod
+    def from_flags(cls, flags_class, values):
+        bits = []
+        for flags in values:
+            if type(flags) is not flags_class:
+                raise TypeError("Expected an instance of %r, received %r" % (flags_class, flags))
+            bits.append(int(flags))
+        return cls(flags_class, bits)
+
+    def __len__(self):
+        return len(self.bits)
+
+    def __iter__(self):
+        return map(self.flags_class, self.bits)
+
+    def __reduce__(self):
+        # The members are saved for the translation of the bits like in case of FlagsArray.
+        members = tuple((name, int(member)) for name, member in self.flags_class.__members_without_aliases__.items())
+        return unpickle_flags_bits_list, (self.flags_class, members, self.bits)
+
+
+class PackedFlags:
+    """
+    A picklable compact representation of a list, tuple, set, frozenset or dict of instances of a single
+    flags class. In case of dicts the values have to be flags instances, the keys can be anything picklable.
+    Pickling a container of flags instances saves a reference to the flags class and the name or int value
+    of each flags instance while PackedFlags saves the flags class and its member names only once followed
+    by the bits of the items packed into a FlagsArray. The bits of flags classes that a FlagsArray can't hold
+    (members wider than 64 bits or with negative bits) are saved as a list of ints instead.
+    """
+    __slots__ = ('__container_type', '__keys', '__items')
+
+    CONTAINER_TYPES = (list, tuple, set, frozenset, dict, collections.OrderedDict)
+
+    def __init__(self, container, flags_class=None):
+        container_type = type(container)
+        if container_type not in self.CONTAINER_TYPES:
+            raise TypeError("Expected one of %s, received %r" % (
+                ', '.join(t.__name__ for t in self.CONTAINER_TYPES), container_type))
+        if isinstance(container, dict):
+            keys = list(container.keys())
+            values = list(container.values())
+        else:
+            keys = None
+            values = list(container)
+        if flags_class is None:
+            if not values:
+                raise ValueError("flags_class has to be specified in case of empty containers")
+            flags_class = type(values[0])
+        self.__container_type = container_type
+        self.__keys = keys
+        if isinstance(flags_class, FlagsMeta) and is_flags_class_final(flags_class) and\
+                (flags_class.__all_bits__ < 0 or flags_class.__all_bits__.bit_length() > FLAGS_ARRAY_MAX_BITS):
+            self.__items = FlagsBitsList.from_flags(flags_class, values)
+        else:
+            self.__items = FlagsArray(flags_class, values)
+
+    def __getstate__(self):
+        return self.__container_type, self.__keys, self.__items
+
+    def __setstate__(self, state):
+        self.__container_type, self.__keys, self.__items = state
+
+    @property
+    def flags_class(self):
+        return self.__items.flags_class
+
+    def __len__(self):
+        return len(self.__items)
+
+    def unpack(self):
+        """ Returns a new container of the original type. """
+        if self.__keys is None:
+            return self.__container_type(self.__items)
+        return self.__container_type(zip(self.__keys, self.__items))
+
+    def __repr__(self):
+        return '<PackedFlags %s of %s len=%s>' % (self.__container_type.__name__, self.flags_class.__name__,
+                                                  len(self.__items))
+
+
+def set_bitmap_bit(bitmap, position):
+    """ Sets a bit of a bytearray bitmap (little endian bit order), extends the bitmap if necessary. """
+    byte_index = position >> 3
+    if byte_index >= len(bitmap):
+        bitmap.extend(bytes(byte_index + 1 - len(bitmap)))
+    bitmap[byte_index] |= 1 << (position & 7)
+
+
+def clear_bitmap_bit(bitmap, position):
+    bitmap[position >> 3] &= ~(1 << (position & 7)) & 0xff
+
+
+BINARY_DIGITS_TO_BYTES = bytes.maketrans(b'01', b'\0\1')
+
+
+def bit_positions_list(bits):
+    """ The ascending list of the positions of the set bits of a non-negative int. Faster than
+    iter_set_bit_positions() if lots of bits are set because it doesn't have a python level loop. """
+    flags_by_position = bin(bits)[:1:-1].encode().translate(BINARY_DIGITS_TO_BYTES)
+    return list(itertools.compress(range(len(flags_by_position)), flags_by_position))
+
+
+class FlagsIndex(MutableMapping):
+    """
+    A mapping of row ids (small non-negative ints, e.g.: the indexes of the rows of a dataset) to instances of
+    a single flags class. Besides the rows it keeps a bitmap of row ids for each bit of the flags class (that is for
+    each member in case of single bit members) so all_of(), any_of(), none_of() and query() evaluate with a few
+    bitwise operations on these bitmaps instead of testing the rows one by one. Rows can be inserted, replaced and
+    deleted incrementally. The bitmaps are sized by the largest row id so sparse row ids waste memory.
+    """
+    __slots__ = ('__flags_class', '__row_bits', '__rows', '__bitmaps', '__positions_memo', '__next_row_id')
+
+    def __init__(self, flags_class, iterable=()):
+        """ The items of iterable are indexed with their positions as row ids. """
+        if not isinstance(flags_class, FlagsMeta) or not is_flags_class_final(flags_class):
+            raise TypeError("Expected a flags class with members, received %r" % (flags_class,))
+        if flags_class.__all_bits__ < 0:
+            raise ValueError("%s: a FlagsIndex can't be used with members that have negative bits" %
+                             (flags_class.__name__,))
+        self.__flags_class = flags_class
+        # row id -> bits
+        self.__row_bits = {}
+        # the bitmap of the existing row ids
+        self.__rows = bytearray()
+        # bit position -> the bitmap of the rows that have that bit set
+        self.__bitmaps = {}
+        # bits -> the positions of the set bits
+        self.__positions_memo = {}
+        self.__next_row_id = 0
+        for row_id, flags in enumerate(iterable):
+            self[row_id] = flags
+
+    @property
+    def flags_class(self):
+        return self.__flags_class
+
+    def __positions(self, bits):
+        positions = self.__positions_memo.get(bits)
+        if positions is None:
+            positions = tuple(iter_set_bit_positions(bits))
+            if len(self.__positions_memo) < BATCH_MEMO_SIZE:
+                self.__positions_memo[bits] = positions
+        return positions
+
+    def __check_flags(self, flags):
+        if type(flags) is not self.__flags_class:
+            raise TypeError("Expected an instance of %r, received %r" % (self.__flags_class, flags))
+        return int(flags)
+
+    def __getitem__(self, row_id):
+        return self.__flags_class(self.__row_bits[row_id])
+
+    def __setitem__(self, row_id, flags):
+        if not is_valid_bits_value(row_id):
+            raise TypeError("Expected an int row id, received %r" % (row_id,))
+        if row_id < 0:
+            raise ValueError("Row ids can't be negative, received %r" % (row_id,))
+        bits = self.__check_flags(flags)
+        old_bits = self.__row_bits.get(row_id)
+        if old_bits == bits:
+            return
+        bitmaps = self.__bitmaps
+        if old_bits is None:
+            set_bitmap_bit(self.__rows, row_id)
+            self.__next_row_id = max(self.__next_row_id, row_id + 1)
+        else:
+            for position in self.__positions(old_bits):
+                clear_bitmap_bit(bitmaps[position], row_id)
+        for position in self.__positions(bits):
+            bitmap = bitmaps.get(position)
+            if bitmap is None:
+                bitmap = bitmaps[position] = bytearray()
+            set_bitmap_bit(bitmap, row_id)
+        self.__row_bits[row_id] = bits
+
+    def __delitem__(self, row_id):
+        bits = self.__row_bits.pop(row_id)
+        clear_bitmap_bit(self.__rows, row_id)
+        for position in self.__positions(bits):
+            clear_bitmap_bit(self.__bitmaps[position], row_id)
+
+    def append(self, flags):
+        """ Adds flags with the row id that follows the largest row id ever stored (deleted row ids aren't
+        reused) and returns the new row id. """
+        row_id = self.__next_row_id
+        self[row_id] = flags
+        return row_id
+
+    def __iter__(self):
+        """ Yields the row ids in ascending order. """
+        return iter_set_bit_positions(int.from_bytes(self.__rows, 'little'))
+
+    def __len__(self):
+        return len(self.__row_bits)
+
+    def clear(self):
+        self.__row_bits.clear()
+        self.__rows = bytearray()
+        self.__bitmaps.clear()
+        self.__next_row_id = 0
+
+    def __repr__(self):
+        return '<FlagsIndex %s len=%s>' % (self.__flags_class.__name__, len(self.__row_bits))
+
+    def __bitmap(self, position):
+        return int.from_bytes(self.__bitmaps.get(position, b''), 'little')
+
+    def __all_of_bitmap(self, bits):
+        result = int.from_bytes(self.__rows, 'little')
+        for position in self.__positions(bits):
+            if not result:
+                break
+            result &= self.__bitmap(position)
+        return result
+
+    def __any_of_bitmap(self, bits):
+        result = 0
+        for position in self.__positions(bits):
+            result |= self.__bitmap(position)
+        return result
+
+    def __query_bitmap(self, all_of, any_of, none_of):
+        all_bits, any_bits, none_bits = (None if flags is None else self.__check_flags(flags)
+                                         for flags in (all_of, any_of, none_of))
+        result = self.__all_of_bitmap(0 if all_bits is None else all_bits)
+        if any_bits is not None:
+            result &= self.__any_of_bitmap(any_bits)
+        if none_bits is not None and result:
+            result &= ~self.__any_of_bitmap(none_bits)
+        return result
+
+    def query(self, all_of=None, any_of=None, none_of=None):
+        """
+        Returns the ascending list of the row ids whose flags contain all bits of all_of, at least one bit of
+        any_of and none of the bits of none_of. The criteria are instances of the flags class, omitted ones
+        (None) don't filter the rows. In case of single bit members these mean "all of the members of all_of",
+        "any of the members of any_of" and "none of the members of none_of".
+        """
+        return bit_positions_list(self.__query_bitmap(all_of, any_of, none_of))
+
+    def count(self, all_of=None, any_of=None, none_of=None):
+        """ The number of row ids query() would return. Doesn't create the list of row ids. """
+        return popcount(self.__query_bitmap(all_of, any_of, none_of))
+
+    def all_of(self, flags):
+        """ The row ids whose flags contain ``flags``: ``[row_id for row_id in index if flags in index[row_id]]`` """
+        return self.query(all_of=flags)
+
+    def any_of(self, flags):
+        """ The row ids whose flags have at least one bit in common with ``flags``. """
+        return self.query(any_of=flags)
+
+    def none_of(self, flags):
+        """ The row ids whose flags have no bits in common with ``flags``. """
+        return self.query(none_of=flags)
+
+
+# The class attributes of a flags class that are exported by SharedFlagsRegistry if they are set on the class.
+SHARED_FLAGS_CLASS_OPTIONS = (
+    '__no_flags_name__', '__all_flags_name__', '__dotted_single_flag_str__', '__pickle_int_flags__',
+    '__intern_cache_size__', '__intern_cache_policy__', '__dense_instance_table__', '__str_cache_size__',
+    '__str_cache_policy__', '__parse_cache_size__', '__parse_cache_policy__', '__wide_flags__', '__sparse_flags__',
+    '__cache_stripes__',
+)
+
+SHARED_REGISTRY_MAGIC = b'PYFLAGS2'
+# magic, nonce, index size
+SHARED_REGISTRY_HEADER = struct.Struct('<8sQQ')
+# The registry files created in the temp directory are named after a random 64-bit token. The pickled
+# instances refer to these registries by their token instead of their path.
+SHARED_REGISTRY_FILE_NAME = 'flags-registry-%016x'
+SHARED_REGISTRY_FILE_NAME_PATTERN = r'flags-registry-([0-9a-f]{16})'
+SHARED_REGISTRY_TOKEN_BITS = 64
+
+# registry token -> the SharedFlagsRegistry instance of this process
+shared_registries = {}
+# flags class -> (registry token, class id) for the classes whose instances are pickled through a registry
+# by the pickler of multiprocessing
+shared_flags_class_ids = {}
+shared_registries_lock = threading.RLock()
+
+
+def create_shared_registry_file(directory):
+    """ Creates a registry file with a random token in its name. Returns its file descriptor and path. """
+    import random
+    import tempfile
+    rng = random.SystemRandom()
+    for _ in range(tempfile.TMP_MAX):
+        path = os.path.join(directory, SHARED_REGISTRY_FILE_NAME % rng.getrandbits(SHARED_REGISTRY_TOKEN_BITS))
+        try:
+            return os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600), path
+        except FileExistsError:
+            continue
+    raise FileExistsError('No usable registry file name found in %r' % (directory,))
+
+
+def shared_registry_token(path):
+    """ A small int for the registries in the temp directory, the path of the file for the others. """
+    import re
+    import tempfile
+    directory, file_name = os.path.split(os.path.abspath(path))
+    match = re.fullmatch(SHARED_REGISTRY_FILE_NAME_PATTERN, file_name)
+    if match is None or directory != os.path.abspath(tempfile.gettempdir()):
+        return path
+    return int(match.group(1), 16)
+
+
+def shared_registry_name(token):
+    if isinstance(token, int):
+        import tempfile
+        return os.path.join(os.path.abspath(tempfile.gettempdir()), SHARED_REGISTRY_FILE_NAME % token)
+    return token
+
+
+def read_shared_registry_nonce(path):
+    with open(path, 'rb') as f:
+        header = f.read(SHARED_REGISTRY_HEADER.size)
+    if len(header) < SHARED_REGISTRY_HEADER.size or header[:len(SHARED_REGISTRY_MAGIC)] != SHARED_REGISTRY_MAGIC:
+        return None
+    return SHARED_REGISTRY_HEADER.unpack(header)[1]
+
+
+def unpickle_shared_flags(token, nonce, class_id, bits):
+    registry = shared_registries.get(token)
+    if registry is None or registry.nonce != nonce:
+        registry = SharedFlagsRegistry._attach_to_token(token, nonce)
+    return registry.flags_class(class_id)(bits)
+
+
+def reduce_shared_flags(flags):
+    shared_class_id = shared_flags_class_ids.get(type(flags))
+    if shared_class_id is None:
+        # The registry has been closed.
+        return flags.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+    return unpickle_shared_flags, shared_class_id + (int(flags),)
+
+
+def register_shared_flags_reducer(flags_class):
+    # Only the pickler of multiprocessing (used by the queues of ProcessPoolExecutor) pickles the instances as
+    # class ids. Pickles created with the pickle module (e.g.: written to files) keep referring to member names
+    # so they remain loadable after closing the registry.
+    from multiprocessing.reduction import ForkingPickler
+    ForkingPickler.register(flags_class, reduce_shared_flags)
+
+
+def import_qualname(module_name, qualname):
+    import importlib
+    obj = importlib.import_module(module_name)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+class SharedFlagsRegistry:
+    """
+    Shares the definitions (member names, bits and data) of flags classes with other processes (e.g.: the
+    workers of a ProcessPoolExecutor) through a memory mapped file. While a registry is open in a process the
+    pickler of multiprocessing pickles the instances of its flags classes as a (registry token, registry nonce,
+    class id, bits) tuple instead of a reference to their class and their member names. The nonce is a random
+    64-bit int stored in the header of the file: it tells apart registries that have used the same file name (e.g.:
+    a closed registry still attached to a worker and a new one). Unpickling in another process
+    attaches to the registry automatically and resolves the class id only when an instance of that class
+    arrives first: if the module and qualname of the original class resolve to a flags class with the same
+    members in that process then that class is used, otherwise a flags class is created from the shared
+    definition.
+    """
+    def __init__(self, flags_classes, directory=None):
+        """
+        :param flags_classes: An iterable of flags classes that have members. The class ids are their indexes.
+        :param directory: The directory of the memory mapped file. Default: the temp directory.
+        """
+        flags_classes = list(flags_classes)
+        definitions = [pickle.dumps(self.__export_definition(flags_class), pickle.HIGHEST_PROTOCOL)
+                       for flags_class in flags_classes]
+        index = []
+        offset = 0
+        for flags_class, definition in zip(flags_classes, definitions):
+            index.append((flags_class.__module__, flags_class.__qualname__, offset, len(definition)))
+            offset += len(definition)
+        index = pickle.dumps(index, pickle.HIGHEST_PROTOCOL)
+
+        import tempfile
+        fd, path = create_shared_registry_file(directory or tempfile.gettempdir())
+        # The nonce doesn't come from the generator of the token so it differs even if a token is reused.
+        nonce = int.from_bytes(os.urandom(8), 'little')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SHARED_REGISTRY_HEADER.pack(SHARED_REGISTRY_MAGIC, nonce, len(index)))
+            f.write(index)
+            for definition in definitions:
+                f.write(definition)
+        self.__owner = True
+        self.__open(path, flags_classes)
+
+    @classmethod
+    def attach(cls, name):
+        """ Returns the registry of this process for the given registry name, attaches to it if necessary. """
+        with shared_registries_lock:
+            registry = shared_registries.get(shared_registry_token(name))
+            if registry is None:
+                registry = cls.__new__(cls)
+                registry.__owner = False
+                registry.__open(name, None)
+            return registry
+
+    @classmethod
+    def _attach_to_token(cls, token, nonce):
+        """ Returns the registry with the given token and nonce for unpickling. A registry of this process with the
+        same token but a different nonce has been closed (e.g.: in the parent of a forked or attached worker) and
+        its file name has been reused by a new registry. """
+        name = shared_registry_name(token)
+        with shared_registries_lock:
+            registry = shared_registries.get(token)
+            if registry is not None and registry.__nonce != nonce:
+                if read_shared_registry_nonce(name) != nonce:
+                    raise ValueError("The flags registry %r of the pickled instance has been closed" % (name,))
+                registry.__detach()
+            registry = cls.attach(name)
+            if registry.__nonce != nonce:
+                raise ValueError("The flags registry %r of the pickled instance has been closed" % (name,))
+            return registry
+
+    @staticmethod
+    def __export_definition(flags_class):
+        if not isinstance(flags_class, FlagsMeta) or not is_flags_class_final(flags_class):
+            raise TypeError("Expected a flags class with members, received %r" % (flags_class,))
+        members = []
+        for name, member in flags_class.__members__.items():
+            bits = int(member)
+            properties = flags_class.__bits_to_properties__[bits]
+            if properties.name != name or properties.data is UNDEFINED:
+                # aliases can't have data
+                members.append((name, bits))
+            else:
+                members.append((name, (bits, properties.data)))
+        options = {name: vars(flags_class)[name] for name in SHARED_FLAGS_CLASS_OPTIONS if name in vars(flags_class)}
+        return type(flags_class), flags_class.__name__, flags_class.__bases__, options, members
+
+    def __open(self, path, flags_classes):
+        import mmap
+        with open(path, 'rb') as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.__mmap) < SHARED_REGISTRY_HEADER.size:
+            magic = None
+        else:
+            magic, self.__nonce, index_size = SHARED_REGISTRY_HEADER.unpack_from(self.__mmap)
+        if magic != SHARED_REGISTRY_MAGIC:
+            self.__mmap.close()
+            raise ValueError("%r isn't a flags registry" % (path,))
+        self.__index = pickle.loads(self.__mmap[SHARED_REGISTRY_HEADER.size:SHARED_REGISTRY_HEADER.size + index_size])
+        self.__data_offset = SHARED_REGISTRY_HEADER.size + index_size
+        self.__name = path
+        self.__token = shared_registry_token(path)
+        self.__flags_classes = flags_classes or [None] * len(self.__index)
+        with shared_registries_lock:
+            shared_registries[self.__token] = self
+            for class_id, flags_class in enumerate(flags_classes or ()):
+                shared_flags_class_ids[flags_class] = (self.__token, self.__nonce, class_id)
+                register_shared_flags_reducer(flags_class)
+
+    @property
+    def name(self):
+        """ The name other processes can attach to. """
+        return self.__name
+
+    @property
+    def nonce(self):
+        """ The random 64-bit int that identifies this registry among the registries that have used its name. """
+        return self.__nonce
+
+    def __len__(self):
+        return len(self.__index)
+
+    def class_id(self, flags_class):
+        try:
+            token, nonce, class_id = shared_flags_class_ids[flags_class]
+        except KeyError:
+            token = nonce = class_id = None
+        if token != self.__token or nonce != self.__nonce:
+            raise ValueError("%r isn't in this registry" % (flags_class,))
+        return class_id
+
+    def flags_class(self, class_id):
+        flags_class = self.__flags_classes[class_id]
+        if flags_class is None:
+            with shared_registries_lock:
+                flags_class = self.__flags_classes[class_id]
+                if flags_class is None:
+                    flags_class = self.__resolve_flags_class(class_id)
+                    self.__flags_classes[class_id] = flags_class
+                    shared_flags_class_ids.setdefault(flags_class, (self.__token, self.__nonce, class_id))
+                    register_shared_flags_reducer(flags_class)
+        return flags_class
+
+    def __resolve_flags_class(self, class_id):
+        module_name, qualname, offset, size = self.__index[class_id]
+        offset += self.__data_offset
+        metaclass, class_name, bases, options, members = pickle.loads(self.__mmap[offset:offset + size])
+        try:
+            flags_class = import_qualname(module_name, qualname)
+        except (ImportError, AttributeError):
+            flags_class = None
+        if isinstance(flags_class, FlagsMeta) and is_flags_class_final(flags_class) and\
+                list(flags_class.__members__) == [member[0] for member in members] and\
+                all(int(flags_class.__members__[name]) == (value if is_valid_bits_value(value) else value[0])
+                    for name, value in members):
+            return flags_class
+        class_dict = dict(options)
+        class_dict['__members__'] = members
+        flags_class = metaclass(class_name, bases, class_dict)
+        flags_class.__module__ = module_name
+        flags_class.__qualname__ = qualname
+        return flags_class
+
+    def pack(self, flags):
+        """ Returns the (class id, bits) pair of a flags instance. """
+        return self.class_id(type(flags)), int(flags)
+
+    def unpack(self, class_id, bits):
+        return self.flags_class(class_id)(bits)
+
+    def __detach(self):
+        """ Removes the registry from the registries of this process. Returns False if it has already been removed. """
+        with shared_registries_lock:
+            if shared_registries.get(self.__token) is not self:
+                return False
+            del shared_registries[self.__token]
+            for flags_class in self.__flags_classes:
+                if shared_flags_class_ids.get(flags_class, (None, None))[:2] == (self.__token, self.__nonce):
+                    del shared_flags_class_ids[flags_class]
+        self.__mmap.close()
+        return True
+
+    def close(self):
+        """ Detaches this process from the registry. The process that created the registry deletes its file. """
+        if self.__detach() and self.__owner:
+            os.unlink(self.__name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return '<SharedFlagsRegistry %r classes=%s>' % (self.__name, len(self))
+
+
+# The number of bytes FlagsStreamCodec reads from a stream at once.
+STREAM_CODEC_READ_SIZE = 65536
+
+# A varint is a little endian sequence of 7-bit groups in which every byte but the last one has its high bit set.
+VARINT_PATTERN = b'[\x80-\xff]*[\x00-\x7f]'
+VARINT_CONTINUATION_BYTES = bytes(range(0x80, 0x100))
+
+
+def encode_varint(bits):
+    if bits < 0:
+        raise ValueError("Negative bits can't be encoded as a varint: %r" % (bits,))
+    data = bytearray()
+    while bits > 0x7f:
+        data.append(bits & 0x7f | 0x80)
+        bits >>= 7
+    data.append(bits)
+    return bytes(data)
+
+
+def decode_varint(data):
+    bits = 0
+    for shift, byte in enumerate(data):
+        bits |= (byte & 0x7f) << (7 * shift)
+    return bits
+
+
+class FlagsStreamCodec:
+    """
+    Encodes instances of a flags class to bytes and decodes them from an asyncio.StreamReader in batches.
+    In 'varint' mode every instance is the varint (LEB128) encoding of its bits, in 'text' mode it is a line that
+    holds the output of to_simple_str() (decoding accepts the output of __str__() too). Decoding looks up the
+    encoded form of the members and of the previously seen values in a table, other values are parsed only once.
+    If offload_threshold is set then batches of at least this many items are decoded in executor (None: the default
+    executor of the event loop) so that decoding large batches doesn't block the event loop.
+    """
+    MODES = ('varint', 'text')
+
+    def __init__(self, flags_class, mode='varint', *, executor=None, offload_threshold=None,
+                 read_size=STREAM_CODEC_READ_SIZE):
+        if not isinstance(flags_class, FlagsMeta) or not is_flags_class_final(flags_class):
+            raise TypeError("Expected a flags class with members, received %r" % (flags_class,))
+        if mode not in self.MODES:
+            raise ValueError("Invalid mode %r, expected one of: %s" % (mode, ', '.join(self.MODES)))
+        self.__flags_class = flags_class
+        self.__mode = mode
+        self.__executor = executor
+        self.__offload_threshold = offload_threshold
+        self.__read_size = read_size
+        if mode == 'varint':
+            self.__encode_bits = encode_varint
+            # The instances of every possible single byte varint.
+            self.__byte_table = [flags_class(bits) for bits in range(0x80)]
+        else:
+            self.__encode_bits = lambda bits: flags_class(bits).to_simple_str().encode()
+            self.__byte_table = None
+        # encoded item -> instance, the members are followed by at most BATCH_MEMO_SIZE other values
+        self.__decode_table = {}
+        # bits -> encoded item
+        self.__encode_table = {}
+        for member in flags_class.__all_members__.values():
+            bits = int(member)
+            if bits >= 0 or mode == 'text':
+                encoded = self.__encode_table.setdefault(bits, self.__encode_bits(bits))
+                self.__decode_table.setdefault(encoded, member)
+        if mode == 'text':
+            self.__decode_table.update((name.encode(), member) for name, member in flags_class.__all_members__.items())
+        self.__decode_table_limit = len(self.__decode_table) + BATCH_MEMO_SIZE
+        self.__encode_table_limit = len(self.__encode_table) + BATCH_MEMO_SIZE
+
+    @property
+    def flags_class(self):
+        return self.__flags_class
+
+    @property
+    def mode(self):
+        return self.__mode
+
+    def encode(self, flags_instances):
+        """ Returns the bytes that represent the given instances of the flags class. """
+        flags_class = self.__flags_class
+        encode_table = self.__encode_table
+        items = []
+        for flags in flags_instances:
+            if type(flags) is not flags_class:
+                raise TypeError("Expected an instance of %r, received %r" % (flags_class, flags))
+            bits = int(flags)
+            encoded = encode_table.get(bits)
+            if encoded is None:
+                encoded = self.__encode_bits(bits)
+                if len(encode_table) < self.__encode_table_limit:
+                    encode_table[bits] = encoded
+            items.append(encoded)
+        if self.__mode == 'varint':
+            return b''.join(items)
+        return b''.join(item + b'\n' for item in items)
+
+    async def write(self, writer, flags_instances):
+        """ Writes the given instances to an asyncio.StreamWriter and waits until it can accept more data. """
+        writer.write(self.encode(flags_instances))
+        await writer.drain()
+
+    def decode_items(self, items):
+        """ Converts a list of encoded items (without line separators in case of text mode) to instances. """
+        decode_table = self.__decode_table
+        missing = set(items).difference(decode_table)
+        if missing:
+            flags_class = self.__flags_class
+            if self.__mode == 'varint':
+                decoded = {item: flags_class(decode_varint(item)) for item in missing}
+            else:
+                decoded = {item: flags_class(flags_class.bits_from_str(item.decode())) for item in missing}
+            if len(decode_table) + len(decoded) <= self.__decode_table_limit:
+                decode_table.update(decoded)
+            else:
+                decoded.update(decode_table)
+                decode_table = decoded
+        return list(map(decode_table.__getitem__, items))
+
+    def __split(self, data):
+        """ Returns the complete items of data and the bytes of the incomplete last item. """
+        if self.__mode == 'text':
+            lines = data.split(b'\n')
+            return lines, lines.pop()
+        end = len(data.rstrip(VARINT_CONTINUATION_BYTES))
+        import re
+        return re.compile(VARINT_PATTERN).findall(data, 0, end), data[end:]
+
+    async def __decode_batch(self, data):
+        """ Returns the decoded instances and the bytes of the incomplete last item of data. """
+        if self.__byte_table is not None and is_ascii(data):
+            # Every byte is a single byte varint.
+            return list(map(self.__byte_table.__getitem__, data)), b''
+        items, incomplete = self.__split(data)
+        if self.__offload_threshold is not None and len(items) >= self.__offload_threshold:
+            import asyncio
+            # python 3.6 doesn't have get_running_loop() but get_event_loop() returns the running loop of coroutines
+            loop = asyncio.get_running_loop() if hasattr(asyncio, 'get_running_loop') else asyncio.get_event_loop()
+            return await loop.run_in_executor(self.__executor, self.decode_items, items), incomplete
+        return self.decode_items(items), incomplete
+
+    async def decode_batches(self, reader):
+        """ An async generator that reads the stream until EOF and yields the decoded instances in lists. """
+        incomplete = b''
+        while True:
+            data = await reader.read(self.__read_size)
+            if not data:
+                break
+            if incomplete:
+                data = incomplete + data
+            batch, incomplete = await self.__decode_batch(data)
+            if batch:
+                yield batch
+        if incomplete:
+            if self.__mode == 'text':
+                # the last line doesn't have to be terminated
+                yield self.decode_items([incomplete])
+            else:
+                import asyncio
+                raise asyncio.IncompleteReadError(incomplete, None)
+
+    async def decode(self, reader):
+        """ An async generator that reads the stream until EOF and yields the decoded instances one by one. """
+        async for batch in self.decode_batches(reader):
+            for flags in batch:
+                yield flags
+
+    def __repr__(self):
+        return '<FlagsStreamCodec %s mode=%r>' % (self.__flags_class.__name__, self.__mode)
+
+
+# The format of flags column files:
+# - header: magic, format version, the size of the items of the bits column, 2 reserved bytes, the size of the schema
+# - schema: a utf-8 encoded JSON list of the [name, bits] pairs of the members (without aliases) of the flags class
+# - zero padding to align the bits column to 8 bytes
+# - bits column: fixed width little endian unsigned ints, one per row
+FLAGS_COLUMN_MAGIC = b'PYFLAGSC'
+FLAGS_COLUMN_VERSION = 1
+FLAGS_COLUMN_HEADER = struct.Struct('<8sBBxxI')
+
+
+def flags_column_schema(flags_class):
+    if not isinstance(flags_class, FlagsMeta) or not is_flags_class_final(flags_class):
+        raise TypeError("Expected a flags class with members, received %r" % (flags_class,))
+    return [(name, int(member)) for name, member in flags_class.__members_without_aliases__.items()]
+
+
+def read_flags_column_header(buffer, path):
+    """ Returns the (itemsize, members, data_offset) of a flags column file from a buffer holding its beginning. """
+    if len(buffer) < FLAGS_COLUMN_HEADER.size:
+        raise ValueError("%r isn't a flags column file" % (path,))
+    magic, version, itemsize, schema_size = FLAGS_COLUMN_HEADER.unpack_from(buffer)
+    if magic != FLAGS_COLUMN_MAGIC:
+        raise ValueError("%r isn't a flags column file" % (path,))
+    if version != FLAGS_COLUMN_VERSION:
+        raise ValueError("%r has an unsupported flags column format version: %s" % (path, version))
+    schema_end = FLAGS_COLUMN_HEADER.size + schema_size
+    import json
+    members = [(name, bits) for name, bits in json.loads(bytes(buffer[FLAGS_COLUMN_HEADER.size:schema_end]).decode())]
+    return itemsize, members, (schema_end + 7) // 8 * 8
+
+
+class FlagsColumnWriter:
+    """
+    Appends the bits of flags instances to a flags column file. A new file gets a header with the member names
+    and bits of flags_class. In case of an existing file the header has to match the current members of
+    flags_class, otherwise the constructor raises ValueError.
+    """
+    def __init__(self, path, flags_class):
+        members = flags_column_schema(flags_class)
+        if flags_class.__all_bits__ < 0:
+            raise ValueError("%s: a flags column can't be written with members that have negative bits" %
+                             (flags_class.__name__,))
+        typecode = array_typecode_for_bits(flags_class.__all_bits__)
+        import json
+        self.__flags_class = flags_class
+        self.__path = path
+        self.__file = open(path, 'a+b')
+        try:
+            self.__file.seek(0, os.SEEK_END)
+            size = self.__file.tell()
+            if size:
+                self.__file.seek(0)
+                header = self.__file.read(FLAGS_COLUMN_HEADER.size)
+                if len(header) == FLAGS_COLUMN_HEADER.size:
+                    header += self.__file.read(FLAGS_COLUMN_HEADER.unpack(header)[3])
+                itemsize, file_members, data_offset = read_flags_column_header(header, path)
+                if file_members != members:
+                    raise ValueError("The schema of %r doesn't match the members of %r" % (path, flags_class))
+                if (size - data_offset) % itemsize:
+                    raise ValueError("%r ends with an incomplete row" % (path,))
+                # The items of an existing file may be wider than necessary for the current bits of the members.
+                typecode = next(typecode for typecode in 'BHILQ' if array.array(typecode).itemsize == itemsize)
+            else:
+                schema = json.dumps(members).encode()
+                header = FLAGS_COLUMN_HEADER.pack(FLAGS_COLUMN_MAGIC, FLAGS_COLUMN_VERSION,
+                                                  array.array(typecode).itemsize, len(schema)) + schema
+                self.__file.write(header + bytes(-len(header) % 8))
+        except BaseException:
+            self.__file.close()
+            raise
+        self.__typecode = typecode
+
+    @property
+    def flags_class(self):
+        return self.__flags_class
+
+    def append(self, flags):
+        self.extend((flags,))
+
+    def extend(self, iterable):
+        flags_class = self.__flags_class
+        column = array.array(self.__typecode)
+        for flags in iterable:
+            if type(flags) is not flags_class:
+                raise TypeError("Expected an instance of %r, received %r" % (flags_class, flags))
+            column.append(int(flags))
+        if sys.byteorder != 'little':
+            column.byteswap()
+        column.tofile(self.__file)
+
+    def flush(self):
+        self.__file.flush()
+
+    def close(self):
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return '<FlagsColumnWriter %r of %s>' % (self.__path, self.__flags_class.__name__)
+
+
+class FlagsColumnReader(Sequence):
+    """
+    Memory maps a flags column file and gives read-only access to its rows. Indexing and iteration create the flags
+    instances of the requested rows only. The bits are translated through the member names if the members of
+    flags_class have different bits than the ones saved to the header of the file. memoryview() and numpy() give
+    zero-copy access to the raw (untranslated) bits column.
+    """
+    def __init__(self, path, flags_class):
+        flags_column_schema(flags_class)
+        import mmap
+        self.__flags_class = flags_class
+        self.__path = path
+        with open(path, 'rb') as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.__itemsize, self.__members, self.__data_offset = read_flags_column_header(self.__mmap, path)
+            self.__translate_bits = create_bits_translator(flags_class, self.__members)
+        except BaseException:
+            self.__mmap.close()
+            raise
+        self.__len = (len(self.__mmap) - self.__data_offset) // self.__itemsize
+
+    @property
+    def flags_class(self):
+        return self.__flags_class
+
+    @property
+    def members(self):
+        """ The (name, bits) pairs of the members saved to the header of the file. """
+        return list(self.__members)
+
+    def __len__(self):
+        return self.__len
+
+    def bits_at(self, index):
+        """ The raw bits of the given row. """
+        if index < 0:
+            index += self.__len
+        if not 0 <= index < self.__len:
+            raise IndexError('FlagsColumnReader index out of range')
+        offset = self.__data_offset + index * self.__itemsize
+        return int.from_bytes(self.__mmap[offset:offset + self.__itemsize], 'little')
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.__len))]
+        bits = self.bits_at(index)
+        if self.__translate_bits is not None:
+            bits = self.__translate_bits(bits)
+        return self.__flags_class(bits)
+
+    def __iter__(self):
+        flags_class = self.__flags_class
+        translate_bits = self.__translate_bits
+        itemsize = self.__itemsize
+        start = self.__data_offset
+        end = start + self.__len * itemsize
+        data = self.__mmap
+        for offset in range(start, end, itemsize):
+            bits = int.from_bytes(data[offset:offset + itemsize], 'little')
+            yield flags_class(bits if translate_bits is None else translate_bits(bits))
+
+    def memoryview(self):
+        """ A zero-copy memoryview of the bits column with native unsigned int items. Release it
+        before closing the reader. Available only on little endian platforms. """
+        if sys.byteorder != 'little':
+            raise RuntimeError("The bits column can't be viewed with native ints on big endian platforms")
+        item_format = next(item_format for item_format in 'BHILQ' if struct.calcsize(item_format) == self.__itemsize)
+        data = memoryview(self.__mmap)[self.__data_offset:self.__data_offset + self.__len * self.__itemsize]
+        return data.cast(item_format)
+
+    def numpy(self):
+        """ A zero-copy read-only NumPy array of the bits column. Requires NumPy. """
+        import numpy
+        return numpy.frombuffer(self.__mmap, dtype='<u%s' % self.__itemsize, count=self.__len,
+                                offset=self.__data_offset)
+
+    def close(self):
+        self.__mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return '<FlagsColumnReader %r of %s len=%s>' % (self.__path, self.__flags_class.__name__, self.__len)
+
+
+# The methods of flags classes whose calls FlagsProfiler counts and times. It also profiles FlagsMeta.__call__.
+PROFILED_METHODS = (
+    '__or__', '__xor__', '__and__', '__sub__', '__invert__', '__contains__', '__eq__', '__ne__', '__ge__', '__gt__',
+    '__le__', '__lt__', '__str__', '__reduce_ex__', 'bits_from_str',
+)
+
+# Serializes enabling and disabling profilers.
+profiling_lock = threading.RLock()
+# flags class -> ProfiledClass for the classes that have at least one enabled profiler
+profiled_classes = {}
+# The enabled profilers that profile every flags class.
+global_profilers = []
+unprofiled_flags_meta_call = FlagsMeta.__call__
+# Marks the profiled methods that were inherited by the profiled class instead of being in its class dict.
+INHERITED = Const('INHERITED')
+
+
+class ProfiledClass:
+    """ The profiling state of a flags class: sinks is the list of the {name: [calls, time]} counters of
+    the enabled profilers of the class, originals holds the attributes replaced by the profiling wrappers
+    and wrappers holds the installed wrappers. """
+    __slots__ = ('sinks', 'originals', 'wrappers')
+
+    def __init__(self):
+        self.sinks = []
+        self.originals = {}
+        self.wrappers = {}
+
+
+def record_call(sinks, name, elapsed):
+    # The counters are updated without a lock so they can miss a few updates in case of concurrent calls.
+    for sink in sinks:
+        counter = sink[name]
+        counter[0] += 1
+        counter[1] += elapsed
+
+
+def create_profiled_function(function, name, sinks):
+    perf_counter = time.perf_counter
+
+    def profiled_function(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record_call(sinks, name, perf_counter() - start)
+    functools.update_wrapper(profiled_function, function)
+    return profiled_function
+
+
+def profiled_flags_meta_call(cls, *args, **kwargs):
+    profiled_class = profiled_classes.get(cls)
+    if profiled_class is None:
+        return unprofiled_flags_meta_call(cls, *args, **kwargs)
+    start = time.perf_counter()
+    try:
+        return unprofiled_flags_meta_call(cls, *args, **kwargs)
+    finally:
+        record_call(profiled_class.sinks, '__call__', time.perf_counter() - start)
+
+
+def install_profiling_wrappers(flags_class, profiled_class):
+    for name in PROFILED_METHODS:
+        profiled_class.originals[name] = vars(flags_class).get(name, INHERITED)
+        # The wrapper is built around the raw attribute found in the MRO (e.g.: a classmethod object).
+        attribute = next(vars(base)[name] for base in flags_class.__mro__ if name in vars(base))
+        if isinstance(attribute, classmethod):
+            attribute = classmethod(create_profiled_function(attribute.__func__, name, profiled_class.sinks))
+        else:
+            attribute = create_profiled_function(attribute, name, profiled_class.sinks)
+        profiled_class.wrappers[name] = attribute
+        type.__setattr__(flags_class, name, attribute)
+    if FlagsMeta.__call__ is unprofiled_flags_meta_call:
+        FlagsMeta.__call__ = profiled_flags_meta_call
+
+
+def remove_profiling_wrappers(flags_class, profiled_class):
+    for name, original in profiled_class.originals.items():
+        # Attributes assigned while profiling (e.g.: the __reduce_ex__ of unpicklable classes) are kept.
+        if vars(flags_class).get(name) is not profiled_class.wrappers[name]:
+            continue
+        if original is INHERITED:
+            type.__delattr__(flags_class, name)
+        else:
+            type.__setattr__(flags_class, name, original)
+    if not profiled_classes:
+        FlagsMeta.__call__ = unprofiled_flags_meta_call
+
+
+def attach_profiler_sink(flags_class, sink):
+    with profiling_lock:
+        profiled_class = profiled_classes.get(flags_class)
+        if profiled_class is None:
+            profiled_class = profiled_classes[flags_class] = ProfiledClass()
+            install_profiling_wrappers(flags_class, profiled_class)
+        profiled_class.sinks.append(sink)
+
+
+def detach_profiler_sink(flags_class, sink):
+    with profiling_lock:
+        profiled_class = profiled_classes[flags_class]
+        # The wrappers hold a reference to the sinks list so it is modified in place.
+        profiled_class.sinks[:] = [item for item in profiled_class.sinks if item is not sink]
+        if not profiled_class.sinks:
+            del profiled_classes[flags_class]
+            remove_profiling_wrappers(flags_class, profiled_class)
+
+
+def iter_final_flags_classes():
+    """ Yields the flags classes that have members. Lazy flags classes are yielded only if they have been
+    materialized. """
+    classes = [Flags]
+    seen = set()
+    while classes:
+        flags_class = classes.pop()
+        if flags_class in seen:
+            continue
+        seen.add(flags_class)
+        if '__members__' in vars(flags_class):
+            yield flags_class
+        classes.extend(type.__subclasses__(flags_class))
+
+
+def attach_global_profilers(flags_class):
+    """ Called with every new final flags class. """
+    with profiling_lock:
+        for profiler in global_profilers:
+            profiler._attach(flags_class)   # pylint: disable=protected-access
+
+
+class FlagsProfiler:
+    """
+    Counts the calls and measures the cumulative (inclusive) time of instantiation (FlagsMeta.__call__), the flags
+    arithmetic and comparison operators, bits_from_str(), __str__() and __reduce_ex__() of the given flags classes
+    or of every flags class (flags_classes=None) including the ones created while the profiler is enabled.
+    Enabling a profiler installs wrappers on the profiled classes and disabling the last profiler of a class
+    removes them so profiling costs nothing while it is disabled. It can be used as a context manager.
+    """
+    def __init__(self, flags_classes=None):
+        if flags_classes is not None:
+            flags_classes = list(flags_classes)
+            for flags_class in flags_classes:
+                if not isinstance(flags_class, FlagsMeta) or not is_flags_class_final(flags_class):
+                    raise TypeError("Expected a flags class with members, received %r" % (flags_class,))
+        self.__flags_classes = flags_classes
+        # flags class -> {name: [calls, time]}
+        self.__counters = {}
+        self.__attached_classes = []
+        self.__enabled = False
+
+    @property
+    def enabled(self):
+        return self.__enabled
+
+    def _attach(self, flags_class):
+        counters = self.__counters.get(flags_class)
+        if counters is None:
+            counters = {name: [0, 0.0] for name in ('__call__',) + PROFILED_METHODS}
+            self.__counters[flags_class] = counters
+        attach_profiler_sink(flags_class, counters)
+        self.__attached_classes.append(flags_class)
+
+    def enable(self):
+        with profiling_lock:
+            if self.__enabled:
+                return
+            self.__enabled = True
+            if self.__flags_classes is None:
+                global_profilers.append(self)
+                flags_classes = list(iter_final_flags_classes())
+            else:
+                flags_classes = self.__flags_classes
+            for flags_class in flags_classes:
+                self._attach(flags_class)
+
+    def disable(self):
+        with profiling_lock:
+            if not self.__enabled:
+                return
+            self.__enabled = False
+            if self in global_profilers:
+                global_profilers.remove(self)
+            for flags_class in self.__attached_classes:
+                detach_profiler_sink(flags_class, self.__counters[flags_class])
+            self.__attached_classes = []
+
+    def reset(self):
+        """ Zeroes the counters. """
+        for counters in self.__counters.values():
+            for counter in counters.values():
+                counter[:] = [0, 0.0]
+
+    def snapshot(self):
+        """ Returns a {'ClassQualname.method_name': {'calls': int, 'time': seconds}} dict of the methods that have
+        been called. The counters of classes with the same qualname are added up. """
+        snapshot = {}
+        for flags_class, counters in self.__counters.items():
+            for name, (calls, elapsed) in counters.items():
+                if not calls:
+                    continue
+                item = snapshot.setdefault('%s.%s' % (flags_class.__qualname__, name), {'calls': 0, 'time': 0.0})
+                item['calls'] += calls
+                item['time'] += elapsed
+        return snapshot
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.disable()
+
+    def __repr__(self):
+        return '<FlagsProfiler %s%s>' % ('all flags classes' if self.__flags_classes is None else
+                                         ', '.join(cls.__name__ for cls in self.__flags_classes),
+                                         '' if self.__enabled else ' disabled')
@@ -1,5 +1,6 @@
 """ Testing flag combining operators on our flags instances. """
 import operator
+import re
 from unittest import TestCase
 
 from flags import Flags
@@ -519,3 +520,161 @@ class TestArithmetic(TestCase):
         self.assertEqual(~f01, f2)
         self.assertEqual(~f02, f1)
         self.assertEqual(~f12, f0)
+
+
+class TestCompiledOperators(TestCase):
+    """ Final flags classes get operators specialized by FlagsArithmeticMixin._compile_fast_operators(). """
+    def test_operators_are_specialized(self):
+        for name in ('__or__', '__xor__', '__and__', '__sub__', '__invert__', '__contains__',
+                     '__eq__', '__ne__', '__ge__', '__gt__', '__le__', '__lt__'):
+            self.assertIn(name, vars(MyFlags))
+            self.assertIsNot(getattr(MyFlags, name), getattr(Flags, name))
+        self.assertEqual(MyFlags.__or__.__qualname__, 'MyFlags.__or__')
+
+    def test_results_are_registered_instances(self):
+        self.assertIs(f0 | f1 | f2, all_flags)
+        self.assertIs(all_flags - all_flags, no_flags)
+        self.assertIs(~all_flags, no_flags)
+        self.assertIs(f01 & f12, f1)
+        self.assertIs(f01 ^ f0, f1)
+
+    def test_unchanged_results_are_the_left_operand(self):
+        MyFlags = Flags('MyFlags', 'f0 f1 f2')
+        # not a member and not interned
+        value = MyFlags.f0 | MyFlags.f2
+        for result in (value | MyFlags.f0, value ^ MyFlags.no_flags, value & value, value - MyFlags.f1):
+            self.assertIs(result, value)
+
+    def test_overridden_operators_are_kept(self):
+        class OverriddenFlags(Flags):
+            f0 = ()
+            f1 = ()
+
+            def __or__(self, other):
+                return 'overridden'
+
+        self.assertEqual(OverriddenFlags.f0 | OverriddenFlags.f1, 'overridden')
+        self.assertIs(OverriddenFlags.f0 & OverriddenFlags.f1, OverriddenFlags.no_flags)
+
+    def test_custom_new_is_used_to_create_results(self):
+        created = []
+
+        class CustomNewFlags(Flags):
+            f0 = ()
+            f1 = ()
+            f2 = ()
+
+            def __new__(cls, bits):
+                created.append(bits)
+                return Flags.__new__(cls, bits)
+
+        del created[:]
+        result = CustomNewFlags.f0 | CustomNewFlags.f1
+        self.assertEqual(int(result), 3)
+        self.assertListEqual(created, [3])
+
+
+class TestSparseFlags(TestCase):
+    """ The operators of sparse flags classes have to behave exactly like the operators that work with ints. """
+    class SparseFlags(Flags):
+        __sparse_flags__ = True
+
+    def check_against_int_storage(self, members):
+        dense_class = Flags('MyFlags', members)
+        sparse_class = self.SparseFlags('MyFlags', members)
+        values = range(dense_class.__all_bits__ + 1)
+        for x in values:
+            dense_x, sparse_x = dense_class(x), sparse_class(x)
+            self.assertEqual(int(sparse_x), int(dense_x))
+            self.assertEqual(int(~sparse_x), int(~dense_x))
+            self.assertEqual(bool(sparse_x), bool(dense_x))
+            self.assertEqual(len(sparse_x), len(dense_x))
+            self.assertEqual(str(sparse_x), str(dense_x))
+            self.assertEqual([int(member) for member in reversed(sparse_x)],
+                             [int(member) for member in reversed(dense_x)])
+            for y in values:
+                dense_y, sparse_y = dense_class(y), sparse_class(y)
+                for op in (operator.or_, operator.and_, operator.xor, operator.sub):
+                    result = op(sparse_x, sparse_y)
+                    self.assertEqual(int(result), int(op(dense_x, dense_y)))
+                    self.assertEqual(result, sparse_class(int(result)))
+                    self.assertEqual(hash(result), hash(sparse_class(int(result))))
+                for op in (operator.eq, operator.ne, operator.lt, operator.le, operator.gt, operator.ge,
+                           operator.contains):
+                    self.assertEqual(op(sparse_x, sparse_y), op(dense_x, dense_y))
+
+    def test_single_bit_members(self):
+        self.check_against_int_storage('f0 f1 f2 f3 f4')
+
+    def test_multi_bit_members(self):
+        self.check_against_int_storage([('f0', 1), ('f1', 2), ('f01', 3), ('f3', 8), ('f4', 16)])
+
+    def test_members_in_non_ascending_bit_order(self):
+        self.check_against_int_storage([('f2', 4), ('f0', 1), ('f1', 2), ('f3', 8)])
+
+    def test_storage(self):
+        SparseFlags = self.SparseFlags('SparseFlags', ['f%s' % i for i in range(1000)])
+        value = SparseFlags.f3 | SparseFlags.f999
+        self.assertEqual(value._FlagsArithmeticMixin__bits, (frozenset((3, 999)), False))
+        self.assertEqual((~value)._FlagsArithmeticMixin__bits, (frozenset((3, 999)), True))
+        self.assertEqual(int(~value), ((1 << 1000) - 1) ^ (1 << 3) ^ (1 << 999))
+        self.assertEqual(~~value, value)
+        self.assertIs(~SparseFlags.all_flags, SparseFlags.no_flags)
+        self.assertIs(~SparseFlags.no_flags, SparseFlags.all_flags)
+        self.assertIs(value & SparseFlags.f3, SparseFlags.f3)
+        self.assertIs(SparseFlags(1 << 999), SparseFlags.f999)
+        self.assertEqual(len(~value), 998)
+        self.assertIn(SparseFlags.f3, value)
+        self.assertNotIn(SparseFlags.f3, ~value)
+        self.assertEqual(value.f999, True)
+        self.assertEqual(SparseFlags.f999.name, 'f999')
+        self.assertEqual(SparseFlags('f3|f999'), value)
+        self.assertEqual(SparseFlags.from_simple_str(value.to_simple_str()), value)
+
+    def test_dense_instance_table_isnt_allowed(self):
+        with self.assertRaisesRegex(ValueError, re.escape("MyFlags: __dense_instance_table__ and __sparse_flags__ "
+                                                          "can't be used together")):
+            class MyFlags(self.SparseFlags):
+                __dense_instance_table__ = True
+                f0 = ()
+
+    def test_negative_bits_arent_allowed(self):
+        with self.assertRaisesRegex(ValueError, re.escape("MyFlags: __sparse_flags__ can't be used with members that "
+                                                          "have negative bits")):
+            class MyFlags(self.SparseFlags):
+                f0 = 1
+                f1 = -4
+
+    def test_interning(self):
+        class MyFlags(self.SparseFlags):
+            __intern_cache_size__ = 8
+            f0 = ()
+            f1 = ()
+            f2 = ()
+        self.assertIs(MyFlags.f0 | MyFlags.f1, MyFlags.f1 | MyFlags.f0)
+
+    def test_interning_is_shared_with_instantiation(self):
+        class MyFlags(self.SparseFlags):
+            __intern_cache_size__ = 8
+            f0 = ()
+            f1 = ()
+            f2 = ()
+        value = MyFlags.f0 | MyFlags.f1
+        self.assertIs(MyFlags(int(value)), value)
+        self.assertIs(MyFlags.from_str('f0|f1'), value)
+        value = MyFlags(5)
+        self.assertIs(MyFlags.f0 | MyFlags.f2, value)
+
+    def test_custom_new(self):
+        created = []
+
+        class MyFlags(self.SparseFlags):
+            def __new__(cls, bits):
+                created.append(bits)
+                return super().__new__(cls, bits)
+            f0 = ()
+            f1 = ()
+            f2 = ()
+        self.assertEqual(int(MyFlags.f0 | MyFlags.f1), 3)
+        self.assertIn(3, created)
+        self.assertEqual((MyFlags.f0 | MyFlags.f1)._FlagsArithmeticMixin__bits, (frozenset((2,)), True))
@@ -0,0 +1,352 @@
+""" Testing the FlagsArray container and its elementwise operators. """
+import array
+import os
+import re
+import sys
+import tempfile
+from unittest import TestCase, skipIf
+
+from flags import Flags, FlagsArray, FlagsColumnReader, FlagsColumnWriter, FlagsIndex
+
+
+class MyOtherFlags(Flags):
+    of0 = ()
+
+
+class MyFlags(Flags):
+    f0 = ()
+    f1 = ()
+    f2 = ()
+
+
+no_flags = MyFlags.no_flags
+all_flags = MyFlags.all_flags
+f0 = MyFlags.f0
+f1 = MyFlags.f1
+f2 = MyFlags.f2
+
+
+class TestFlagsArrayContainer(TestCase):
+    def test_creation(self):
+        flags_array = FlagsArray(MyFlags, [f0, f1 | f2, no_flags])
+        self.assertIs(flags_array.flags_class, MyFlags)
+        self.assertEqual(len(flags_array), 3)
+        self.assertListEqual(list(flags_array), [f0, f1 | f2, no_flags])
+        self.assertListEqual(list(reversed(flags_array)), [no_flags, f1 | f2, f0])
+        self.assertEqual(flags_array.bits, array.array(flags_array.bits.typecode, [1, 6, 0]))
+        self.assertEqual(repr(flags_array), '<FlagsArray MyFlags len=3>')
+
+    def test_from_bits_drops_undefined_bits(self):
+        flags_array = FlagsArray.from_bits(MyFlags, [1, 2, 0xff])
+        self.assertListEqual(list(flags_array), [f0, f1, all_flags])
+
+    def test_creation_fails_with_abstract_flags_class(self):
+        with self.assertRaisesRegex(TypeError, r"Expected a flags class with members"):
+            FlagsArray(Flags)
+
+    def test_creation_fails_with_too_wide_flags_class(self):
+        wide_flags = Flags('WideFlags', [('f0', 1 << 64)])
+        with self.assertRaisesRegex(ValueError, r"at most 64 bits"):
+            FlagsArray(wide_flags)
+
+    def test_creation_fails_with_negative_bits(self):
+        negative_flags = Flags('NegativeFlags', [('f0', 1), ('f1', -4)])
+        with self.assertRaisesRegex(ValueError, r"NegativeFlags: a FlagsArray can't be used with members that have "
+                                                r"negative bits"):
+            FlagsArray(negative_flags)
+
+    def test_type_identity_of_items(self):
+        flags_array = FlagsArray(MyFlags)
+        with self.assertRaisesRegex(TypeError, re.escape("Expected an instance of <flags MyFlags>")):
+            flags_array.append(MyOtherFlags.of0)
+        with self.assertRaises(TypeError):
+            flags_array.append(1)
+        with self.assertRaises(TypeError):
+            FlagsArray(MyFlags, [f0, MyOtherFlags.of0])
+
+    def test_sequence_operations(self):
+        flags_array = FlagsArray(MyFlags, [f0, f1, f2])
+        flags_array[0] = f1 | f2
+        flags_array.insert(0, no_flags)
+        flags_array.append(all_flags)
+        self.assertListEqual(list(flags_array), [no_flags, f1 | f2, f1, f2, all_flags])
+        self.assertEqual(flags_array[-1], all_flags)
+        self.assertEqual(flags_array[1:3], FlagsArray(MyFlags, [f1 | f2, f1]))
+        del flags_array[1:3]
+        self.assertListEqual(list(flags_array), [no_flags, f2, all_flags])
+        self.assertIn(f2, flags_array)
+        self.assertNotIn(f0, flags_array)
+        self.assertNotIn(MyOtherFlags.of0, flags_array)
+        self.assertEqual(flags_array.count(f2), 1)
+        self.assertEqual(flags_array.index(all_flags), 2)
+        flags_array.reverse()
+        self.assertListEqual(list(flags_array), [all_flags, f2, no_flags])
+        flags_array.clear()
+        self.assertEqual(len(flags_array), 0)
+
+    def test_memoryview(self):
+        flags_array = FlagsArray(MyFlags, [f0, f1 | f2, no_flags])
+        view = flags_array.memoryview()
+        self.assertTrue(view.readonly)
+        self.assertEqual(view.format, flags_array.bits.typecode)
+        self.assertListEqual(view.tolist(), [1, 6, 0])
+
+    @skipIf(sys.version_info < (3, 8), 'Zero-copy read-only memoryviews require python 3.8+')
+    def test_zero_copy_memoryview(self):
+        flags_array = FlagsArray(MyFlags, [f0, f1 | f2, no_flags])
+        view = flags_array.memoryview()
+        flags_array[0] = f2
+        self.assertEqual(view[0], 4)
+        with self.assertRaises(BufferError):
+            flags_array.append(f0)
+        view.release()
+        flags_array.append(f0)
+        self.assertEqual(len(flags_array), 4)
+
+    @skipIf(sys.version_info < (3, 12), 'The __buffer__ method requires python 3.12+')
+    def test_buffer_protocol(self):
+        flags_array = FlagsArray(MyFlags, [f0, f1 | f2])
+        with memoryview(flags_array) as view:
+            self.assertTrue(view.readonly)
+            self.assertListEqual(view.tolist(), [1, 6])
+
+    def test_equality(self):
+        self.assertEqual(FlagsArray(MyFlags, [f0, f1]), FlagsArray(MyFlags, [f0, f1]))
+        self.assertNotEqual(FlagsArray(MyFlags, [f0, f1]), FlagsArray(MyFlags, [f1, f0]))
+        self.assertNotEqual(FlagsArray(MyFlags), FlagsArray(MyOtherFlags))
+        self.assertNotEqual(FlagsArray(MyFlags, [f0]), [f0])
+
+
+class TestFlagsArrayArithmetic(TestCase):
+    def setUp(self):
+        self.left = FlagsArray(MyFlags, [no_flags, f0, f0 | f1, all_flags])
+        self.right = FlagsArray(MyFlags, [f0, f0, f1, f2])
+
+    def _check_elementwise(self, result, expected_function, other):
+        other_items = list(other) if isinstance(other, FlagsArray) else [other] * len(self.left)
+        self.assertIsInstance(result, FlagsArray)
+        self.assertListEqual(list(result), [expected_function(a, b) for a, b in zip(self.left, other_items)])
+
+    def test_array_with_array(self):
+        self._check_elementwise(self.left | self.right, lambda a, b: a | b, self.right)
+        self._check_elementwise(self.left & self.right, lambda a, b: a & b, self.right)
+        self._check_elementwise(self.left ^ self.right, lambda a, b: a ^ b, self.right)
+        self._check_elementwise(self.left - self.right, lambda a, b: a - b, self.right)
+
+    def test_array_with_flags(self):
+        self._check_elementwise(self.left | f1, lambda a, b: a | b, f1)
+        self._check_elementwise(self.left & f1, lambda a, b: a & b, f1)
+        self._check_elementwise(self.left ^ f1, lambda a, b: a ^ b, f1)
+        self._check_elementwise(self.left - f1, lambda a, b: a - b, f1)
+
+    def test_flags_with_array(self):
+        self.assertListEqual(list(f1 | self.left), [f1 | item for item in self.left])
+        self.assertListEqual(list(f1 & self.left), [f1 & item for item in self.left])
+        self.assertListEqual(list(f1 ^ self.left), [f1 ^ item for item in self.left])
+        self.assertListEqual(list(f1 - self.left), [f1 - item for item in self.left])
+
+    def test_invert(self):
+        self.assertListEqual(list(~self.left), [~item for item in self.left])
+
+    def test_type_identity(self):
+        other_array = FlagsArray(MyOtherFlags, [MyOtherFlags.of0] * 4)
+        for operand in (other_array, MyOtherFlags.of0, 1, [f0] * 4):
+            with self.assertRaises(TypeError):
+                _ = self.left | operand
+            with self.assertRaises(TypeError):
+                _ = operand - self.left
+
+    def test_length_mismatch(self):
+        with self.assertRaisesRegex(ValueError, r"different lengths: 4 and 1"):
+            _ = self.left | FlagsArray(MyFlags, [f0])
+
+    def test_masks(self):
+        self.assertListEqual(self.left.contains(f0), [False, True, True, True])
+        self.assertListEqual(self.left.contains(f0 | f1), [False, False, True, True])
+        self.assertListEqual(self.left.contains(no_flags), [True] * 4)
+        self.assertListEqual(self.left.nonzero(), [False, True, True, True])
+        self.assertListEqual(list(self.left.compress(self.left.contains(f1))), [f0 | f1, all_flags])
+        with self.assertRaises(TypeError):
+            self.left.contains(MyOtherFlags.of0)
+
+
+class TestFlagsIndex(TestCase):
+    def setUp(self):
+        self.values = [f0, f1 | f2, no_flags, all_flags, f2]
+        self.index = FlagsIndex(MyFlags, self.values)
+
+    def linear_scan(self, predicate):
+        return [row_id for row_id in self.index if predicate(self.index[row_id])]
+
+    def test_mapping(self):
+        index = self.index
+        self.assertIs(index.flags_class, MyFlags)
+        self.assertEqual(len(index), 5)
+        self.assertListEqual(list(index), [0, 1, 2, 3, 4])
+        self.assertListEqual(list(index.values()), self.values)
+        self.assertIs(index[0], f0)
+        self.assertNotIn(5, index)
+        self.assertEqual(repr(index), '<FlagsIndex MyFlags len=5>')
+        with self.assertRaises(KeyError):
+            _ = index[5]
+
+    def test_queries(self):
+        index = self.index
+        for flags in (no_flags, f0, f2, f1 | f2, all_flags):
+            self.assertListEqual(index.all_of(flags), self.linear_scan(lambda value: flags in value))
+            self.assertListEqual(index.any_of(flags), self.linear_scan(lambda value: bool(value & flags)))
+            self.assertListEqual(index.none_of(flags), self.linear_scan(lambda value: not value & flags))
+        self.assertListEqual(index.all_of(f2), [1, 3, 4])
+        self.assertListEqual(index.any_of(f0 | f1), [0, 1, 3])
+        self.assertListEqual(index.none_of(f2), [0, 2])
+        self.assertListEqual(index.query(all_of=f2, none_of=f0), [1, 4])
+        self.assertListEqual(index.query(any_of=f0 | f1, none_of=f2), [0])
+        self.assertListEqual(index.query(), [0, 1, 2, 3, 4])
+        self.assertEqual(index.count(all_of=f2, none_of=f0), 2)
+        self.assertEqual(index.count(any_of=no_flags), 0)
+
+    def test_incremental_updates(self):
+        index = self.index
+        self.assertEqual(index.append(f0 | f2), 5)
+        index[1] = f0
+        del index[3]
+        index[10] = f2
+        self.assertListEqual(list(index), [0, 1, 2, 4, 5, 10])
+        self.assertListEqual(index.all_of(f0), [0, 1, 5])
+        self.assertListEqual(index.all_of(f2), [4, 5, 10])
+        self.assertListEqual(index.none_of(f1), [0, 1, 2, 4, 5, 10])
+        self.assertEqual(index.append(f1), 11)
+        del index[11]
+        self.assertEqual(index.append(f1), 12)
+        with self.assertRaises(KeyError):
+            del index[3]
+        index.clear()
+        self.assertEqual(len(index), 0)
+        self.assertListEqual(index.none_of(f0), [])
+        self.assertEqual(index.append(f0), 0)
+
+    def test_type_identity(self):
+        with self.assertRaisesRegex(TypeError, r"Expected a flags class with members"):
+            FlagsIndex(Flags)
+        for value in (MyOtherFlags.of0, 1):
+            with self.assertRaisesRegex(TypeError, r"Expected an instance of <flags MyFlags>"):
+                self.index.append(value)
+            with self.assertRaisesRegex(TypeError, r"Expected an instance of <flags MyFlags>"):
+                self.index.all_of(value)
+        with self.assertRaisesRegex(TypeError, r"Expected an int row id"):
+            self.index['a'] = f0
+        with self.assertRaisesRegex(ValueError, r"Row ids can't be negative"):
+            self.index[-1] = f0
+
+    def test_negative_bits(self):
+        negative_flags = Flags('NegativeFlags', [('f0', 1), ('f1', -4)])
+        with self.assertRaisesRegex(ValueError, r"NegativeFlags: a FlagsIndex can't be used with members that have "
+                                                r"negative bits"):
+            FlagsIndex(negative_flags)
+
+    def test_wide_flags_class(self):
+        WideFlags = Flags('WideFlags', ['w%s' % i for i in range(600)])
+        values = [WideFlags.w599, WideFlags.w0 | WideFlags.w599, WideFlags.w300]
+        index = FlagsIndex(WideFlags, values)
+        self.assertListEqual(index.all_of(WideFlags.w599), [0, 1])
+        self.assertListEqual(index.none_of(WideFlags.w0), [0, 2])
+
+
+class TestFlagsColumn(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.flags')
+        os.close(fd)
+        os.unlink(self.path)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.unlink(self.path))
+        self.values = [f0, f1 | f2, no_flags, all_flags, f2]
+
+    def write(self, flags_class=MyFlags, values=None):
+        with FlagsColumnWriter(self.path, flags_class) as writer:
+            writer.extend(self.values if values is None else values)
+
+    def test_write_and_read(self):
+        self.write()
+        with FlagsColumnReader(self.path, MyFlags) as reader:
+            self.assertEqual(len(reader), 5)
+            self.assertListEqual(list(reader), self.values)
+            self.assertIs(reader[0], f0)
+            self.assertEqual(reader[-4], f1 | f2)
+            self.assertListEqual(reader[1::2], [f1 | f2, all_flags])
+            self.assertEqual(reader.bits_at(3), 7)
+            self.assertListEqual(reader.members, [('f0', 1), ('f1', 2), ('f2', 4)])
+            with self.assertRaises(IndexError):
+                _ = reader[5]
+
+    def test_append_to_existing_file(self):
+        self.write()
+        with FlagsColumnWriter(self.path, MyFlags) as writer:
+            writer.append(f1)
+            self.assertEqual(repr(writer), '<FlagsColumnWriter %r of MyFlags>' % (self.path,))
+        with FlagsColumnReader(self.path, MyFlags) as reader:
+            self.assertListEqual(list(reader), self.values + [f1])
+
+    def test_empty_column(self):
+        self.write(values=[])
+        with FlagsColumnReader(self.path, MyFlags) as reader:
+            self.assertEqual(len(reader), 0)
+            self.assertListEqual(list(reader), [])
+
+    def test_schema_mismatch(self):
+        self.write()
+        ReorderedFlags = Flags('MyFlags', ['f1', 'f0', 'f2'])
+        with self.assertRaisesRegex(ValueError, r"doesn't match the members of <flags MyFlags>"):
+            FlagsColumnWriter(self.path, ReorderedFlags)
+        # the reader converts the bits through the member names
+        with FlagsColumnReader(self.path, ReorderedFlags) as reader:
+            self.assertListEqual([set(flags.to_simple_str().split('|')) for flags in reader],
+                                 [set(flags.to_simple_str().split('|')) for flags in self.values])
+        with self.assertRaisesRegex(ValueError, r"Invalid flag 'MyOtherFlags.f0' in serialized data"):
+            FlagsColumnReader(self.path, MyOtherFlags)
+
+    def test_type_identity(self):
+        with FlagsColumnWriter(self.path, MyFlags) as writer:
+            for value in (MyOtherFlags.of0, 1):
+                with self.assertRaisesRegex(TypeError, r"Expected an instance of <flags MyFlags>"):
+                    writer.append(value)
+        with self.assertRaisesRegex(TypeError, r"Expected a flags class with members"):
+            FlagsColumnWriter(self.path, Flags)
+
+    def test_negative_bits(self):
+        negative_flags = Flags('NegativeFlags', [('f0', 1), ('f1', -4)])
+        with self.assertRaisesRegex(ValueError, r"NegativeFlags: a flags column can't be written with members that "
+                                                r"have negative bits"):
+            FlagsColumnWriter(self.path, negative_flags)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_invalid_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 32)
+        with self.assertRaisesRegex(ValueError, r"isn't a flags column file"):
+            FlagsColumnReader(self.path, MyFlags)
+        with self.assertRaisesRegex(ValueError, r"isn't a flags column file"):
+            FlagsColumnWriter(self.path, MyFlags)
+        os.unlink(self.path)
+        WideFlags = Flags('WideFlags', ['w%s' % i for i in range(20)])
+        self.write(WideFlags, [WideFlags.w0])
+        with open(self.path, 'ab') as f:
+            f.write(b'\0')
+        with self.assertRaisesRegex(ValueError, r"ends with an incomplete row"):
+            FlagsColumnWriter(self.path, WideFlags)
+
+    def test_item_size(self):
+        WideFlags = Flags('WideFlags', ['w%s' % i for i in range(20)])
+        values = [WideFlags.w19, WideFlags.w0 | WideFlags.w10, WideFlags.all_flags]
+        self.write(WideFlags, values)
+        with FlagsColumnReader(self.path, WideFlags) as reader:
+            self.assertListEqual(list(reader), values)
+            self.assertEqual(os.path.getsize(self.path) % 4, 0)
+
+    @skipIf(sys.byteorder != 'little', 'Native memoryviews of the bits column require a little endian platform')
+    def test_memoryview(self):
+        self.write()
+        with FlagsColumnReader(self.path, MyFlags) as reader:
+            view = reader.memoryview()
+            self.assertEqual(view.itemsize, 1)
+            self.assertTrue(view.readonly)
+            self.assertListEqual(view.tolist(), [int(flags) for flags in self.values])
+            view.release()
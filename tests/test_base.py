@@ -3,6 +3,7 @@ This module is excluded from the test discovery by the load_tests() function in
 You can use this module to declare reusable test base classes/mixins.
 """
 
+import asyncio
 import pickle
 import sys
 from unittest import TestCase, TestSuite
@@ -43,5 +44,14 @@ class PicklingSuccessTestBase(PicklingTestCase):
         self._pickle_and_unpickle(self.FlagsClass.f1 | self.FlagsClass.f2)
 
 
+def run_coroutine(coroutine):
+    """ asyncio.run() requires python 3.7+. """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
 def load_tests(loader, tests, pattern):
     return TestSuite()
@@ -0,0 +1,383 @@
+""" Testing the bounded caches and the per-class caches that are built on top of them. """
+import re
+import sys
+import threading
+from unittest import TestCase
+
+from flags import Flags, LRUCache, ClockCache, StripedCache, create_bounded_cache
+
+
+class BoundedCacheTestBase:
+    CacheClass = None
+
+    def test_get_and_setdefault(self):
+        cache = self.CacheClass(2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.setdefault('a', 1), 1)
+        self.assertEqual(cache.setdefault('a', 2), 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b', 'default'), 'default')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(tuple(cache.cache_info()), (1, 2, 2, 1))
+
+    def test_size_is_bounded(self):
+        cache = self.CacheClass(3)
+        for i in range(10):
+            cache.setdefault(i, str(i))
+            self.assertLessEqual(len(cache), 3)
+        self.assertEqual(cache.get(9), '9')
+
+    def test_recently_used_items_survive_eviction(self):
+        cache = self.CacheClass(2)
+        cache.setdefault('a', 1)
+        cache.setdefault('b', 2)
+        cache.get('a')
+        cache.setdefault('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_clear(self):
+        cache = self.CacheClass(2)
+        cache.setdefault('a', 1)
+        cache.get('a')
+        cache.clear()
+        self.assertEqual(tuple(cache.cache_info()), (0, 0, 2, 0))
+        self.assertIsNone(cache.get('a'))
+
+    def test_invalid_maxsize(self):
+        for maxsize in (0, -1, 1.5, True, None):
+            with self.assertRaisesRegex(ValueError, r"The maxsize of a cache should be a positive int"):
+                self.CacheClass(maxsize)
+
+
+class TestLRUCache(BoundedCacheTestBase, TestCase):
+    CacheClass = LRUCache
+
+
+class TestClockCache(BoundedCacheTestBase, TestCase):
+    CacheClass = ClockCache
+
+
+class TestStripedCache(TestCase):
+    def test_get_and_setdefault(self):
+        cache = StripedCache(LRUCache, 8, 4)
+        self.assertEqual(cache.stripes, 4)
+        self.assertEqual(cache.policy, 'lru')
+        for i in range(8):
+            self.assertIsNone(cache.get(i))
+            self.assertEqual(cache.setdefault(i, str(i)), str(i))
+            self.assertEqual(cache.setdefault(i, 'other'), str(i))
+        self.assertListEqual([cache.get(i) for i in range(8)], [str(i) for i in range(8)])
+        self.assertEqual(len(cache), 8)
+        self.assertEqual(tuple(cache.cache_info()), (8, 8, 8, 8))
+        cache.clear()
+        self.assertEqual(tuple(cache.cache_info()), (0, 0, 8, 0))
+
+    def test_size_is_bounded(self):
+        cache = StripedCache(ClockCache, 10, 4)
+        for i in range(100):
+            cache.setdefault(i, i)
+        self.assertEqual(len(cache), 10)
+
+    def test_stripes_are_limited_by_maxsize(self):
+        self.assertEqual(StripedCache(LRUCache, 2, 8).stripes, 2)
+
+    def test_invalid_arguments(self):
+        for stripes in (0, -1, 1.5, None):
+            with self.assertRaisesRegex(ValueError, r"The number of cache stripes should be a positive int"):
+                StripedCache(LRUCache, 8, stripes)
+        with self.assertRaisesRegex(ValueError, r"The maxsize of a cache should be a positive int"):
+            StripedCache(LRUCache, 0, 2)
+
+
+class TestCreateBoundedCache(TestCase):
+    def test_policies(self):
+        self.assertIsInstance(create_bounded_cache('lru', 1), LRUCache)
+        self.assertIsInstance(create_bounded_cache('clock', 1), ClockCache)
+        cache = create_bounded_cache('clock', 8, 4)
+        self.assertIsInstance(cache, StripedCache)
+        self.assertEqual((cache.policy, cache.stripes), ('clock', 4))
+        with self.assertRaisesRegex(ValueError, re.escape("Invalid cache policy 'fifo', expected one of: clock, lru")):
+            create_bounded_cache('fifo', 1)
+
+
+class TestInterning(TestCase):
+    class InternedFlags(Flags):
+        __intern_cache_size__ = 2
+        f0 = ()
+        f1 = ()
+        f2 = ()
+        f3 = ()
+
+    class ClockInternedFlags(Flags):
+        __intern_cache_size__ = 2
+        __intern_cache_policy__ = 'clock'
+        f0 = ()
+        f1 = ()
+        f2 = ()
+
+    def setUp(self):
+        self.InternedFlags.__intern_cache__.clear()
+        self.ClockInternedFlags.__intern_cache__.clear()
+
+    def test_interning_is_disabled_by_default(self):
+        flags_class = Flags('NotInterned', 'f0 f1 f2')
+        self.assertIsNone(flags_class.__intern_cache__)
+        self.assertIsNot(flags_class.f0 | flags_class.f1, flags_class.f0 | flags_class.f1)
+
+    def test_composites_are_interned(self):
+        for flags_class in (self.InternedFlags, self.ClockInternedFlags):
+            f0, f1 = flags_class.f0, flags_class.f1
+            self.assertIs(f0 | f1, f1 | f0)
+            self.assertIs(f0 | f1, flags_class(3))
+            self.assertIs(f0 | f1, flags_class('f0|f1'))
+            self.assertIs(flags_class.all_flags - flags_class.f2, flags_class.all_flags ^ flags_class.f2)
+            self.assertIs(~f0, ~f0)
+
+    def test_members_dont_go_through_the_cache(self):
+        f0, f1 = self.InternedFlags.f0, self.InternedFlags.f1
+        self.assertIs((f0 | f1) & f1, f1)
+        self.assertIs(self.InternedFlags(0), self.InternedFlags.no_flags)
+        info = self.InternedFlags.__intern_cache__.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (0, 1, 1))
+
+    def test_hit_and_miss_counters(self):
+        f0, f1, f2 = self.InternedFlags.f0, self.InternedFlags.f1, self.InternedFlags.f2
+        _ = f0 | f1
+        _ = f0 | f1
+        _ = f0 | f2
+        _ = f1 | f2
+        info = self.InternedFlags.__intern_cache__.cache_info()
+        self.assertEqual(info, (1, 3, 2, 2))
+
+    def test_evicted_composites_are_still_equal(self):
+        f0, f1, f2 = self.InternedFlags.f0, self.InternedFlags.f1, self.InternedFlags.f2
+        f01 = f0 | f1
+        _ = f0 | f2
+        _ = f1 | f2
+        _ = f1 | f2 | f0
+        self.assertEqual(f0 | f1, f01)
+
+    def test_invalid_configuration(self):
+        with self.assertRaisesRegex(ValueError, r"Invalid cache policy 'invalid'"):
+            class InvalidPolicy(Flags):
+                __intern_cache_size__ = 2
+                __intern_cache_policy__ = 'invalid'
+                f0 = ()
+
+        with self.assertRaisesRegex(ValueError, r"The maxsize of a cache should be a positive int"):
+            class InvalidSize(Flags):
+                __intern_cache_size__ = -1
+                f0 = ()
+
+    def test_intern_cache_is_protected(self):
+        for attribute in ('__intern_cache__', '__intern_cache_size__', '__intern_cache_policy__'):
+            with self.assertRaisesRegex(AttributeError, r"Can't assign protected attribute"):
+                setattr(self.InternedFlags, attribute, None)
+
+
+class TestDenseInstanceTable(TestCase):
+    class DenseFlags(Flags):
+        __dense_instance_table__ = True
+        f0 = 1
+        f1 = 2
+        f3 = 8
+
+    def test_table(self):
+        table = self.DenseFlags.__instance_table__
+        self.assertEqual(len(table.instances), 12)
+        self.assertEqual(len(table), 8)
+        for bits, instance in enumerate(table.instances):
+            if bits & ~11:
+                self.assertIsNone(instance)
+            else:
+                self.assertEqual(int(instance), bits)
+        self.assertIs(table.instances[1], self.DenseFlags.f0)
+        self.assertIs(table.instances[0], self.DenseFlags.no_flags)
+        self.assertIs(table.instances[11], self.DenseFlags.all_flags)
+
+    def test_memory_usage(self):
+        table = self.DenseFlags.__instance_table__
+        # 5 of the 8 instances are either members or special members
+        self.assertEqual(table.memory_usage(),
+                         sys.getsizeof(table.instances) + 3 * sys.getsizeof(self.DenseFlags.f0))
+
+    def test_instance_identity_holds_for_all_values(self):
+        f0, f1, f3 = self.DenseFlags.f0, self.DenseFlags.f1, self.DenseFlags.f3
+        self.assertIs(f0 | f1, f1 | f0)
+        self.assertIs(f0 | f1, self.DenseFlags(3))
+        self.assertIs(f0 | f1, self.DenseFlags(0xff & ~8))
+        self.assertIs(f0 | f1, self.DenseFlags('f0|f1'))
+        self.assertIs(~f3, f0 | f1)
+        self.assertIs(self.DenseFlags.all_flags - f3, (f0 | f1 | f3) ^ f3)
+        self.assertIs(self.DenseFlags(0), self.DenseFlags.no_flags)
+
+    def test_dense_table_is_disabled_by_default(self):
+        self.assertIsNone(Flags('NotDense', 'f0 f1').__instance_table__)
+
+    def test_invalid_configuration(self):
+        with self.assertRaisesRegex(ValueError, r"TooWide: a dense instance table can be used only if all bits "
+                                                r"of the members fit into 16 bits"):
+            class TooWide(Flags):
+                __dense_instance_table__ = True
+                f0 = 1 << 16
+
+        with self.assertRaisesRegex(ValueError, r"Negative: a dense instance table can't be used with members that "
+                                                r"have negative bits"):
+            class Negative(Flags):
+                __dense_instance_table__ = True
+                f0 = -2
+
+        with self.assertRaisesRegex(ValueError, r"Both: __dense_instance_table__ and __intern_cache_size__ can't "
+                                                r"be used together"):
+            class Both(Flags):
+                __dense_instance_table__ = True
+                __intern_cache_size__ = 10
+                f0 = ()
+
+
+class TestStrCache(TestCase):
+    class CachedStrFlags(Flags):
+        __str_cache_size__ = 2
+        f0 = ['data0']
+        f1 = ()
+        f2 = ()
+
+    def setUp(self):
+        self.CachedStrFlags.__str_cache__.clear()
+
+    def test_str_cache_is_disabled_by_default(self):
+        flags_class = Flags('NotCached', 'f0 f1')
+        self.assertIsNone(flags_class.__str_cache__)
+        self.assertNotIn('__str__', vars(flags_class))
+
+    def test_output_doesnt_change(self):
+        flags_class = self.CachedStrFlags
+        for _ in range(2):
+            self.assertEqual(str(flags_class.f0), 'CachedStrFlags.f0')
+            self.assertEqual(repr(flags_class.f0), "<CachedStrFlags.f0 bits=0x0001 data='data0'>")
+            self.assertEqual(flags_class.f0.to_simple_str(), 'f0')
+            self.assertEqual(str(flags_class.f0 | flags_class.f2), 'CachedStrFlags(f0|f2)')
+            self.assertEqual(repr(flags_class.f0 | flags_class.f2), '<CachedStrFlags(f0|f2) bits=0x0005>')
+            self.assertEqual((flags_class.f0 | flags_class.f2).to_simple_str(), 'f0|f2')
+            self.assertEqual(str(flags_class.no_flags), 'CachedStrFlags()')
+
+    def test_cache_is_keyed_by_bits(self):
+        flags_class = self.CachedStrFlags
+        cache = flags_class.__str_cache__
+        self.assertIs(str(flags_class.f0 | flags_class.f1), str(flags_class.f1 | flags_class.f0))
+        self.assertIs(repr(flags_class.f0 | flags_class.f1), repr(flags_class.f1 | flags_class.f0))
+        self.assertEqual(cache.cache_info(), (3, 1, 2, 1))
+        str(flags_class.f1)
+        str(flags_class.f2)
+        self.assertEqual(len(cache), 2)
+
+    def test_cached_methods_wrap_overrides(self):
+        class CustomStrFlags(Flags):
+            __str_cache_size__ = 8
+            f0 = ()
+
+            def __str__(self):
+                return 'custom'
+
+        self.assertEqual(str(CustomStrFlags.f0), 'custom')
+        self.assertEqual(str(CustomStrFlags.f0), 'custom')
+
+    def test_concurrent_rendering(self):
+        flags_class = self.CachedStrFlags
+        values = [flags_class(bits) for bits in range(8)] * 50
+        expected = [Flags.__str__(value) for value in values]
+        results = []
+
+        def render():
+            results.append([str(value) for value in values])
+
+        threads = [threading.Thread(target=render) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        for result in results:
+            self.assertListEqual(result, expected)
+
+
+class TestConcurrentCaches(TestCase):
+    """ Stress test: threads running flags arithmetic, parsing and str conversion through small caches
+    that keep evicting items while another thread keeps clearing them. """
+    thread_count = 8
+    iterations = 300
+
+    def create_flags_class(self, policy, stripes):
+        class MyFlags(Flags):
+            __intern_cache_size__ = 4
+            __intern_cache_policy__ = policy
+            __str_cache_size__ = 4
+            __str_cache_policy__ = policy
+            __parse_cache_size__ = 4
+            __parse_cache_policy__ = policy
+            __cache_stripes__ = stripes
+            f0 = ()
+            f1 = ()
+            f2 = ()
+            f3 = ()
+            f4 = ()
+            f5 = ()
+        return MyFlags
+
+    def run_threads(self, flags_class):
+        members = list(flags_class)
+        errors = []
+        done = threading.Event()
+
+        def work(thread_index):
+            try:
+                for i in range(self.iterations):
+                    a = members[(thread_index + i) % len(members)]
+                    b = members[(thread_index * 7 + i * 3) % len(members)]
+                    value = a | b
+                    bits = int(a) | int(b)
+                    self.assertEqual(int(value), bits)
+                    self.assertEqual(value, flags_class(bits))
+                    self.assertEqual(int(~value), int(flags_class.all_flags) ^ bits)
+                    self.assertEqual(flags_class(value.to_simple_str()), value)
+                    self.assertEqual(str(value), str(flags_class(bits)))
+                    self.assertEqual(flags_class.bits_from_str(str(value)), bits)
+                    self.assertIs(value & a, a)
+            except BaseException as e:
+                errors.append(e)
+
+        def clear_caches():
+            while not done.is_set():
+                for cache in (flags_class.__intern_cache__, flags_class.__str_cache__, flags_class.__parse_cache__):
+                    cache.clear()
+
+        clearer = threading.Thread(target=clear_caches)
+        threads = [threading.Thread(target=work, args=(index,)) for index in range(self.thread_count)]
+        old_switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            clearer.start()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            done.set()
+            clearer.join()
+            sys.setswitchinterval(old_switch_interval)
+        if errors:
+            raise errors[0]
+
+    def test_lru(self):
+        self.run_threads(self.create_flags_class('lru', 1))
+
+    def test_clock(self):
+        self.run_threads(self.create_flags_class('clock', 1))
+
+    def test_striped_lru(self):
+        self.run_threads(self.create_flags_class('lru', 3))
+
+    def test_striped_clock(self):
+        self.run_threads(self.create_flags_class('clock', 3))
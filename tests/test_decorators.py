@@ -80,6 +80,38 @@ class TestUniqueBitsDecorator(TestCase):
                 f1 = 2
                 f2 = 5
 
+    def test_overlapping_bits_report_contains_every_pair(self):
+        with self.assertRaisesRegex(ValueError, re.escape(
+                "<flags MyFlags>: 'f0' and 'f2' have overlapping bits, 'f1' and 'f2' have overlapping bits, "
+                "'f0' and 'f3' have overlapping bits, 'f2' and 'f3' have overlapping bits")):
+            @unique_bits
+            class MyFlags(Flags):
+                f0 = 1
+                f1 = 2
+                f2 = 3
+                f3 = 9
+                f4 = 16
+
+    def test_overlapping_bits_with_many_members(self):
+        members = [('f%s' % i, 1 << i) for i in range(5000)] + [('last', 1 | (1 << 4999))]
+        with self.assertRaisesRegex(ValueError, re.escape(
+                "<flags MyFlags>: 'f0' and 'last' have overlapping bits, 'f4999' and 'last' have overlapping bits")):
+            unique_bits(Flags('MyFlags', members))
+
+    def test_overlapping_negative_bits(self):
+        with self.assertRaisesRegex(ValueError, re.escape("<flags MyFlags>: 'a' and 'b' have overlapping bits")):
+            @unique_bits
+            class MyFlags(Flags):
+                a = -1
+                b = -2
+
+        with self.assertRaisesRegex(ValueError, re.escape("<flags MyFlags2>: 'f1' and 'f2' have overlapping bits")):
+            @unique_bits
+            class MyFlags2(Flags):
+                f0 = 1
+                f1 = 2
+                f2 = -2
+
     def test_decorator_fails_with_non_final_flags_class(self):
         with self.assertRaisesRegex(TypeError,
                                     re.escape(r"unique check can be applied only to flags classes that have members")):
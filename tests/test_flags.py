@@ -1,8 +1,12 @@
 import collections
 import re
+import sys
+import unittest.mock
 from unittest import TestCase
 
-from flags import Flags, FlagProperties, FlagData, Const, PROTECTED_FLAGS_CLASS_ATTRIBUTES, UNDEFINED
+from flags import Flags, FlagProperties, FlagData, Const, LazyFlagsClassAttribute, PROTECTED_FLAGS_CLASS_ATTRIBUTES, \
+    UNDEFINED
+from . import test_base
 
 
 class TestUtilities(TestCase):
@@ -47,6 +51,21 @@ class TestUtilities(TestCase):
         self.assertTrue(properties.readonly)
 
 
+    def test_readonly_flag_properties_from_constructor(self):
+        properties = FlagProperties(name='name', bits=1, data='data', index=1, index_without_aliases=0, readonly=True)
+        self.assertTrue(properties.readonly)
+        self.assertEqual((properties.name, properties.bits, properties.data, properties.index,
+                          properties.index_without_aliases), ('name', 1, 'data', 1, 0))
+        with self.assertRaisesRegex(AttributeError,
+                                    re.escape(r"Can't set attribute 'data' of readonly 'FlagProperties' object")):
+            properties.data = 'data2'
+
+    def test_member_properties_are_readonly(self):
+        flags_class = Flags('MyFlags', 'f0 f1 f1_alias')
+        for member in flags_class:
+            self.assertTrue(member.properties.readonly)
+
+
 class TestFlagsMemberDeclaration(TestCase):
     """ Tests different ways of declaring the members/flags of a flags class. """
     def _test_flags_class(self, flags_class, *, unordered_members=False, has_data=False):
@@ -893,3 +912,592 @@ class TestFlagsInstanceMethods(TestCase):
 
         with self.assertRaisesRegex(ValueError, re.escape(r"Invalid flag 'MyFlags.invalid' in string 'f0|invalid|f1'")):
             self.MyFlags.bits_from_simple_str('f0|invalid|f1')
+
+
+class TestFastMemberIteration(TestCase):
+    """ Flags classes with disjoint single bit members get specialized __len__, __iter__ and __reversed__. """
+    class Ascending(Flags):
+        f0 = 1
+        f1 = 2
+        f2 = 4
+        f2_alias = 4
+
+    class Descending(Flags):
+        f2 = 4
+        f1 = 2
+        f0 = 1
+        f5 = 32
+
+    class Overlapping(Flags):
+        f1 = 1
+        f3 = 3
+
+    def _check(self, flags_class):
+        members = list(flags_class)
+        for bits in range(int(flags_class.all_flags) + 1):
+            instance = flags_class(bits)
+            expected = [member for member in members if member in instance]
+            self.assertListEqual(list(instance), expected)
+            self.assertListEqual(list(reversed(instance)), expected[::-1])
+            self.assertEqual(len(instance), len(expected))
+
+    def test_specialized_methods_are_installed(self):
+        for flags_class in (self.Ascending, self.Descending):
+            for name in ('__len__', '__iter__', '__reversed__'):
+                self.assertIn(name, vars(flags_class))
+        for name in ('__len__', '__iter__', '__reversed__'):
+            self.assertNotIn(name, vars(self.Overlapping))
+
+    def test_ascending(self):
+        self._check(self.Ascending)
+        self.assertListEqual(list(self.Ascending.all_flags), [self.Ascending.f0, self.Ascending.f1,
+                                                              self.Ascending.f2])
+
+    def test_descending(self):
+        self._check(self.Descending)
+        self.assertListEqual(list(self.Descending.f0 | self.Descending.f2 | self.Descending.f5),
+                             [self.Descending.f2, self.Descending.f0, self.Descending.f5])
+
+    def test_overlapping(self):
+        self._check(self.Overlapping)
+        self.assertEqual(len(self.Overlapping.f3), 2)
+
+    def test_negative_bits(self):
+        class Negative(Flags):
+            a = 1
+            b = -4
+        for name in ('__len__', '__iter__', '__reversed__'):
+            self.assertNotIn(name, vars(Negative))
+        self.assertEqual(repr(Negative.b), '<Negative.b bits=0x-004 data=UNDEFINED>')
+        self.assertEqual(str(Negative.b), 'Negative.b')
+        self.assertListEqual(list(Negative.b), [Negative.b])
+        self.assertIs(Negative.from_str('b'), Negative.b)
+        self.assertEqual(len(Negative(-7)), 1)
+        self.assertListEqual(list(Negative(-7)), [Negative.a])
+        self.assertEqual(str(Negative(4)), 'Negative()')
+
+
+class TestFastProperties(TestCase):
+    """ Final flags classes get is_member, properties, name and data specialized by Flags._compile_fast_properties().
+    Their results have to match those of the generic implementations. """
+    class MyFlags(Flags):
+        f0 = 1, 'data0'
+        f1 = 2
+        f01 = 3
+        alias = 1
+
+    class CustomName(Flags):
+        @property
+        def name(self):
+            return 'custom'
+        f0 = ()
+
+    def _check(self, flags_class):
+        for bits in range(int(flags_class.all_flags) + 1):
+            instance = flags_class(bits)
+            for name in ('is_member', 'properties', 'name', 'data'):
+                self.assertIs(getattr(instance, name), getattr(Flags, name).fget(instance))
+
+    def test_specialized_properties_are_installed(self):
+        for name in ('is_member', 'properties', 'name', 'data'):
+            self.assertIn(name, vars(self.MyFlags))
+            self.assertEqual(getattr(self.MyFlags, name).__doc__, getattr(Flags, name).__doc__)
+            self.assertEqual(getattr(self.MyFlags, name).fget.__name__, name)
+            self.assertEqual(getattr(self.MyFlags, name).fget.__qualname__, 'TestFastProperties.MyFlags.' + name)
+        self.assertEqual(self.CustomName.f0.name, 'custom')
+        self.assertTrue(self.CustomName.f0.is_member)
+
+    def test_results_match_the_generic_properties(self):
+        self._check(self.MyFlags)
+        self.assertEqual(self.MyFlags.alias.name, 'f0')
+        self.assertEqual(self.MyFlags.f0.data, 'data0')
+        self.assertIs(self.MyFlags.f01.properties, self.MyFlags.__bits_to_properties__[3])
+
+    def test_wide_and_sparse_flags(self):
+        for options in ({'__wide_flags__': True}, {'__sparse_flags__': True}):
+            class_dict = dict(options, __members__=['f%s' % i for i in range(5)])
+            self._check(type(Flags)('OptionFlags', (Flags,), class_dict))
+
+
+class TestMemberDescriptors(TestCase):
+    """ Final flags classes get a MemberTest descriptor for each member name so `flags.member_name` tests the
+    bits of the member without going through Flags.__getattr__. """
+    class MyFlags(Flags):
+        f0 = 1
+        f1 = 2
+        f01 = 3
+        alias = 1
+        data = 4
+
+    class CustomGetattr(Flags):
+        def __getattr__(self, name):
+            return 'custom'
+        f0 = ()
+
+    def test_descriptors_are_installed(self):
+        for name in ('f0', 'f1', 'f01', 'alias'):
+            self.assertIn(name, vars(self.MyFlags))
+        # names that would shadow an existing attribute and the special members are served as before
+        self.assertIsInstance(vars(self.MyFlags)['data'], property)
+        self.assertIs(self.MyFlags.f0.data, UNDEFINED)
+        self.assertNotIn('no_flags', vars(self.MyFlags))
+        self.assertNotIn('f0', vars(self.CustomGetattr))
+        self.assertEqual(self.CustomGetattr.f0.anything, 'custom')
+
+    def test_class_attribute_access_returns_the_member(self):
+        self.assertIs(self.MyFlags.f0, self.MyFlags.__members__['f0'])
+        self.assertIs(self.MyFlags.alias, self.MyFlags.f0)
+        self.assertIs(self.MyFlags.__dict__['f01'].member, self.MyFlags.f01)
+
+    def test_results_match_getattr(self):
+        for bits in range(int(self.MyFlags.all_flags) + 1):
+            instance = self.MyFlags(bits)
+            for name in ('f0', 'f1', 'f01', 'alias'):
+                self.assertIs(getattr(instance, name), Flags.__getattr__(instance, name))
+        self.assertTrue((self.MyFlags.f0 | self.MyFlags.f1).f01)
+        self.assertFalse(self.MyFlags.f1.f01)
+        with self.assertRaises(AttributeError):
+            _ = self.MyFlags.f0.no_flags
+
+    def test_sparse_and_lazy_flags(self):
+        for options, installed in (({'__sparse_flags__': True}, False), ({'__lazy_members__': True}, True)):
+            flags_class = type(Flags)('OptionFlags', (Flags,), dict(options, __members__=['a', 'b', 'c']))
+            value = flags_class.a | flags_class.c
+            # sparse classes use their set based __contains__ through __getattr__
+            self.assertEqual('a' in vars(flags_class), installed)
+            self.assertEqual((value.a, value.b, value.c), (True, False, True))
+
+    def test_overridden_contains_is_used(self):
+        class CustomContains(Flags):
+            def __contains__(self, item):
+                return True
+            a = ()
+            b = ()
+        self.assertNotIn('b', vars(CustomContains))
+        self.assertIs(CustomContains.a.b, True)
+        self.assertIs(CustomContains.b, CustomContains.__members__['b'])
+
+
+class TestCompiledParser(TestCase):
+    """ Final flags classes get bits_from_str and bits_from_simple_str classmethods specialized by
+    Flags._compile_parser(). Their results have to match those of the generic implementations. """
+    class MyFlags(Flags):
+        f0 = 1
+        f1 = 2
+        f1_alias = 2
+        MyFlagsX = 4
+        __no_flags_name__ = 'none'
+
+    def _check_same_as_generic(self, method_name, s):
+        method = getattr(self.MyFlags, method_name)
+        generic_method = getattr(Flags, method_name).__func__
+        try:
+            expected = generic_method(self.MyFlags, s)
+            error = None
+        except ValueError as ex:
+            error = ex
+        if error is None:
+            self.assertEqual(method(s), expected)
+            # second call: table or parse cache hit
+            self.assertEqual(method(s), expected)
+        else:
+            with self.assertRaisesRegex(ValueError, '^%s$' % re.escape(str(error))) as cm:
+                method(s)
+            # the errors of the generic method aren't chained to the internal errors of the compiled one
+            self.assertIs(type(cm.exception.__context__), type(error.__context__))
+
+    def test_same_results_as_generic(self):
+        inputs = ['', 'f0', ' f0 ', 'f0|f1', 'f1|f0', 'f1_alias', '|f0||f1|', 'none', 'all_flags', 'invalid',
+                  'f0|invalid', 'MyFlags', 'MyFlags.f0', 'MyFlags.f1_alias', 'MyFlags. f0', 'MyFlags.none',
+                  'MyFlags()', 'MyFlags(f0|f1)', 'MyFlags(f0', 'MyFlags<f0>', 'MyFlags.invalid', 'MyFlagsX',
+                  'MyFlags.MyFlagsX', 'MyFlags(MyFlagsX)', 'MyFlags(invalid)']
+        for s in inputs:
+            self._check_same_as_generic('bits_from_simple_str', s)
+            self._check_same_as_generic('bits_from_str', s)
+
+    def test_parse_cache(self):
+        cache = self.MyFlags.__parse_cache__
+        cache.clear()
+        self.assertEqual(self.MyFlags.bits_from_str('MyFlags(f1|f0)'), 3)
+        self.assertEqual(self.MyFlags.bits_from_str('MyFlags(f1|f0)'), 3)
+        # member names and their dotted forms are served by a table without touching the cache
+        self.assertEqual(self.MyFlags.bits_from_str('MyFlags.f1'), 2)
+        self.assertEqual(cache.cache_info()[:2], (1, 1))
+
+        with self.assertRaises(ValueError):
+            self.MyFlags.bits_from_str('MyFlags(f1|invalid)')
+        self.assertEqual(len(cache), 1)
+
+    def test_parse_cache_can_be_disabled(self):
+        class Uncached(Flags):
+            __parse_cache_size__ = 0
+            f0 = ()
+            f1 = ()
+
+        self.assertIsNone(Uncached.__parse_cache__)
+        self.assertEqual(Uncached.bits_from_str('Uncached(f0|f1)'), 3)
+        self.assertEqual(Uncached.bits_from_str('f1'), 2)
+
+    def test_non_str_input(self):
+        with self.assertRaises(TypeError):
+            self.MyFlags.bits_from_str(42)
+        with self.assertRaises(AttributeError):
+            self.MyFlags.bits_from_simple_str(42)
+
+    def test_overridden_parser_is_kept(self):
+        class CustomParser(Flags):
+            f0 = ()
+
+            @classmethod
+            def bits_from_simple_str(cls, s):
+                return 1
+
+        self.assertEqual(CustomParser.bits_from_str('whatever'), 1)
+
+
+class TestBatchConversion(TestCase):
+    MyFlags = Flags('MyFlags', 'f0 f1 f2')
+
+    def test_from_str_many(self):
+        strings = ['f0', 'f0|f1', '', 'MyFlags.f2', 'f0|f1', 'MyFlags(f1|f2)']
+        result = self.MyFlags.from_str_many(strings)
+        self.assertNotIsInstance(result, list)
+        self.assertListEqual(list(result), [self.MyFlags.from_str(s) for s in strings])
+        self.assertListEqual(list(self.MyFlags.bits_from_str_many(strings)), [1, 3, 0, 4, 3, 6])
+
+    def test_from_str_many_streams_its_input(self):
+        def strings():
+            while True:
+                yield 'f0|f2'
+        result = self.MyFlags.from_str_many(strings())
+        self.assertEqual(next(result), self.MyFlags.f0 | self.MyFlags.f2)
+        self.assertEqual(next(result), self.MyFlags.f0 | self.MyFlags.f2)
+
+    def test_from_str_many_errors(self):
+        with self.assertRaisesRegex(ValueError, re.escape("Invalid flag 'MyFlags.invalid' in string 'invalid'")):
+            list(self.MyFlags.from_str_many(['f0', 'invalid']))
+        with self.assertRaisesRegex(TypeError, re.escape("Expected an str instance, received 42")):
+            list(self.MyFlags.from_str_many(['f0', 42]))
+        with self.assertRaisesRegex(TypeError, re.escape("Expected an str instance, received []")):
+            list(self.MyFlags.from_str_many([[]]))
+
+    def test_from_str_many_errors_arent_chained(self):
+        for method in (self.MyFlags.from_str_many, self.MyFlags.bits_from_str_many):
+            for strings in (['invalid'], ['f0', 'f0|invalid'], [[]]):
+                with self.assertRaises((ValueError, TypeError, AttributeError)) as cm:
+                    list(method(strings))
+                self.assertIsNone(cm.exception.__context__)
+
+    def test_to_str_many(self):
+        values = [self.MyFlags.f0, self.MyFlags.no_flags, self.MyFlags.f0 | self.MyFlags.f1, self.MyFlags.f0]
+        self.assertListEqual(list(self.MyFlags.to_str_many(values)), ['f0', '', 'f0|f1', 'f0'])
+
+    def test_to_str_many_requires_type_identity(self):
+        other_flags = Flags('OtherFlags', 'f0')
+        with self.assertRaisesRegex(TypeError, r"Expected an instance of <flags MyFlags>"):
+            list(self.MyFlags.to_str_many([self.MyFlags.f0, other_flags.f0]))
+
+    def test_round_trip_through_flags_array(self):
+        from flags import FlagsArray
+        strings = ['f0', 'f1|f2', '', 'f0|f1|f2']
+        flags_array = FlagsArray.from_bits(self.MyFlags, self.MyFlags.bits_from_str_many(strings))
+        self.assertListEqual(list(self.MyFlags.to_str_many(flags_array)), strings)
+
+
+class TestAggregation(TestCase):
+    class MyFlags(Flags):
+        f0 = 1
+        f1 = 2
+        f2 = 4
+        f01 = 3
+        alias = 1
+
+    def setUp(self):
+        f0, f1, f2 = self.MyFlags.f0, self.MyFlags.f1, self.MyFlags.f2
+        self.values = [f0, f0 | f1, f2, f0 | f1 | f2, f0 | f1, self.MyFlags.no_flags]
+
+    @staticmethod
+    def run_async(flags_instances, method, *args):
+        async def async_iterable():
+            for flags in flags_instances:
+                yield flags
+        return test_base.run_coroutine(method(async_iterable(), *args))
+
+    def test_count_members(self):
+        expected = {'f0': 4, 'f1': 3, 'f2': 2, 'f01': 3}
+        self.assertEqual(self.MyFlags.count_members(self.values), expected)
+        self.assertListEqual(list(self.MyFlags.count_members(self.values)), ['f0', 'f1', 'f2', 'f01'])
+        self.assertEqual(self.MyFlags.count_members(self.values, 2), expected)
+        self.assertEqual(self.MyFlags.count_members(iter(self.values)), expected)
+        self.assertEqual(self.MyFlags.count_members([]), {'f0': 0, 'f1': 0, 'f2': 0, 'f01': 0})
+
+    def test_cooccurrence(self):
+        matrix = self.MyFlags.cooccurrence(self.values, 4)
+        self.assertEqual(matrix['f0'], {'f0': 4, 'f1': 3, 'f2': 1, 'f01': 3})
+        self.assertEqual(matrix['f2'], {'f0': 1, 'f1': 1, 'f2': 2, 'f01': 1})
+        self.assertEqual({name: row[name] for name, row in matrix.items()}, self.MyFlags.count_members(self.values))
+
+    def test_reduce(self):
+        MyFlags = self.MyFlags
+        self.assertIs(MyFlags.reduce_or(self.values), MyFlags.all_flags)
+        self.assertIs(MyFlags.reduce_or(self.values[:2], 1), MyFlags.f01)
+        self.assertIs(MyFlags.reduce_or([]), MyFlags.no_flags)
+        self.assertIs(MyFlags.reduce_and(self.values[:2]), MyFlags.f0)
+        self.assertIs(MyFlags.reduce_and(self.values), MyFlags.no_flags)
+        self.assertIs(MyFlags.reduce_and([]), MyFlags.all_flags)
+
+    def test_async_iterables(self):
+        MyFlags = self.MyFlags
+        self.assertEqual(self.run_async(self.values, MyFlags.count_members, 4), MyFlags.count_members(self.values))
+        self.assertEqual(self.run_async(self.values, MyFlags.cooccurrence), MyFlags.cooccurrence(self.values))
+        self.assertIs(self.run_async(self.values, MyFlags.reduce_or, 5), MyFlags.all_flags)
+        self.assertIs(self.run_async(self.values[:3], MyFlags.reduce_and), MyFlags.no_flags)
+
+    def test_type_identity(self):
+        other_flags = Flags('OtherFlags', 'f0')
+        for method in (self.MyFlags.count_members, self.MyFlags.cooccurrence, self.MyFlags.reduce_or,
+                       self.MyFlags.reduce_and):
+            with self.assertRaisesRegex(TypeError, r"Expected an instance of <flags .*MyFlags>, received 1"):
+                method([self.MyFlags.f0, 1])
+            with self.assertRaisesRegex(TypeError, r"received <OtherFlags.f0 bits=0x0001 data=UNDEFINED>"):
+                self.run_async([other_flags.f0], method)
+
+    def test_many_single_bit_members(self):
+        WideFlags = Flags('WideFlags', ['w%s' % i for i in range(100)])
+        values = [WideFlags.w99 | WideFlags.w3, WideFlags.w3, WideFlags.no_flags]
+        counts = WideFlags.count_members(values)
+        self.assertEqual(counts['w3'], 2)
+        self.assertEqual(counts['w99'], 1)
+        self.assertEqual(sum(counts.values()), 3)
+        self.assertEqual(WideFlags.cooccurrence(values)['w99']['w3'], 1)
+
+    def test_many_members_with_negative_bits(self):
+        WideFlags = Flags('WideFlags', [('w%s' % i, 1 << i) for i in range(70)] + [('neg', -1 << 80)])
+        counts = WideFlags.count_members([WideFlags.neg, WideFlags.neg | WideFlags.w3, WideFlags.w69])
+        self.assertEqual(counts['neg'], 2)
+        self.assertEqual(counts['w3'], 1)
+        self.assertEqual(counts['w69'], 1)
+        self.assertEqual(sum(counts.values()), 4)
+
+
+class TestLazyMembers(TestCase):
+    class LazyFlags(Flags):
+        __lazy_members__ = True
+
+    @staticmethod
+    def is_materialized(flags_class):
+        return '__members__' in vars(flags_class)
+
+    def create_lazy_flags(self):
+        class MyFlags(self.LazyFlags):
+            f0 = 1
+            f1 = 2
+            f2 = 4
+        self.assertFalse(self.is_materialized(MyFlags))
+        return MyFlags
+
+    def test_non_lazy_class_is_materialized_immediately(self):
+        self.assertTrue(self.is_materialized(Flags('MyFlags', 'f0 f1')))
+
+    def test_member_access_materializes(self):
+        MyFlags = self.create_lazy_flags()
+        self.assertEqual(int(MyFlags.f1), 2)
+        self.assertTrue(self.is_materialized(MyFlags))
+        self.assertEqual(MyFlags.__all_bits__, 7)
+        self.assertIs(MyFlags.f0, MyFlags.__members__['f0'])
+
+    def test_flags_meta_default_access_materializes(self):
+        MyFlags = self.create_lazy_flags()
+        self.assertEqual(MyFlags.__all_bits__, 7)
+        self.assertTrue(self.is_materialized(MyFlags))
+        self.assertFalse(self.create_lazy_flags().__wide_flags__)
+        self.assertIsNotNone(self.create_lazy_flags().__parse_cache__)
+        self.assertEqual(MyFlags.__no_flags_name__, 'no_flags')
+        self.assertIs(MyFlags.__instance_table__, None)
+        self.assertFalse(any(isinstance(value, LazyFlagsClassAttribute) for value in vars(MyFlags).values()))
+
+    def test_iteration_materializes(self):
+        MyFlags = self.create_lazy_flags()
+        self.assertListEqual([flag.name for flag in MyFlags], ['f0', 'f1', 'f2'])
+
+    def test_len_materializes(self):
+        self.assertEqual(len(self.create_lazy_flags()), 3)
+
+    def test_getitem_materializes(self):
+        MyFlags = self.create_lazy_flags()
+        self.assertIs(MyFlags['f2'], MyFlags.f2)
+
+    def test_instantiation_materializes(self):
+        MyFlags = self.create_lazy_flags()
+        self.assertIs(MyFlags(1), MyFlags.f0)
+        MyFlags = self.create_lazy_flags()
+        self.assertEqual(MyFlags('f0|f2'), MyFlags.f0 | MyFlags.f2)
+        MyFlags = self.create_lazy_flags()
+        self.assertIs(MyFlags(), MyFlags.no_flags)
+
+    def test_compiled_methods_are_installed_on_materialization(self):
+        MyFlags = self.create_lazy_flags()
+        self.assertNotIn('__or__', vars(MyFlags))
+        self.assertIs(MyFlags.f0 | MyFlags.f1 | MyFlags.f2, MyFlags.all_flags)
+        self.assertIn('__or__', vars(MyFlags))
+
+    def test_dunder_assignment_doesnt_materialize(self):
+        MyFlags = self.create_lazy_flags()
+        MyFlags.__module__ = 'my_module'
+        self.assertFalse(self.is_materialized(MyFlags))
+
+    def test_member_assignment_is_protected(self):
+        MyFlags = self.create_lazy_flags()
+        with self.assertRaisesRegex(AttributeError, re.escape("Can't assign protected attribute 'f0'")):
+            MyFlags.f0 = 5
+        with self.assertRaisesRegex(AttributeError, re.escape("Can't delete protected attribute 'f1'")):
+            del MyFlags.f1
+
+    def test_functional_api(self):
+        MyFlags = self.LazyFlags('MyFlags', 'f0 f1')
+        self.assertFalse(self.is_materialized(MyFlags))
+        self.assertEqual(int(MyFlags.f1), 2)
+
+    def test_subclassing_materialized_lazy_class_fails(self):
+        MyFlags = self.create_lazy_flags()
+        with self.assertRaisesRegex(RuntimeError, re.escape("You can't subclass 'MyFlags' because it has "
+                                                            "already defined flag members")):
+            class MySubFlags(MyFlags):
+                pass
+
+    def test_definition_errors_are_raised_on_first_access(self):
+        class MyFlags(self.LazyFlags):
+            f0 = 1.5
+        with self.assertRaisesRegex(TypeError, re.escape("Expected an int or an iterable of at most 2 items "
+                                                         "for flag 'f0', received 1.5")):
+            MyFlags.f0
+        self.assertFalse(self.is_materialized(MyFlags))
+        # the error is raised again on the next access
+        with self.assertRaises(TypeError):
+            len(MyFlags)
+        with self.assertRaisesRegex(AttributeError, re.escape("Can't assign protected attribute '__all_bits__'")):
+            MyFlags.__all_bits__ = 1
+
+    def test_missing_attribute(self):
+        MyFlags = self.create_lazy_flags()
+        with self.assertRaises(AttributeError):
+            MyFlags.f3
+        self.assertTrue(self.is_materialized(MyFlags))
+
+
+class TestWideFlags(TestCase):
+    class WideFlags(Flags):
+        __wide_flags__ = True
+
+    def test_automatic_mode_selection(self):
+        self.assertFalse(Flags('NarrowFlags', ['f%s' % i for i in range(512)]).__wide_flags__)
+        self.assertTrue(Flags('WideFlags', ['f%s' % i for i in range(513)]).__wide_flags__)
+        self.assertTrue(Flags('WideFlags', [('f0', 1), ('f1', 1 << 600)]).__wide_flags__)
+
+    def test_forced_mode(self):
+        self.assertTrue(self.WideFlags('MyFlags', 'f0 f1').__wide_flags__)
+
+        class NarrowFlags(Flags):
+            __wide_flags__ = False
+        self.assertFalse(NarrowFlags('MyFlags', ['f%s' % i for i in range(1000)]).__wide_flags__)
+
+    def test_members(self):
+        MyFlags = Flags('MyFlags', ['f%s' % i for i in range(2000)])
+        self.assertEqual(MyFlags.__all_bits__, (1 << 2000) - 1)
+        self.assertEqual(int(MyFlags.f1999), 1 << 1999)
+        self.assertIs(MyFlags.__bits_to_instance__[1 << 1500], MyFlags.f1500)
+        self.assertIs(MyFlags(1 << 1500), MyFlags.f1500)
+        self.assertIs(MyFlags(0), MyFlags.no_flags)
+        self.assertIs(MyFlags((1 << 2000) - 1), MyFlags.all_flags)
+        self.assertEqual(MyFlags.f1234.name, 'f1234')
+        self.assertEqual(MyFlags.f1234.properties.index_without_aliases, 1234)
+        self.assertIsNone((MyFlags.f0 | MyFlags.f1).properties)
+        self.assertEqual(list(MyFlags.__bits_to_instance__)[:3], [1, 2, 4])
+        self.assertEqual(len(MyFlags.__bits_to_properties__), 2000)
+
+    def test_iteration(self):
+        MyFlags = Flags('MyFlags', ['f%s' % i for i in range(2000)])
+        value = MyFlags.f3 | MyFlags.f64 | MyFlags.f1999 | MyFlags.f63
+        self.assertListEqual(list(value), [MyFlags.f3, MyFlags.f63, MyFlags.f64, MyFlags.f1999])
+        self.assertListEqual(list(reversed(value)), [MyFlags.f1999, MyFlags.f64, MyFlags.f63, MyFlags.f3])
+        self.assertEqual(len(value), 4)
+        self.assertEqual(len(MyFlags.all_flags), 2000)
+        self.assertListEqual(list(MyFlags.no_flags), [])
+
+    def test_iteration_in_declaration_order(self):
+        MyFlags = self.WideFlags('MyFlags', [('f0', 1 << 700), ('f1', 1), ('f2', 1 << 64)])
+        self.assertListEqual(list(MyFlags.all_flags), [MyFlags.f0, MyFlags.f1, MyFlags.f2])
+        self.assertListEqual(list(reversed(MyFlags.all_flags)), [MyFlags.f2, MyFlags.f1, MyFlags.f0])
+
+    def test_multi_bit_members_and_aliases(self):
+        MyFlags = self.WideFlags('MyFlags', [('f0', 1), ('f1', 2), ('f01', 3), ('alias', 2)])
+        self.assertIs(MyFlags(3), MyFlags.f01)
+        self.assertIs(MyFlags.alias, MyFlags.f1)
+        self.assertEqual(MyFlags.__member_aliases__, {'alias': 'f1'})
+        self.assertListEqual(list(MyFlags.f01), [MyFlags.f0, MyFlags.f1, MyFlags.f01])
+
+    def test_auto_assignment_skips_used_bits(self):
+        MyFlags = Flags('MyFlags', [('f0', UNDEFINED), ('f1', 1 | 4), ('f2', UNDEFINED), ('f3', 1 << 65),
+                                    ('f4', UNDEFINED), ('f5', UNDEFINED)])
+        self.assertListEqual([int(flag) for flag in MyFlags], [2, 5, 8, 1 << 65, 16, 32])
+
+    def test_auto_assignment_with_negative_bits(self):
+        with self.assertRaisesRegex(ValueError, re.escape("Can't auto-assign bits to flag 'f1' because other "
+                                                          "flags with negative bits use all the remaining bits")):
+            Flags('MyFlags', [('f0', -1), ('f1', UNDEFINED)])
+        with self.assertRaisesRegex(ValueError, re.escape("Can't auto-assign bits to flag 'f3'")):
+            Flags('MyFlags', [('f0', -6), ('f1', UNDEFINED), ('f2', UNDEFINED), ('f3', UNDEFINED)])
+
+    def test_auto_assignment_below_negative_bits(self):
+        class B(Flags):
+            a = -2
+            b = ()
+        self.assertEqual(int(B.b), 1)
+        MyFlags = Flags('MyFlags', [('f0', -6), ('f1', UNDEFINED), ('f2', UNDEFINED)])
+        self.assertEqual(int(MyFlags.f1), 1)
+        self.assertEqual(int(MyFlags.f2), 4)
+
+
+class TestBitsKeyedDict(TestCase):
+    def test_mapping(self):
+        from flags import BitsKeyedDict
+        d = BitsKeyedDict()
+        d[1 << 1000] = 'a'
+        d[0] = 'zero'
+        d[3] = 'b'
+        d[1] = 'c'
+        d[1 << 1000] = 'd'
+        self.assertListEqual(list(d.items()), [(1 << 1000, 'd'), (0, 'zero'), (3, 'b'), (1, 'c')])
+        self.assertEqual(d[1 << 1000], 'd')
+        self.assertIsNone(d.get((1 << 1000) | 1))
+        self.assertEqual(d.get(2, 'default'), 'default')
+        self.assertNotIn('x', d)
+        self.assertIn(True, d)
+        del d[1 << 1000]
+        del d[3]
+        self.assertNotIn(1 << 1000, d)
+        self.assertEqual(len(d), 2)
+        self.assertEqual(repr(d), "BitsKeyedDict({0: 'zero', 1: 'c'})")
+        with self.assertRaises(KeyError):
+            d[2]
+
+
+class TestIterSetBitPositions(TestCase):
+    def test_positions(self):
+        from flags import iter_set_bit_positions
+        positions = [0, 5, 63, 64, 127, 128, 1000]
+        bits = sum(1 << position for position in positions)
+        self.assertListEqual(list(iter_set_bit_positions(bits)), positions)
+        self.assertListEqual(list(iter_set_bit_positions(bits, reverse=True)), positions[::-1])
+        self.assertListEqual(list(iter_set_bit_positions(0)), [])
+        with self.assertRaisesRegex(ValueError, re.escape('Expected a non-negative int, received -1')):
+            list(iter_set_bit_positions(-1))
+
+    def test_words_are_independent_of_the_platform_byte_order(self):
+        from flags import int_to_words, iter_set_bit_positions
+        bits = (1 << 3) | (1 << 70)
+        self.assertEqual(int_to_words(bits), (1 << 3, 1 << 6))
+        self.assertEqual(int_to_words(0), ())
+        with unittest.mock.patch('sys.byteorder', 'little' if sys.byteorder == 'big' else 'big'):
+            self.assertListEqual(list(iter_set_bit_positions(bits)), [3, 70])
+            self.assertListEqual(list(iter_set_bit_positions(bits, reverse=True)), [70, 3])
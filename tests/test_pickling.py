@@ -1,9 +1,18 @@
 """ This module tests the compatibility of the standard pickle module with our flags classes and instances. """
+import collections
+import concurrent.futures
+import multiprocessing
+import os
 import pickle
+import random
+import re
 import sys
+import tempfile
+import unittest.mock
+from multiprocessing.reduction import ForkingPickler
 from unittest import TestCase, skipIf
 
-from flags import Flags
+from flags import Flags, FlagsArray, PackedFlags, SharedFlagsRegistry
 # Don't import classes from test_base directly to the namespace of this
 # module in order to avoid discovering those base classes as tests.
 from . import test_base
@@ -95,3 +104,246 @@ class TestPickleIntFlags(TestCase):
         self.assertEqual(len(args), 1)
         self.assertIs(type(args[0]), int)
         self.assertEqual(args[0], int(FlagsWithPickleIntFlags.f0))
+
+
+class CompactFlags(Flags):
+    f0 = ()
+    f1 = ()
+    f2 = ()
+    f3 = ()
+
+
+WideCompactFlags = Flags('WideCompactFlags', ['w%s' % i for i in range(100)], module=__name__)
+
+
+class NegativeCompactFlags(Flags):
+    f0 = 1
+    f1 = 2
+    negative = -4
+
+
+class TestCompactPickling(TestCase):
+    def _pickle_and_unpickle(self, obj):
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            yield pickle.loads(pickle.dumps(obj, protocol))
+
+    def test_flags_array(self):
+        flags_array = FlagsArray(CompactFlags, [CompactFlags.f0, CompactFlags.f1 | CompactFlags.f3,
+                                                CompactFlags.no_flags] * 100)
+        for unpickled in self._pickle_and_unpickle(flags_array):
+            self.assertEqual(unpickled, flags_array)
+
+    def test_flags_array_is_smaller_than_a_list(self):
+        values = [CompactFlags(bits) for _ in range(100) for bits in range(16)]
+        self.assertLess(len(pickle.dumps(FlagsArray(CompactFlags, values))) * 2, len(pickle.dumps(values)))
+
+    def test_packed_containers(self):
+        f0, f1, f2 = CompactFlags.f0, CompactFlags.f1, CompactFlags.f2
+        containers = [
+            [f0, f1 | f2, f0],
+            (f0, CompactFlags.no_flags),
+            {f0, f1 | f2},
+            frozenset([f2]),
+            {'a': f0, 'b': f1 | f2},
+            collections.OrderedDict([(2, f1), (1, f0)]),
+        ]
+        for container in containers:
+            packed = PackedFlags(container)
+            self.assertIs(packed.flags_class, CompactFlags)
+            self.assertEqual(len(packed), len(container))
+            for unpickled in self._pickle_and_unpickle(packed):
+                unpacked = unpickled.unpack()
+                self.assertIs(type(unpacked), type(container))
+                self.assertEqual(unpacked, container)
+
+    def test_packed_empty_container(self):
+        with self.assertRaisesRegex(ValueError, r"flags_class has to be specified in case of empty containers"):
+            PackedFlags([])
+        self.assertEqual(PackedFlags({}, CompactFlags).unpack(), {})
+
+    def test_packed_container_errors(self):
+        with self.assertRaisesRegex(TypeError, r"Expected one of list, tuple, set, frozenset, dict, OrderedDict"):
+            PackedFlags(iter([CompactFlags.f0]))
+        with self.assertRaisesRegex(TypeError, r"Expected an instance of <flags CompactFlags>"):
+            PackedFlags([CompactFlags.f0, 1])
+
+    def test_packed_containers_of_wide_flags_classes(self):
+        w0, w70, w99 = WideCompactFlags.w0, WideCompactFlags.w70, WideCompactFlags.w99
+        values = [w0 | w99, w70, WideCompactFlags.no_flags, WideCompactFlags.all_flags] * 25
+        packed = PackedFlags(values)
+        self.assertIs(packed.flags_class, WideCompactFlags)
+        self.assertEqual(len(packed), 100)
+        for unpickled in self._pickle_and_unpickle(packed):
+            self.assertListEqual(unpickled.unpack(), values)
+        rng = random.Random(0)
+        values = [WideCompactFlags(rng.getrandbits(100)) for _ in range(100)]
+        self.assertLess(len(pickle.dumps(PackedFlags(values))) * 2, len(pickle.dumps(values)))
+        with self.assertRaisesRegex(TypeError, r"Expected an instance of <flags WideCompactFlags>"):
+            PackedFlags([w0, CompactFlags.f0])
+
+    def test_packed_containers_of_flags_classes_with_negative_bits(self):
+        values = {'a': NegativeCompactFlags.negative, 'b': NegativeCompactFlags.f0 | NegativeCompactFlags.f1,
+                  'c': NegativeCompactFlags.all_flags}
+        for unpickled in self._pickle_and_unpickle(PackedFlags(values)):
+            self.assertEqual(unpickled.unpack(), values)
+
+    def test_wide_bits_are_translated_through_member_names(self):
+        OldFlags = Flags('TranslatedWideFlags', ['w%s' % i for i in range(100)], module=__name__)
+        NewFlags = Flags('TranslatedWideFlags', ['w%s' % i for i in reversed(range(100))], module=__name__)
+        global TranslatedWideFlags
+        try:
+            TranslatedWideFlags = OldFlags
+            pickled = pickle.dumps(PackedFlags([OldFlags.w0 | OldFlags.w99, OldFlags.w1]))
+            TranslatedWideFlags = NewFlags
+            unpickled = pickle.loads(pickled)
+        finally:
+            del TranslatedWideFlags
+        self.assertListEqual(unpickled.unpack(), [NewFlags.w0 | NewFlags.w99, NewFlags.w1])
+
+    def test_bits_are_translated_through_member_names(self):
+        OldFlags = Flags('TranslatedFlags', 'f0 f1 f2', module=__name__)
+        NewFlags = Flags('TranslatedFlags', [('new', 1), ('f2', 2), ('f0', 8), ('f1', 16)], module=__name__)
+        global TranslatedFlags
+        try:
+            TranslatedFlags = OldFlags
+            pickled = pickle.dumps(FlagsArray(OldFlags, [OldFlags.f0, OldFlags.f1 | OldFlags.f2,
+                                                         OldFlags.no_flags]))
+            TranslatedFlags = NewFlags
+            unpickled = pickle.loads(pickled)
+        finally:
+            del TranslatedFlags
+        self.assertListEqual(list(unpickled), [NewFlags.f0, NewFlags.f1 | NewFlags.f2, NewFlags.no_flags])
+
+    def test_removed_member_name(self):
+        OldFlags = Flags('RemovedMemberFlags', 'f0 f1', module=__name__)
+        global RemovedMemberFlags
+        try:
+            RemovedMemberFlags = OldFlags
+            pickled = pickle.dumps(FlagsArray(OldFlags, [OldFlags.f0]))
+            RemovedMemberFlags = Flags('RemovedMemberFlags', 'f0', module=__name__)
+            with self.assertRaisesRegex(ValueError, re.escape("Invalid flag 'RemovedMemberFlags.f1' "
+                                                              "in serialized data")):
+                pickle.loads(pickled)
+        finally:
+            del RemovedMemberFlags
+
+
+def inspect_shared_flags_in_worker(flags):
+    """ Executed in a worker process of TestSharedFlagsRegistry. """
+    flags_class = type(flags)
+    return (flags_class is ModuleScopeFlags, flags_class.__qualname__, [member.name for member in flags],
+            [member.data for member in flags], ~flags)
+
+
+class TestSharedFlagsRegistry(TestCase):
+    def setUp(self):
+        self.GeneratedFlags = Flags('GeneratedFlags', [('g%s' % i, (1 << i, 'data%s' % i)) for i in range(100)],
+                                    module='generated_flags_module')
+        self.registry = SharedFlagsRegistry([ModuleScopeFlags, self.GeneratedFlags])
+        self.addCleanup(self.registry.close)
+
+    def test_instances_are_pickled_as_class_id_and_bits(self):
+        flags = ModuleScopeFlags.f1 | ModuleScopeFlags.f3
+        pickled = bytes(ForkingPickler.dumps(flags))
+        self.assertNotIn(b'f1', pickled)
+        self.assertNotIn(b'ModuleScopeFlags', pickled)
+        self.assertEqual(pickle.loads(pickled), flags)
+        self.assertIs(pickle.loads(ForkingPickler.dumps(ModuleScopeFlags.f2)), ModuleScopeFlags.f2)
+        # the generated class isn't picklable without the registry
+        self.assertIs(pickle.loads(ForkingPickler.dumps(self.GeneratedFlags.g99)), self.GeneratedFlags.g99)
+
+    def test_pickled_instances_refer_to_the_registry_by_token_and_nonce(self):
+        flags = ModuleScopeFlags.f1 | ModuleScopeFlags.f2
+        pickled = bytes(ForkingPickler.dumps(flags))
+        self.assertNotIn(os.path.basename(self.registry.name).encode(), pickled)
+        # The token and the nonce are 64-bit ints, the size doesn't depend on the names of the class and its members.
+        generated_flags = self.GeneratedFlags.g1 | self.GeneratedFlags.g2
+        self.assertEqual(len(pickled), len(bytes(ForkingPickler.dumps(generated_flags))))
+        self.assertLessEqual(len(pickled), 80)
+
+    def test_registry_in_custom_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        with SharedFlagsRegistry([ModuleScopeFlags], directory=directory) as registry:
+            self.assertEqual(os.path.dirname(registry.name), directory)
+            pickled = bytes(ForkingPickler.dumps(ModuleScopeFlags.f1))
+            # The path of the file is the token of registries outside the temp directory.
+            self.assertIn(registry.name.encode(), pickled)
+            self.assertIs(pickle.loads(pickled), ModuleScopeFlags.f1)
+
+    def test_pickle_module_isnt_affected(self):
+        pickled = pickle.dumps(ModuleScopeFlags.f1)
+        self.assertIn(b'f1', pickled)
+        self.registry.close()
+        self.assertIs(pickle.loads(pickled), ModuleScopeFlags.f1)
+        # the pickler of multiprocessing falls back to member names after closing the registry
+        self.assertIn(b'f1', bytes(ForkingPickler.dumps(ModuleScopeFlags.f1)))
+
+    def test_pack_and_unpack(self):
+        self.assertEqual(len(self.registry), 2)
+        self.assertEqual(self.registry.class_id(self.GeneratedFlags), 1)
+        self.assertEqual(self.registry.pack(self.GeneratedFlags.g2), (1, 4))
+        self.assertIs(self.registry.unpack(1, 4), self.GeneratedFlags.g2)
+        with self.assertRaisesRegex(ValueError, re.escape("<flags OtherFlags> isn't in this registry")):
+            self.registry.class_id(Flags('OtherFlags', 'f0'))
+
+    def test_close(self):
+        self.registry.close()
+        self.assertFalse(os.path.exists(self.registry.name))
+        self.assertIn(b'f1', bytes(ForkingPickler.dumps(ModuleScopeFlags.f1)))
+        self.registry.close()
+
+    def test_reused_token(self):
+        Perm = Flags('Perm', 'read write', module='generated_flags_module')
+        Color = Flags('Color', 'red green', module='generated_flags_module')
+        with unittest.mock.patch('random.SystemRandom.getrandbits', return_value=0x1234):
+            with SharedFlagsRegistry([Perm]) as registry:
+                pickled = bytes(ForkingPickler.dumps(Perm.write))
+            with SharedFlagsRegistry([Color]) as registry2:
+                self.assertEqual(registry2.name, registry.name)
+                self.assertNotEqual(registry2.nonce, registry.nonce)
+                with self.assertRaisesRegex(ValueError, r"The flags registry .* of the pickled instance has been "
+                                                        r"closed"):
+                    pickle.loads(pickled)
+                self.assertIs(pickle.loads(ForkingPickler.dumps(Color.green)), Color.green)
+
+    @skipIf(sys.version_info < (3, 7), 'The mp_context argument of ProcessPoolExecutor requires python 3.7+')
+    def test_reused_token_in_worker_process(self):
+        Perm = Flags('Perm', 'read write', module='generated_flags_module')
+        Color = Flags('Color', 'red green', module='generated_flags_module')
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+            with unittest.mock.patch('random.SystemRandom.getrandbits', return_value=0x1234):
+                with SharedFlagsRegistry([Perm]):
+                    # The worker keeps the closed registry attached.
+                    result = executor.submit(inspect_shared_flags_in_worker, Perm.write).result()
+                    self.assertEqual(result[1:3], ('Perm', ['write']))
+                with SharedFlagsRegistry([Color]):
+                    result = executor.submit(inspect_shared_flags_in_worker, Color.green).result()
+                    self.assertEqual(result[1:3], ('Color', ['green']))
+                    self.assertIs(type(result[4]), Color)
+
+    def test_invalid_flags_class(self):
+        with self.assertRaisesRegex(TypeError, r"Expected a flags class with members, received <flags Flags>"):
+            SharedFlagsRegistry([Flags])
+
+    def test_attach_to_invalid_file(self):
+        with open(self.registry.name + '.invalid', 'wb') as f:
+            f.write(b'x' * 16)
+        self.addCleanup(os.unlink, self.registry.name + '.invalid')
+        with self.assertRaisesRegex(ValueError, r"isn't a flags registry"):
+            SharedFlagsRegistry.attach(self.registry.name + '.invalid')
+
+    @skipIf(sys.version_info < (3, 7), 'The mp_context argument of ProcessPoolExecutor requires python 3.7+')
+    def test_worker_processes(self):
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+            result = executor.submit(inspect_shared_flags_in_worker, ModuleScopeFlags.f0 | ModuleScopeFlags.f2)
+            self.assertEqual(result.result(), (True, 'ModuleScopeFlags', ['f0', 'f2'], ['data0', 'data2'],
+                                               ModuleScopeFlags.f1 | ModuleScopeFlags.f3))
+            # The worker can't import GeneratedFlags so it creates it from the shared definition.
+            flags = self.GeneratedFlags.g1 | self.GeneratedFlags.g98
+            result = executor.submit(inspect_shared_flags_in_worker, flags).result()
+            self.assertEqual(result[:4], (False, 'GeneratedFlags', ['g1', 'g98'], ['data1', 'data98']))
+            self.assertIs(type(result[4]), self.GeneratedFlags)
+            self.assertEqual(result[4], ~flags)
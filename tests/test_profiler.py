@@ -0,0 +1,79 @@
+""" Testing FlagsProfiler, the opt-in call counter and timer of flags operations. """
+import pickle
+from unittest import TestCase
+
+from flags import Flags, FlagsMeta, FlagsProfiler
+
+
+class MyFlags(Flags):
+    f0 = ()
+    f1 = ()
+
+
+class MyOtherFlags(Flags):
+    of0 = ()
+
+
+class TestFlagsProfiler(TestCase):
+    def workload(self):
+        value = MyFlags.f0 | MyFlags.f1
+        _ = value - MyFlags.f1, ~value, MyFlags.f0 in value, value == MyFlags.f0
+        MyFlags('f0')
+        MyFlags(1)
+        str(value)
+        pickle.dumps(value)
+        MyOtherFlags.of0 | MyOtherFlags.of0
+
+    def test_counts_calls(self):
+        with FlagsProfiler([MyFlags]) as profiler:
+            self.workload()
+        snapshot = profiler.snapshot()
+        self.assertEqual({name: item['calls'] for name, item in snapshot.items()}, {
+            'MyFlags.__call__': 2, 'MyFlags.__or__': 1, 'MyFlags.__sub__': 1, 'MyFlags.__invert__': 1,
+            'MyFlags.__contains__': 1, 'MyFlags.__eq__': 1, 'MyFlags.bits_from_str': 1, 'MyFlags.__str__': 1,
+            'MyFlags.__reduce_ex__': 1,
+        })
+        self.assertTrue(all(item['time'] >= 0 for item in snapshot.values()))
+        # the counters don't change while the profiler is disabled
+        self.workload()
+        self.assertEqual(profiler.snapshot(), snapshot)
+        profiler.reset()
+        self.assertEqual(profiler.snapshot(), {})
+
+    def test_disabling_restores_the_original_methods(self):
+        class_dict = dict(vars(MyFlags))
+        flags_meta_call = FlagsMeta.__call__
+        profiler = FlagsProfiler([MyFlags])
+        profiler.enable()
+        self.assertTrue(profiler.enabled)
+        self.assertIsNot(vars(MyFlags)['__or__'], class_dict['__or__'])
+        with FlagsProfiler([MyFlags]) as nested_profiler:
+            MyFlags.f0 | MyFlags.f1
+        profiler.disable()
+        self.assertFalse(profiler.enabled)
+        self.assertEqual(dict(vars(MyFlags)), class_dict)
+        self.assertIs(FlagsMeta.__call__, flags_meta_call)
+        self.assertEqual(profiler.snapshot()['MyFlags.__or__']['calls'], 1)
+        self.assertEqual(nested_profiler.snapshot()['MyFlags.__or__']['calls'], 1)
+
+    def test_global_profiler(self):
+        with FlagsProfiler() as profiler:
+            NewFlags = Flags('NewFlags', 'n0 n1')
+            NewFlags.n0 | NewFlags.n1
+            self.workload()
+        snapshot = profiler.snapshot()
+        self.assertEqual(snapshot['NewFlags.__or__']['calls'], 1)
+        self.assertEqual(snapshot['MyOtherFlags.__or__']['calls'], 1)
+        self.assertEqual(snapshot['MyFlags.__call__']['calls'], 2)
+        self.assertNotIn('__or__', vars(NewFlags.__bases__[0]))
+
+    def test_disabling_keeps_the_attributes_assigned_while_profiling(self):
+        with FlagsProfiler():
+            # The functional API assigns a __reduce_ex__ that makes the class unpicklable after creating it.
+            UnpicklableFlags = Flags('UnpicklableFlags', 'f0 f1')
+        with self.assertRaisesRegex(pickle.PicklingError, r"'UnpicklableFlags' is unpicklable"):
+            pickle.dumps(UnpicklableFlags.f0)
+
+    def test_invalid_flags_classes(self):
+        with self.assertRaisesRegex(TypeError, r"Expected a flags class with members"):
+            FlagsProfiler([Flags])
@@ -0,0 +1,84 @@
+""" Testing FlagsStreamCodec, the asyncio stream codec of flags instances. """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from flags import Flags, FlagsStreamCodec
+from . import test_base
+
+
+class MyFlags(Flags):
+    f0 = ()
+    f1 = ()
+    f2 = ()
+
+
+class WideFlags(Flags):
+    __members__ = ['w%s' % i for i in range(20)]
+
+
+class TestFlagsStreamCodec(TestCase):
+    values = [MyFlags.f0, MyFlags.f1 | MyFlags.f2, MyFlags.no_flags, MyFlags.all_flags, MyFlags.f2]
+    wide_values = [WideFlags.w19, WideFlags.w0, WideFlags.w7 | WideFlags.w8, WideFlags.no_flags, WideFlags.w19]
+
+    @staticmethod
+    def decode(codec, chunks, batches=False):
+        async def run():
+            reader = asyncio.StreamReader()
+            for chunk in chunks:
+                reader.feed_data(chunk)
+            reader.feed_eof()
+            if batches:
+                return [batch async for batch in codec.decode_batches(reader)]
+            return [flags async for flags in codec.decode(reader)]
+        return test_base.run_coroutine(run())
+
+    def test_varint_mode(self):
+        codec = FlagsStreamCodec(MyFlags)
+        self.assertEqual(codec.mode, 'varint')
+        self.assertIs(codec.flags_class, MyFlags)
+        data = codec.encode(self.values)
+        self.assertEqual(data, b'\x01\x06\x00\x07\x04')
+        self.assertListEqual(self.decode(codec, [data]), self.values)
+        self.assertIs(self.decode(codec, [data])[0], MyFlags.f0)
+
+    def test_multi_byte_varints(self):
+        codec = FlagsStreamCodec(WideFlags, read_size=3)
+        data = codec.encode(self.wide_values)
+        self.assertEqual(data[:3], b'\x80\x80\x20')
+        self.assertListEqual(self.decode(codec, [data]), self.wide_values)
+        # items split between reads
+        self.assertListEqual(self.decode(FlagsStreamCodec(WideFlags), [data[:2], data[2:7], data[7:]]),
+                             self.wide_values)
+        with self.assertRaises(asyncio.IncompleteReadError):
+            self.decode(codec, [data[:-1]])
+
+    def test_text_mode(self):
+        codec = FlagsStreamCodec(MyFlags, 'text', read_size=4)
+        data = codec.encode(self.values)
+        self.assertEqual(data, b'f0\nf1|f2\n\nf0|f1|f2\nf2\n')
+        self.assertListEqual(self.decode(codec, [data]), self.values)
+        self.assertListEqual(self.decode(codec, [b'MyFlags.f1\nMyFlags(f0|f2)\nall_flags']),
+                             [MyFlags.f1, MyFlags.f0 | MyFlags.f2, MyFlags.all_flags])
+        with self.assertRaisesRegex(ValueError, r"Invalid flag 'MyFlags.f3'"):
+            self.decode(codec, [b'f0|f3\n'])
+
+    def test_batches(self):
+        codec = FlagsStreamCodec(WideFlags, read_size=4)
+        batches = self.decode(codec, [codec.encode(self.wide_values)], batches=True)
+        self.assertGreater(len(batches), 1)
+        self.assertListEqual([flags for batch in batches for flags in batch], self.wide_values)
+
+    def test_offloading_to_executor(self):
+        with ThreadPoolExecutor(1) as executor:
+            for mode in FlagsStreamCodec.MODES:
+                codec = FlagsStreamCodec(WideFlags, mode, executor=executor, offload_threshold=2)
+                self.assertListEqual(self.decode(codec, [codec.encode(self.wide_values)]), self.wide_values)
+
+    def test_invalid_arguments(self):
+        with self.assertRaisesRegex(TypeError, r"Expected a flags class with members"):
+            FlagsStreamCodec(Flags)
+        with self.assertRaisesRegex(ValueError, r"Invalid mode 'json'"):
+            FlagsStreamCodec(MyFlags, 'json')
+        with self.assertRaisesRegex(TypeError, r"Expected an instance of <flags MyFlags>"):
+            FlagsStreamCodec(MyFlags).encode([MyFlags.f0, WideFlags.w0])